@@ -0,0 +1,176 @@
+import os
+import time
+from collections import defaultdict
+
+import cv2
+
+from frame_store import find_frame_stores
+from process_pool import print_worker_stats, run_isolated
+
+"""
+세션 폴더 전체 손 랜드마크 일괄 추출 (프로세스 풀)
+
+lendmark_npz.ipynb 는
+    for frames_dir in frame_dirs: extract_hands_for_folder(...)
+로 세션을 하나씩 처리해서 코어 1개만 사용한다.
+MediaPipe Hands 는 프레임 하나를 처리하는 동안 GIL 을 잡고 있는 부분이 많아
+스레드로는 잘 늘지 않으므로 세션 폴더 단위로 프로세스에 나눠 준다.
+
+    - 워커마다 Hands 인스턴스 1개 (initializer 에서 생성, 세션마다 reset)
+    - hands_<세션이름>.npz 가 세션의 가장 최근 프레임보다 새로우면 건너뜀
+    - 워커가 죽으면(BrokenProcessPool) 안 끝난 세션을 세션마다 프로세스 하나로 다시 돌려
+      워커를 죽인 세션만 골라냄 (그 세션이 MAX_ATTEMPTS 번 죽이면 실패로 보고)
+    - 워커(pid)별 frames/sec 출력
+    - USE_RESULT_CACHE: 공용 ResultCache 에 같은 세션 + 같은 Hands 설정 결과가 있으면
+      추출하지 않고 npz 만 씀 (FORCE 로 다시 돌릴 때, 다른 폴더로 복사한 세션 등)
+
+실행:
+    python batch_landmarks.py   (아래 ROOT_DIRS / OUT_DIR_NAME 수정 후)
+"""
+
+# =========================
+# 1. 설정
+# =========================
+
+# 세션 폴더(프레임 저장소)를 찾을 최상위 폴더들
+ROOT_DIRS = [
+    os.path.join("data", "normal"),
+    os.path.join("data", "missing1"),
+    os.path.join("data", "missing2"),
+    os.path.join("data", "idle"),
+]
+OUT_DIR_NAME = "out_npz"    # <ROOT_DIR>/out_npz/hands_<세션이름>.npz
+
+NUM_WORKERS  = max(1, (os.cpu_count() or 2) - 1)   # 메인 프로세스용으로 1개 남김
+MAX_HANDS    = 2
+CHUNK_SIZE   = 1024
+MAX_ATTEMPTS = 2            # 세션 하나가 워커를 죽여도 다시 돌려 보는 최대 횟수
+FORCE        = False        # True 면 npz 가 최신이어도 다시 추출
+USE_RESULT_CACHE = True     # result_cache.RESULT_CACHE_PATH 의 공용 캐시 사용
+
+
+# =========================
+# 2. 작업 목록
+# =========================
+
+def newest_frame_mtime(store_path):
+    """세션 폴더 안 파일(프레임/세그먼트/인덱스) 중 가장 최근 수정 시각, 영상 파일이면 그 파일 시각"""
+    if os.path.isfile(store_path):
+        return os.path.getmtime(store_path)
+
+    newest = 0.0
+    with os.scandir(store_path) as it:
+        for e in it:
+            if e.is_file():
+                newest = max(newest, e.stat().st_mtime)
+    return newest
+
+
+def is_up_to_date(store_path, npz_path):
+    return os.path.exists(npz_path) and os.path.getmtime(npz_path) > newest_frame_mtime(store_path)
+
+
+def collect_jobs(root_dirs=ROOT_DIRS, force=FORCE):
+    """
+    반환:
+        jobs   : [(세션 경로, npz 경로), ...]
+        skipped: 최신 npz 가 있어서 건너뛴 세션 수
+    """
+    jobs = []
+    skipped = 0
+    for root_dir in root_dirs:
+        out_dir = os.path.join(root_dir, OUT_DIR_NAME)
+        for store_path in find_frame_stores(root_dir):
+            sample_name = os.path.basename(store_path)   # 예: video_normal_001
+            npz_path = os.path.join(out_dir, f"hands_{sample_name}.npz")
+
+            if not force and is_up_to_date(store_path, npz_path):
+                skipped += 1
+                continue
+            jobs.append((store_path, npz_path))
+    return jobs, skipped
+
+
+# =========================
+# 3. 워커
+# =========================
+
+_hands = None
+_cache = None
+
+
+def _init_worker(max_hands, use_cache=USE_RESULT_CACHE):
+    """워커 프로세스마다 한 번: Hands 생성, OpenCV 내부 스레드는 1개로 (코어 중복 사용 방지)"""
+    global _hands, _cache
+    import mediapipe as mp
+
+    cv2.setNumThreads(1)
+    _hands = mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=max_hands,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    )
+    if use_cache:
+        from result_cache import open_result_cache
+        _cache = open_result_cache()
+
+
+def _extract_job(store_path, npz_path, max_hands, chunk_size):
+    from hand_stream import extract_hands_stream
+
+    t_start = time.perf_counter()
+    n_frames, n_detected = extract_hands_stream(store_path, npz_path, max_hands=max_hands,
+                                                chunk_size=chunk_size, hands=_hands,
+                                                cache=_cache)
+    return os.getpid(), n_frames, n_detected, time.perf_counter() - t_start
+
+
+# =========================
+# 4. 실행
+# =========================
+
+def run_batch(jobs, num_workers=NUM_WORKERS, max_hands=MAX_HANDS, chunk_size=CHUNK_SIZE,
+              max_attempts=MAX_ATTEMPTS, use_cache=USE_RESULT_CACHE):
+    """
+    jobs 를 프로세스 풀로 처리한다 (워커를 죽이는 세션만 실패, process_pool.run_isolated).
+
+    반환:
+        worker_stats: {pid: {"jobs", "frames", "seconds"}}
+        failed      : [(세션 경로, 에러 메시지), ...]
+    """
+    worker_stats = defaultdict(lambda: {"jobs": 0, "frames": 0, "seconds": 0.0})
+
+    def on_done(job, value):
+        pid, n_frames, n_detected, seconds = value
+        st = worker_stats[pid]
+        st["jobs"] += 1
+        st["frames"] += n_frames
+        st["seconds"] += seconds
+
+    _, failed = run_isolated(_extract_job,
+                             [(store_path, npz_path, max_hands, chunk_size)
+                              for store_path, npz_path in jobs],
+                             num_workers, max_attempts,
+                             initializer=_init_worker, initargs=(max_hands, use_cache),
+                             on_done=on_done, label=lambda job: job[0])
+    return dict(worker_stats), [(job[0], msg) for job, msg in failed]
+
+
+def main():
+    jobs, skipped = collect_jobs()
+    print(f"[INFO] {len(jobs)} session(s) to extract, {skipped} up to date. "
+          f"workers={NUM_WORKERS}")
+    if not jobs:
+        return
+
+    t_start = time.perf_counter()
+    worker_stats, failed = run_batch(jobs)
+    print_worker_stats(worker_stats, time.perf_counter() - t_start)
+
+    for store_path, msg in failed:
+        print(f"[WARN] failed: {store_path} ({msg})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+"""
+성능 벤치마크 (카메라 / GPU / data 폴더 없이)
+
+save_frame, 손 랜드마크 추출, 윈도우 데이터셋, TCN/YOLO 융합, 프레임 지표 계산 같은
+hot path 를 합성 데이터로 같은 조건에서 반복 측정하고 결과를 파일에 누적한다.
+커밋 전후로 돌려서 bench_results.jsonl 의 같은 stage / scale 값을 비교하면 된다.
+
+합성 데이터:
+    - synthetic_frames     : 1280×720 BGR 프레임 (배경 그라디언트 + 움직이는 상자 + 노이즈)
+    - synthetic_hand_kps   : (T, 126) 손 랜드마크 (부드러운 random walk, 손 안 보이는 구간은 0)
+    - synthetic_labels     : (T, 3) A/S/D 0/1 라벨 (idle → A → S → D 반복)
+    - synthetic_yolo_states: 라벨과 맞물리는 _yolo_states.csv 형태 DataFrame
+
+규모는 SCALE_MINUTES(영상 분) × BENCH_FPS 프레임.
+배열 단계(윈도우, 융합, 지표)는 전체 규모로, 프레임 단계(인코딩, 랜드마크)는
+FRAME_STAGE_LIMIT 프레임까지만 측정해서 초당 처리량으로 비교한다.
+필요한 패키지(mediapipe, torch 등)가 없는 단계는 건너뛰고 이유를 기록한다.
+
+실행:
+    python bench.py                              (아래 설정 수정 후)
+    run_benchmarks(minutes=60 * 24, stages=["fusion_offline"])   # 노트북에서 하루치만
+"""
+
+# =========================
+# 1. 설정
+# =========================
+
+SCALE_MINUTES     = 10         # 합성 영상 길이(분). 하루치는 60 * 24
+BENCH_FPS         = 30         # 프레임 수 = SCALE_MINUTES * 60 * BENCH_FPS
+FRAME_STAGE_LIMIT = 300        # 인코딩 / 랜드마크 단계에서 실제로 처리할 최대 프레임 수
+FRAME_WIDTH       = 1280
+FRAME_HEIGHT      = 720
+SEED              = 0
+REPEATS           = 3          # 단계마다 반복 횟수 (median / min 기록)
+RESULTS_PATH      = "bench_results.jsonl"
+STAGES            = None       # None 이면 전부, 예: ["save_frame", "fusion_offline"]
+
+MAX_HANDS = 2
+NUM_ACTIONS = 3
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# =========================
+# 2. 합성 데이터
+# =========================
+
+def synthetic_frames(n, width=FRAME_WIDTH, height=FRAME_HEIGHT, seed=SEED):
+    """
+    n 개의 BGR 프레임 (uint8). JPEG 크기가 실제 영상과 비슷하도록 완전 랜덤 노이즈 대신
+    그라디언트 배경 위에 상자 4개를 움직이고 약한 노이즈를 더한다.
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = np.stack([(xx * 240 // max(1, width - 1)),
+                     (yy * 240 // max(1, height - 1)),
+                     np.full_like(xx, 96)], axis=-1).astype(np.uint8)
+    noise = rng.integers(0, 12, size=(8, height, width, 3), dtype=np.uint8)
+
+    bw, bh = width // 8, height // 6
+    for i in range(n):
+        frame = base + noise[i % len(noise)]
+        for b in range(4):
+            x = int((i * (3 + b) + b * width // 4) % max(1, width - bw))
+            y = height // 2 + int(height / 6 * np.sin(i / 15.0 + b))
+            y = min(max(0, y), height - bh)
+            frame[y:y + bh, x:x + bw] = (40 + 50 * b, 200 - 40 * b, 120)
+        yield frame
+
+
+def synthetic_hand_kps(n_frames, max_hands=MAX_HANDS, seed=SEED, visible=0.8):
+    """(T, max_hands*21*3) float32. 손 중심이 천천히 움직이고 관절은 중심 주변에 분포"""
+    rng = np.random.default_rng(seed)
+    centers = np.cumsum(rng.normal(0, 0.004, size=(n_frames, max_hands, 1, 3)), axis=0)
+    centers = 0.5 + 0.3 * np.tanh(centers)
+    joints = rng.normal(0, 0.03, size=(1, max_hands, 21, 3))
+    kps = (centers + joints + rng.normal(0, 0.002, size=(n_frames, max_hands, 21, 3)))
+    kps = kps.astype(np.float32)
+
+    # 손이 안 보이는 프레임은 0 (MediaPipe 미검출과 같은 형태)
+    hidden = rng.random((n_frames, max_hands)) > visible
+    kps[hidden] = 0.0
+    return kps.reshape(n_frames, -1)
+
+
+def synthetic_labels(n_frames, seed=SEED, fps=BENCH_FPS):
+    """
+    (T, 3) int8 A/S/D 0/1 라벨. 한 사이클 = idle → A → S → D (단계 길이 1~6초 랜덤)
+    반환: (labels, segments [(action, start, end)])
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.zeros((n_frames, NUM_ACTIONS), dtype=np.int8)
+    segments = []
+    t = 0
+    while t < n_frames:
+        t += int(rng.uniform(1, 4) * fps)               # idle
+        for action in range(NUM_ACTIONS):
+            length = int(rng.uniform(1, 6) * fps)
+            if t >= n_frames:
+                break
+            end = min(n_frames, t + length)
+            labels[t:end, action] = 1
+            segments.append((action, t, end - 1))
+            t = end
+    return labels, segments
+
+
+def synthetic_yolo_states(labels, seed=SEED, boxes=4, flip=0.05):
+    """
+    라벨과 맞물리는 _yolo_states.csv 형태 DataFrame.
+    A 구간에서 상자가 열리고, S 구간에서 채워지고, D 구간에서 닫힌다. flip 비율만큼 오탐 노이즈.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    n = len(labels)
+    a, s, d = labels[:, 0] > 0, labels[:, 1] > 0, labels[:, 2] > 0
+
+    box = np.where(a | s | d, boxes, 0)
+    open_ = np.where(a | s, boxes, 0)
+    closed = np.where(d, boxes, 0)
+    full = np.where(s | d, boxes, 0)
+    empty = box - full
+
+    counts = np.stack([box, open_, closed, full, empty], axis=1)
+    noise = (rng.random(counts.shape) < flip) * rng.integers(-1, 2, size=counts.shape)
+    counts = np.clip(counts + noise, 0, boxes)
+
+    df = pd.DataFrame(counts, columns=["box_count", "open_count", "closed_count",
+                                       "full_count", "empty_count"])
+    df.insert(0, "video_name", "synthetic")
+    df.insert(1, "frame_idx", np.arange(n))
+    df.insert(2, "frame_name", [f"frame_{i:06d}.jpg" for i in range(n)])
+    return df
+
+
+def synthetic_tcn_pred(labels, seed=SEED, flip=0.05):
+    """_pred.csv 형태 (A, S, D 0/1) — 라벨에 flip 비율만큼 오류를 넣음"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    pred = labels.copy()
+    mask = rng.random(pred.shape) < flip
+    pred[mask] = 1 - pred[mask]
+    return pd.DataFrame(pred.astype(np.int64), columns=["A", "S", "D"])
+
+
+# =========================
+# 3. 노트북 / 파일 이름에 공백 있는 모듈 불러오기
+# =========================
+
+def load_module_from_path(path, name):
+    """recoding_video copy 2.py 처럼 import 문으로 못 부르는 파일을 모듈로 불러온다"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_notebook_functions(path, names):
+    """
+    노트북에서 names 를 정의하는 코드 셀만 실행해서 {name: 객체} 반환.
+    (score.ipynb 의 compute_frame_metrics 처럼 노트북에만 있는 함수 측정용)
+    """
+    with open(path, encoding="utf-8") as f:
+        nb = json.load(f)
+    namespace = {"__name__": "bench_notebook"}
+    for cell in nb["cells"]:
+        if cell["cell_type"] != "code":
+            continue
+        src = "".join(cell["source"])
+        if any(f"def {n}" in src or f"class {n}" in src for n in names):
+            exec(compile(src, path, "exec"), namespace)
+    missing = [n for n in names if n not in namespace]
+    if missing:
+        raise ImportError(f"{missing} not found in {path}")
+    return {n: namespace[n] for n in names}
+
+
+# =========================
+# 4. 단계별 벤치마크
+# =========================
+# setup(ctx) 에서 준비한 데이터로 run(state) 을 반복 측정한다.
+# run 반환값 = 처리한 항목 수 (프레임 / 윈도우) → items/sec
+
+def _setup_save_frame(ctx):
+    rec = load_module_from_path(os.path.join(ROOT_DIR, "recoding_video copy 2.py"),
+                                "bench_recoding_video")
+    rec.STORAGE_MODE = "jpeg"
+    frames = list(synthetic_frames(min(ctx["n_frames"], ctx["frame_limit"]), seed=ctx["seed"]))
+    out_dir = tempfile.mkdtemp(prefix="bench_save_")
+    ctx["cleanup"].append(out_dir)
+    return rec, frames, out_dir
+
+
+def _run_save_frame(state):
+    rec, frames, out_dir = state
+    for i, frame in enumerate(frames):
+        rec.save_frame(out_dir, i, frame)
+    return len(frames)
+
+
+def _setup_extract_hands(ctx):
+    import cv2
+    from hand_stream import extract_hands_stream
+
+    frames_dir = tempfile.mkdtemp(prefix="bench_frames_")
+    ctx["cleanup"].append(frames_dir)
+    n = min(ctx["n_frames"], ctx["frame_limit"])
+    for i, frame in enumerate(synthetic_frames(n, seed=ctx["seed"])):
+        cv2.imwrite(os.path.join(frames_dir, f"frame_{i:06d}.jpg"), frame,
+                    [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return extract_hands_stream, frames_dir, n
+
+
+def _run_extract_hands(state):
+    extract_hands_stream, frames_dir, n = state
+    extract_hands_stream(frames_dir, os.path.join(frames_dir, "hands_bench.npz"))
+    return n
+
+
+def _setup_window_dataset(ctx):
+    from window_dataset import SlidingWindowDataset, WindowBatchSampler
+
+    kps = ctx["hand_kps"]
+    labels = ctx["labels"].astype(np.float32)
+    # 10분 단위 세션으로 나눔 (실제 학습 데이터처럼 샘플 여러 개)
+    per = max(1, 10 * 60 * ctx["fps"])
+    landmarks, label_dict = {}, {}
+    for i, s in enumerate(range(0, len(kps), per)):
+        landmarks[f"sample_{i:04d}"] = kps[s:s + per]
+        label_dict[f"sample_{i:04d}"] = labels[s:s + per]
+    ds = SlidingWindowDataset(landmarks, label_dict, window=15, step=5)
+    sampler = WindowBatchSampler(ds, batch_size=64, shuffle=True, seed=ctx["seed"])
+    return ds, sampler
+
+
+def _run_window_getitem(state):
+    ds, _ = state
+    n = min(len(ds), 20000)
+    for i in range(n):
+        ds[i]
+    return n
+
+
+def _run_window_batches(state):
+    ds, sampler = state
+    n = 0
+    for block in sampler:
+        n += len(ds[block]["x"])
+    return n
+
+
+def _setup_fusion(ctx):
+    import fusion
+
+    return fusion, synthetic_tcn_pred(ctx["labels"], ctx["seed"]), ctx["yolo_states"]
+
+
+def _run_fusion_offline(state):
+    fusion, df_tcn, df_yolo = state
+    _, smooth = fusion.fuse_frames(df_tcn, df_yolo)
+    fusion.events_from_codes(smooth)
+    return len(df_tcn)
+
+
+def _setup_fusion_stream(ctx):
+    fusion, df_tcn, df_yolo = _setup_fusion(ctx)
+    n = min(len(df_tcn), 50000)
+    tcn = df_tcn.to_numpy()[:n]
+    yolo = df_yolo[list(fusion.YOLO_COLUMNS)].to_numpy()[:n]
+    return fusion, tcn, yolo
+
+
+def _run_fusion_stream(state):
+    fusion, tcn, yolo = state
+    stream = fusion.FusionStream()
+    for t, y in zip(tcn, yolo):
+        stream.push(t, y)
+    stream.flush()
+    return len(tcn)
+
+
+def _setup_frame_metrics(ctx):
+    fns = load_notebook_functions(os.path.join(ROOT_DIR, "test_data", "score.ipynb"),
+                                  ["compute_frame_metrics"])
+    y_true = ctx["labels"]
+    y_pred = synthetic_tcn_pred(y_true, ctx["seed"]).to_numpy()
+    return fns["compute_frame_metrics"], y_true, y_pred
+
+
+def _run_frame_metrics(state):
+    compute_frame_metrics, y_true, y_pred = state
+    compute_frame_metrics(y_true, y_pred)
+    return len(y_true)
+
+
+# name → (setup, run, 항목 단위)
+BENCHMARKS = {
+    "save_frame":       (_setup_save_frame, _run_save_frame, "frames"),
+    "extract_hands":    (_setup_extract_hands, _run_extract_hands, "frames"),
+    "window_getitem":   (_setup_window_dataset, _run_window_getitem, "windows"),
+    "window_batches":   (_setup_window_dataset, _run_window_batches, "windows"),
+    "fusion_offline":   (_setup_fusion, _run_fusion_offline, "frames"),
+    "fusion_stream":    (_setup_fusion_stream, _run_fusion_stream, "frames"),
+    "frame_metrics":    (_setup_frame_metrics, _run_frame_metrics, "frames"),
+}
+
+
+# =========================
+# 5. 실행 / 결과 기록
+# =========================
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def make_context(minutes=SCALE_MINUTES, fps=BENCH_FPS, seed=SEED,
+                 frame_limit=FRAME_STAGE_LIMIT):
+    """배열 단계가 공유하는 합성 데이터 (프레임은 단계마다 필요한 만큼 따로 생성)"""
+    n_frames = int(minutes * 60 * fps)
+    labels, _ = synthetic_labels(n_frames, seed=seed, fps=fps)
+    return {
+        "n_frames": n_frames,
+        "fps": fps,
+        "seed": seed,
+        "frame_limit": frame_limit,
+        "labels": labels,
+        "hand_kps": synthetic_hand_kps(n_frames, seed=seed),
+        "yolo_states": synthetic_yolo_states(labels, seed=seed),
+        "cleanup": [],
+    }
+
+
+def run_benchmarks(minutes=SCALE_MINUTES, fps=BENCH_FPS, stages=STAGES, repeats=REPEATS,
+                   seed=SEED, frame_limit=FRAME_STAGE_LIMIT, results_path=RESULTS_PATH):
+    """
+    stages 를 순서대로 측정하고 결과를 results_path 에 한 줄씩(JSON) 추가한다.
+    반환: 결과 dict 리스트
+    """
+    names = list(BENCHMARKS) if stages is None else list(stages)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown} (available: {list(BENCHMARKS)})")
+
+    t0 = time.perf_counter()
+    ctx = make_context(minutes, fps, seed, frame_limit)
+    print(f"[INFO] synthetic data: {ctx['n_frames']} frames ({minutes} min @ {fps}fps), "
+          f"{time.perf_counter() - t0:.1f}s")
+
+    common = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "minutes": minutes,
+        "fps": fps,
+        "seed": seed,
+        "repeats": repeats,
+    }
+
+    results = []
+    try:
+        for name in names:
+            setup, run, unit = BENCHMARKS[name]
+            row = dict(common, stage=name, unit=unit)
+            try:
+                state = setup(ctx)
+                run(state)      # warm-up (import, 캐시, 파일 생성 등은 측정에서 제외)
+                times = []
+                for _ in range(repeats):
+                    t = time.perf_counter()
+                    items = run(state)
+                    times.append(time.perf_counter() - t)
+            except ImportError as e:
+                row.update(status="skipped", reason=str(e))
+                print(f"[SKIP] {name}: {e}")
+            else:
+                median = float(np.median(times))
+                row.update(status="ok", items=items, median_sec=median, min_sec=float(min(times)),
+                           items_per_sec=items / median if median > 0 else 0.0)
+                print(f"[BENCH] {name:<15} {items:>9} {unit:<8} "
+                      f"median {median * 1000:9.1f} ms  {row['items_per_sec']:12.1f} {unit}/sec")
+            results.append(row)
+    finally:
+        for path in ctx["cleanup"]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    if results_path:
+        with open(results_path, "a", encoding="utf-8") as f:
+            for row in results:
+                f.write(json.dumps(row) + "\n")
+        print(f"[SAVE] {results_path} ({len(results)} rows)")
+    return results
+
+
+def main():
+    run_benchmarks()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,10 @@
 import cv2
 
+from multi_camera import discover_cameras
+
 def find_cameras(max_index=5):
-    available = []
-    for i in range(max_index + 1):
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)  # Windows면 CAP_DSHOW 추천
-        if cap.isOpened():
-            ret, frame = cap.read()
-            if ret:
-                print(f"Camera index {i}: OK")
-                available.append(i)
-            cap.release()
-    return available
+    # 인덱스마다 open/read/release 를 병렬로 수행 (multi_camera.discover_cameras)
+    return discover_cameras(max_index, cv2.CAP_DSHOW)  # Windows면 CAP_DSHOW 추천
 
 if __name__ == "__main__":
     cams = find_cameras(5)
@@ -1,9 +1,9 @@
 import cv2
 import os
-import glob
-import re
 import time
 
+from session_catalog import SessionCatalog
+
 # =========================
 # 1. 카메라 설정
 # =========================
@@ -48,26 +48,20 @@ def get_output_dir():
 
 def get_next_index(out_dir):
     """
-    photo_<code>_<번호>.jpg 의 번호 자동 증가
+    photo_<code>_<번호>.jpg 의 번호 자동 증가.
+    폴더를 매번 훑지 않고 out_dir/_catalog_index.json 카운터에서 받는다 (session_catalog.py)
     """
-    pattern = os.path.join(out_dir, f"photo_{SCENARIO_CODE}_*.jpg")
-    paths = glob.glob(pattern)
-
-    indices = []
-    for path in paths:
-        name = os.path.basename(path)
-        m = re.match(rf"photo_{re.escape(SCENARIO_CODE)}_(\d+)\.jpg", name)
-        if m:
-            indices.append(int(m.group(1)))
-
-    return max(indices) + 1 if indices else 1
+    return SessionCatalog(out_dir).next_index(f"photo_{SCENARIO_CODE}")
 
 
 def save_photo(frame):
     out_dir = get_output_dir()
     idx = get_next_index(out_dir)
-    filename = os.path.join(out_dir, f"photo_{SCENARIO_CODE}_{idx:03d}.jpg")
+    name = f"photo_{SCENARIO_CODE}_{idx:03d}"
+    filename = os.path.join(out_dir, name + ".jpg")
     cv2.imwrite(filename, frame)
+    h, w = frame.shape[:2]
+    SessionCatalog(out_dir).record(name, width=w, height=h)
     print(f"[INFO] Saved photo → {filename}")
 
 
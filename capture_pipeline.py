@@ -0,0 +1,285 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import METRICS
+
+"""
+캡처/인코딩 분리 파이프라인 (producer / consumer)
+
+기존 녹화 루프는 cap.read() → draw_overlay() → imshow/waitKey → save_frame()
+을 한 스레드에서 순서대로 처리하기 때문에, JPEG 인코딩(cv2.imwrite)이
+느리면 카메라 읽기까지 같이 느려진다. (실측 7~7.5fps)
+
+구성:
+    - CaptureGrabber : 카메라 읽기 전용 스레드 (producer)
+    - FrameRingBuffer: 크기가 고정된 프레임 버퍼 (가득 차면 새 프레임 drop)
+    - ThreadedRecorder: 위 둘 + 인코더 워커 풀(consumer)을 묶은 녹화기
+
+사용 예:
+    recorder = ThreadedRecorder(cap, save_frame, buffer_size=64, num_workers=3)
+    recorder.start()
+    seq, frame = recorder.read(seq)              # 미리보기용 최신 프레임
+    recorder.start_session(frames_dir, sidecar)  # 녹화 시작 (sidecar 는 생략 가능)
+    stats = recorder.stop_session()              # 남은 프레임 저장까지 기다린 후 통계 반환
+    recorder.close()
+"""
+
+
+class FrameRingBuffer:
+    """
+    grabber → encoder 사이의 고정 크기 프레임 버퍼.
+
+    - put() : 버퍼가 가득 차 있으면 프레임을 버리고 dropped 를 1 증가
+    - get() : 프레임이 들어올 때까지 대기, close() 후 비어 있으면 None
+    - join(): 버퍼에 들어간 프레임이 전부 처리(task_done)될 때까지 대기
+
+    통계:
+        dropped    : 버퍼가 가득 차서 버려진 프레임 수
+        high_water : 버퍼에 동시에 쌓였던 최대 프레임 수
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        self._pending = 0   # 버퍼에 있거나 인코딩 중인 프레임 수
+        self._closed = False
+
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def put(self, item):
+        with self._lock:
+            if self._closed or len(self._items) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            self._pending += 1
+            self.high_water = max(self.high_water, len(self._items))
+            self._not_empty.notify()
+            return True
+
+    def get(self):
+        with self._lock:
+            while not self._items and not self._closed:
+                self._not_empty.wait()
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def task_done(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._all_done.notify_all()
+
+    def join(self):
+        with self._lock:
+            while self._pending > 0:
+                self._all_done.wait()
+
+    def reset_stats(self):
+        with self._lock:
+            self.dropped = 0
+            self.high_water = len(self._items)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+
+
+class CaptureGrabber(threading.Thread):
+    """
+    카메라에서 프레임을 계속 읽어오는 전용 스레드.
+
+    - 가장 최근 프레임은 read()로 가져가서 미리보기/키 입력 루프에 사용
+    - 녹화 중(begin() ~ end())이면 프레임을 버퍼에 넣는다
+      버퍼 항목: (frames_dir, sidecar, frame_idx, frame, capture_ts, pos_msec, dropped)
+    - frame_idx 는 버퍼에 들어간(= 저장될) 프레임에만 0부터 순서대로 부여
+      → drop 된 프레임은 번호를 받지 않으므로 frame_%06d 파일 번호에 빈 곳이 없다
+    - capture_ts 는 grab() 직후에 잰 시간 (sidecar 가 없으면 monotonic 값 그대로)
+    """
+
+    def __init__(self, cap, buffer):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.buffer = buffer
+
+        self._cond = threading.Condition()
+        self._latest = None
+        self._seq = 0             # 지금까지 읽은 전체 프레임 수 (새 프레임 확인용)
+        self._frames_dir = None   # None 이면 녹화 중 아님
+        self._sidecar = None
+        self._frame_idx = 0       # 이번 세션에서 버퍼에 넣은 프레임 수
+        self._dropped_run = 0     # 마지막으로 버퍼에 넣은 프레임 이후 drop 수
+        self._running = True
+        self.failed = False
+
+    def run(self):
+        while self._running:
+            # grab 직후 시각을 찍기 위해 read() 대신 grab() + retrieve()
+            t_read = time.perf_counter()
+            if not self.cap.grab():
+                self.failed = True
+                break
+            grabbed_at = time.monotonic()
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                self.failed = True
+                break
+            METRICS.observe("capture", (time.perf_counter() - t_read) * 1000.0)
+
+            with self._cond:
+                if self._frames_dir is not None:
+                    sidecar = self._sidecar
+                    capture_ts = grabbed_at - sidecar.t0 if sidecar is not None else grabbed_at
+                    pos_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+                    item = (self._frames_dir, sidecar, self._frame_idx, frame,
+                            capture_ts, pos_msec, self._dropped_run)
+                    if self.buffer.put(item):
+                        self._frame_idx += 1
+                        self._dropped_run = 0
+                    else:
+                        self._dropped_run += 1
+                        METRICS.incr("dropped")
+                self._latest = frame
+                self._seq += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def read(self, last_seq=0, timeout=1.0):
+        """
+        last_seq 이후에 들어온 새 프레임을 기다렸다가 (seq, frame)을 반환한다.
+        카메라 읽기에 실패했거나 스레드가 멈췄으면 (seq, None)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_seq or not self._running,
+                                timeout=timeout)
+            if self._seq <= last_seq:
+                return last_seq, None
+            return self._seq, self._latest
+
+    @property
+    def frame_idx(self):
+        """가장 최근에 버퍼에 들어간 프레임 번호 (녹화 직후라 아직 없으면 0)"""
+        with self._cond:
+            return max(0, self._frame_idx - 1)
+
+    def begin(self, frames_dir, sidecar=None):
+        with self._cond:
+            self._frames_dir = frames_dir
+            self._sidecar = sidecar
+            self._frame_idx = 0
+            self._dropped_run = 0
+
+    def end(self):
+        """녹화를 멈추고, 이번 세션에서 버퍼에 넣은 프레임 수를 반환"""
+        with self._cond:
+            self._frames_dir = None
+            self._sidecar = None
+            return self._frame_idx
+
+    def stop(self):
+        self._running = False
+
+
+class ThreadedRecorder:
+    """
+    CaptureGrabber + FrameRingBuffer + 인코더 워커 풀을 묶은 녹화기.
+
+    cap         : cv2.VideoCapture (이미 열린 상태)
+    save_fn     : save_fn(frames_dir, frame_idx, frame) 형태의 프레임 저장 함수
+                  (recoding_video 의 save_frame 을 그대로 넘기면 됨)
+    buffer_size : 인코딩 대기 프레임 최대 수 (넘치면 drop)
+    num_workers : 인코딩 워커 스레드 수
+                  (cv2.imwrite 는 GIL 을 놓고 돌기 때문에 스레드로도 병렬 처리됨)
+    """
+
+    def __init__(self, cap, save_fn, buffer_size=64, num_workers=3):
+        self.save_fn = save_fn
+        self.buffer = FrameRingBuffer(buffer_size)
+        self.grabber = CaptureGrabber(cap, self.buffer)
+        self.workers = [
+            threading.Thread(target=self._encode_loop, daemon=True, name=f"encoder-{i}")
+            for i in range(num_workers)
+        ]
+
+    def start(self):
+        self.grabber.start()
+        for w in self.workers:
+            w.start()
+
+    def read(self, last_seq=0, timeout=1.0):
+        return self.grabber.read(last_seq, timeout)
+
+    @property
+    def failed(self):
+        return self.grabber.failed
+
+    @property
+    def frame_idx(self):
+        return self.grabber.frame_idx
+
+    def start_session(self, frames_dir, sidecar=None):
+        """
+        녹화 시작.
+        sidecar: frame_sidecar.FrameSidecarWriter (주면 프레임별 타임스탬프/인코딩 시간 기록)
+        """
+        self.buffer.reset_stats()
+        self.grabber.begin(frames_dir, sidecar)
+
+    def stop_session(self):
+        """
+        녹화를 멈추고, 버퍼에 남은 프레임이 모두 저장될 때까지 기다린다.
+
+        반환:
+            {"frames": 저장된 프레임 수,
+             "dropped": 버퍼가 가득 차서 버려진 프레임 수,
+             "queue_high_water": 버퍼 최대 적재량,
+             "queue_capacity": 버퍼 크기}
+        """
+        n_frames = self.grabber.end()
+        self.buffer.join()
+        return {
+            "frames": n_frames,
+            "dropped": self.buffer.dropped,
+            "queue_high_water": self.buffer.high_water,
+            "queue_capacity": self.buffer.capacity,
+        }
+
+    def close(self):
+        self.grabber.stop()
+        self.grabber.join(timeout=2.0)
+        self.buffer.close()
+        for w in self.workers:
+            w.join(timeout=2.0)
+
+    def _encode_loop(self):
+        while True:
+            item = self.buffer.get()
+            if item is None:
+                break
+            frames_dir, sidecar, frame_idx, frame, capture_ts, pos_msec, dropped = item
+            try:
+                t_start = time.perf_counter()
+                self.save_fn(frames_dir, frame_idx, frame)
+                encode_ms = (time.perf_counter() - t_start) * 1000.0
+                if sidecar is not None:
+                    sidecar.write(frame_idx, capture_ts, pos_msec, encode_ms, dropped)
+            except Exception as e:
+                print(f"[WARN] Encoder failed on frame {frame_idx}: {e}")
+            finally:
+                self.buffer.task_done()
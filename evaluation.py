@@ -0,0 +1,352 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from event_labels import ACTION_KEYS, LABEL_SUFFIX, load_labels
+
+"""
+A/S/D 라벨 평가 엔진 (프레임 + 세그먼트 단위)
+
+test_data/score.ipynb 의 evaluate_from_gt_folder 는 호출할 때마다 GT(_lange.csv) /
+예측(yolo_to_tcn_*.csv) 쌍을 pandas 로 다시 읽고 (ignore_all_zero=False / True 두 번이면
+폴더 전체를 두 번 읽음) 프레임 단위 TP/FP/FN 만 계산한다.
+공정 단계가 "빠졌는지" 는 프레임 정확도보다 구간(세그먼트)을 맞췄는지, 시작/끝이
+몇 프레임 어긋났는지가 중요하다.
+
+    pairs = load_eval_pairs(gt_root, pred_root)          # 쌍마다 한 번만 읽음 (비트 패킹)
+    df_all, df_event = evaluate_pairs(pairs, fps=7.5)     # 전체 / 이벤트 프레임 기준 한 번에
+
+프레임 지표 : 클래스별 라벨을 np.packbits 로 8프레임 = 1바이트로 묶고
+              AND / XOR + popcount 로 TP/FP/FN 을 센다 (기존 compute_frame_metrics 와 같은 값)
+세그먼트 지표: 클래스별 1 구간(run)을 뽑아 temporal IoU >= iou_thr 인 GT/예측 구간을
+              IoU 큰 순서로 1:1 매칭
+                seg_tp / seg_fp / seg_fn(= 놓친 단계), seg_precision / recall / f1
+                onset / offset 오차 (예측 - GT, 프레임 / 초)
+여러 예측 변형(threshold, min_seg_len, 융합 가중치 ...)은 (V, N, C) 로 쌓아서
+evaluate_variants 한 번으로 같이 평가한다 (프레임 지표는 V 축까지 한 번에 계산).
+"""
+
+CLASSES = list(ACTION_KEYS)
+PRED_PREFIX = "yolo_to_tcn_"
+IOU_THRESHOLD = 0.5
+DEFAULT_FPS = 30.0
+
+_EPS = 1e-8
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+# =========================
+# 1. 비트 패킹 라벨
+# =========================
+
+def pack_labels(y):
+    """
+    (..., N, C) 0/1 → (..., C, ceil(N/8)) uint8 (프레임 축을 비트로 묶음, 남는 비트는 0)
+    """
+    y = np.asarray(y).astype(bool)
+    return np.packbits(np.moveaxis(y, -1, -2), axis=-1)
+
+
+def popcount(packed, axis=-1):
+    return _POPCOUNT[packed].sum(axis=axis, dtype=np.int64)
+
+
+class EvalPair:
+    """
+    영상 하나의 GT / 예측 (공통 길이 n 으로 자름)
+        y_true, y_pred : (n, C) bool
+        gt_packed      : (C, B) / event_mask : (B,) GT 에 A/S/D 중 하나라도 있는 프레임
+    """
+
+    def __init__(self, name, y_true, y_pred):
+        n = min(len(y_true), len(y_pred))
+        if len(y_true) != len(y_pred):
+            print(f"[WARN] Length mismatch: gt={len(y_true)}, pred={len(y_pred)}; "
+                  f"using first {n} frames")
+        self.name = name
+        self.n = n
+        self.y_true = np.asarray(y_true[:n]).astype(bool)
+        self.y_pred = np.asarray(y_pred[:n]).astype(bool)
+        self.gt_packed = pack_labels(self.y_true)
+        self.valid = np.packbits(np.ones(n, dtype=bool))
+        self.event_mask = np.packbits(self.y_true.any(axis=1))
+
+
+def _read_pred(path, classes=CLASSES):
+    pred = pd.read_csv(path)
+    missing = [c for c in classes if c not in pred.columns]
+    if missing:
+        raise ValueError(f"Missing label columns in {path}: {missing}")
+    # 기존 score.ipynb 와 같이 int 캐스팅 (0/1 예측이면 그대로)
+    return pred[classes].to_numpy().astype(np.int64) == 1
+
+
+def _gt_files(gt_root):
+    """{video_base: GT 경로}, 같은 세션의 .npy 와 .csv 가 둘 다 있으면 .npy 사용"""
+    found = {}
+    for fname in sorted(os.listdir(gt_root)):
+        base, ext = os.path.splitext(fname)
+        if ext.lower() not in (".csv", ".npy"):
+            continue
+        if not base.endswith(LABEL_SUFFIX):
+            print(f"[WARN] Unexpected GT name (skip): {fname}")
+            continue
+        video_base = base[:-len(LABEL_SUFFIX)]
+        if ext.lower() == ".npy" or video_base not in found:
+            found[video_base] = os.path.join(gt_root, fname)
+    return found
+
+
+def load_eval_pairs(gt_root, pred_root, classes=CLASSES, pred_prefix=PRED_PREFIX):
+    """
+    GT 폴더 기준으로 <video>_lange.(npy|csv) ↔ <pred_prefix><video>.csv 쌍을 한 번 읽는다.
+    반환: [EvalPair, ...]
+    """
+    pairs = []
+    for video_base, gt_path in _gt_files(gt_root).items():
+        pred_name = f"{pred_prefix}{video_base}.csv"
+        pred_path = os.path.join(pred_root, pred_name)
+        if not os.path.exists(pred_path):
+            print(f"[WARN] Pred not found for GT {os.path.basename(gt_path)} (expected {pred_name})")
+            continue
+        y_true = load_labels(gt_path)[:, :len(classes)]
+        pairs.append(EvalPair(video_base, y_true, _read_pred(pred_path, classes)))
+    return pairs
+
+
+# =========================
+# 2. 프레임 지표 (비트 연산)
+# =========================
+
+def frame_counts(gt_packed, pred_packed, mask):
+    """
+    gt_packed (C, B), pred_packed (..., C, B), mask (B,) → tp, fp, fn, n_eval
+    tp/fp/fn: (..., C)
+    """
+    tp = popcount(pred_packed & gt_packed & mask)
+    fp = popcount(pred_packed & ~gt_packed & mask)
+    fn = popcount(~pred_packed & gt_packed & mask)
+    return tp, fp, fn, int(popcount(mask))
+
+
+def frame_metrics(pair, pred_packed, ignore_all_zero=False, classes=CLASSES):
+    """
+    기존 compute_frame_metrics 와 같은 값. pred_packed: (..., C, B)
+    반환: dict (값은 변형 축 (...) 모양의 배열)
+    """
+    mask = pair.event_mask if ignore_all_zero else pair.valid
+    tp, fp, fn, n = frame_counts(pair.gt_packed, pred_packed, mask)
+    tn = n - tp - fp - fn
+
+    out = {"n_frames_eval": np.full(tp.shape[:-1], n)}
+    # 모든 클래스가 맞은 프레임: 클래스별 XOR 을 OR 로 합친 뒤 0 인 비트
+    wrong = np.bitwise_or.reduce(pred_packed ^ pair.gt_packed, axis=-2)
+    out["exact_frame_acc"] = (n - popcount(wrong & mask)) / max(n, 1)
+
+    TP, FP, FN, TN = tp.sum(-1), fp.sum(-1), fn.sum(-1), tn.sum(-1)
+    p = TP / (TP + FP + _EPS)
+    r = TP / (TP + FN + _EPS)
+    out["micro_precision"] = p
+    out["micro_recall"] = r
+    out["micro_f1"] = 2 * p * r / (p + r + _EPS)
+    out["micro_acc"] = (TP + TN) / (TP + TN + FP + FN + _EPS)
+
+    for i, cls in enumerate(classes):
+        p = tp[..., i] / (tp[..., i] + fp[..., i] + _EPS)
+        r = tp[..., i] / (tp[..., i] + fn[..., i] + _EPS)
+        out[f"{cls}_precision"] = p
+        out[f"{cls}_recall"] = r
+        out[f"{cls}_f1"] = 2 * p * r / (p + r + _EPS)
+        out[f"{cls}_support"] = tp[..., i] + fn[..., i]
+    return out
+
+
+# =========================
+# 3. 세그먼트 지표 (IoU 매칭)
+# =========================
+
+def segments(y):
+    """(N,) 0/1 → 1 구간의 (start, end) 배열 (end 포함)"""
+    d = np.diff(np.concatenate(([0], np.asarray(y, dtype=np.int8), [0])))
+    return np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1
+
+
+def match_segments(gs, ge, ps, pe, iou_thr=IOU_THRESHOLD):
+    """
+    GT 구간 (gs, ge) / 예측 구간 (ps, pe) → IoU >= iou_thr 인 쌍을 IoU 큰 순서로 1:1 매칭
+    반환: (gt 인덱스 배열, pred 인덱스 배열, IoU 배열)
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if len(gs) == 0 or len(ps) == 0:
+        return empty, empty, np.zeros(0)
+
+    inter = (np.minimum(ge[:, None], pe[None, :]) - np.maximum(gs[:, None], ps[None, :]) + 1)
+    inter = np.clip(inter, 0, None)
+    union = (ge - gs + 1)[:, None] + (pe - ps + 1)[None, :] - inter
+    iou = inter / union
+
+    gi, pi = np.nonzero(iou >= iou_thr)
+    order = np.argsort(-iou[gi, pi], kind="stable")
+    used_g, used_p = set(), set()
+    mg, mp = [], []
+    for g, p in zip(gi[order], pi[order]):
+        if g in used_g or p in used_p:
+            continue
+        used_g.add(g)
+        used_p.add(p)
+        mg.append(g)
+        mp.append(p)
+    mg, mp = np.asarray(mg, dtype=np.int64), np.asarray(mp, dtype=np.int64)
+    return mg, mp, iou[mg, mp]
+
+
+def segment_metrics(y_true, y_pred, fps=DEFAULT_FPS, iou_thr=IOU_THRESHOLD, classes=CLASSES):
+    """
+    (N, C) GT / 예측 → 클래스별 + 전체 세그먼트 지표 dict
+        seg_tp, seg_fp, seg_fn(놓친 GT 구간), seg_precision / recall / f1, mean_iou
+        onset_err / offset_err : 매칭된 구간의 |예측 - GT| 평균 (프레임), *_sec 는 초
+        onset_bias             : 예측 - GT 평균 (음수면 일찍 시작)
+    """
+    out = {}
+    all_tp = all_fp = all_fn = 0
+    all_on, all_off, all_iou = [], [], []
+    for i, cls in enumerate(classes):
+        gs, ge = segments(y_true[:, i])
+        ps, pe = segments(y_pred[:, i])
+        mg, mp, iou = match_segments(gs, ge, ps, pe, iou_thr)
+
+        tp, fp, fn = len(mg), len(ps) - len(mg), len(gs) - len(mg)
+        onset = ps[mp] - gs[mg]
+        offset = pe[mp] - ge[mg]
+        p = tp / (tp + fp + _EPS)
+        r = tp / (tp + fn + _EPS)
+        out[f"{cls}_seg_tp"] = tp
+        out[f"{cls}_seg_fp"] = fp
+        out[f"{cls}_seg_fn"] = fn
+        out[f"{cls}_seg_f1"] = 2 * p * r / (p + r + _EPS)
+        out[f"{cls}_onset_err"] = float(np.abs(onset).mean()) if tp else np.nan
+        out[f"{cls}_offset_err"] = float(np.abs(offset).mean()) if tp else np.nan
+
+        all_tp, all_fp, all_fn = all_tp + tp, all_fp + fp, all_fn + fn
+        all_on.append(onset)
+        all_off.append(offset)
+        all_iou.append(iou)
+
+    onset, offset, iou = np.concatenate(all_on), np.concatenate(all_off), np.concatenate(all_iou)
+    p = all_tp / (all_tp + all_fp + _EPS)
+    r = all_tp / (all_tp + all_fn + _EPS)
+    has = len(onset) > 0
+    out.update({
+        "seg_tp": all_tp, "seg_fp": all_fp, "seg_fn": all_fn,
+        "seg_precision": p, "seg_recall": r, "seg_f1": 2 * p * r / (p + r + _EPS),
+        "mean_iou": float(iou.mean()) if has else np.nan,
+        "onset_err": float(np.abs(onset).mean()) if has else np.nan,
+        "offset_err": float(np.abs(offset).mean()) if has else np.nan,
+        "onset_bias": float(onset.mean()) if has else np.nan,
+        "onset_err_sec": float(np.abs(onset).mean() / fps) if has else np.nan,
+        "offset_err_sec": float(np.abs(offset).mean() / fps) if has else np.nan,
+    })
+    return out
+
+
+# =========================
+# 4. 폴더 / 변형 평가
+# =========================
+
+def _with_mean(rows):
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        mean_row = {"video": "mean"}
+        for col in df.columns:
+            if col != "video":
+                mean_row[col] = df[col].mean()
+        df = pd.concat([df, pd.DataFrame([mean_row])], ignore_index=True)
+    return df
+
+
+def evaluate_pairs(pairs, fps=DEFAULT_FPS, iou_thr=IOU_THRESHOLD, classes=CLASSES):
+    """
+    읽어 둔 쌍 전체 평가 (파일을 다시 읽지 않음)
+    반환: (df_all, df_event)
+        df_all  : 전체 프레임 기준 프레임 지표 + 세그먼트 지표
+        df_event: GT 이벤트 프레임(A/S/D 중 하나라도 1)만 기준 프레임 지표
+        마지막 행(video="mean")은 평균 (기존 evaluate_from_gt_folder 와 같은 형식)
+    """
+    rows_all, rows_event = [], []
+    for pair in pairs:
+        pred_packed = pack_labels(pair.y_pred)
+        row = {"video": pair.name}
+        row.update({k: v.item() for k, v in
+                    frame_metrics(pair, pred_packed, False, classes).items()})
+        row.update(segment_metrics(pair.y_true, pair.y_pred, fps, iou_thr, classes))
+        rows_all.append(row)
+
+        row = {"video": pair.name}
+        row.update({k: v.item() for k, v in
+                    frame_metrics(pair, pred_packed, True, classes).items()})
+        rows_event.append(row)
+    return _with_mean(rows_all), _with_mean(rows_event)
+
+
+def evaluate_variants(pair, variants, fps=DEFAULT_FPS, iou_thr=IOU_THRESHOLD,
+                      ignore_all_zero=False, classes=CLASSES):
+    """
+    영상 하나에 대해 예측 변형 여러 개를 한 번에 평가.
+    variants: {이름: (N, C) 0/1} 또는 (V, N, C) 배열 (이름은 0..V-1)
+    반환: 변형마다 한 행인 DataFrame (프레임 지표 + 세그먼트 지표)
+    """
+    if isinstance(variants, dict):
+        names = list(variants)
+        stack = np.stack([np.asarray(variants[k])[:pair.n] for k in names])
+    else:
+        stack = np.asarray(variants)[:, :pair.n]
+        names = list(range(len(stack)))
+    stack = stack.astype(bool)
+
+    # 프레임 지표: 변형 축까지 한 번에 (V, C, B)
+    fm = frame_metrics(pair, pack_labels(stack), ignore_all_zero, classes)
+    rows = []
+    for v, name in enumerate(names):
+        row = {"video": pair.name, "variant": name}
+        row.update({k: val[v].item() for k, val in fm.items()})
+        row.update(segment_metrics(pair.y_true, stack[v], fps, iou_thr, classes))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def drop_short_segments(y, min_seg_len):
+    """(..., N, C) 0/1 에서 길이가 min_seg_len 보다 짧은 1 구간을 0 으로"""
+    y = np.asarray(y).astype(bool)
+    if min_seg_len <= 1:
+        return y
+    moved = np.moveaxis(y, -2, -1)                          # (..., C, N)
+    flat = moved.reshape(-1, moved.shape[-1])
+    out = flat.copy()
+    for row, src in zip(out, flat):
+        s, e = segments(src)
+        for a, b in zip(s[e - s + 1 < min_seg_len], e[e - s + 1 < min_seg_len]):
+            row[a:b + 1] = False
+    return np.moveaxis(out.reshape(moved.shape), -1, -2)
+
+
+def threshold_variants(scores, thresholds=(0.5,), min_seg_lens=(1,)):
+    """
+    (N, C) 점수(확률) → {(threshold, min_seg_len): (N, C) 0/1} 변형 묶음
+    threshold 는 (T, 1, 1) 브로드캐스트 한 번으로 전부 만든다.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    th = np.asarray(thresholds, dtype=np.float32)[:, None, None]
+    binary = scores[None] >= th                                  # (T, N, C)
+    variants = {}
+    for msl in min_seg_lens:
+        smoothed = drop_short_segments(binary, msl)
+        for t, y in zip(thresholds, smoothed):
+            variants[(float(t), int(msl))] = y
+    return variants
+
+
+def summarize_variants(df, sort_by="seg_f1"):
+    """evaluate_variants 결과(여러 영상 concat) → 변형별 평균, sort_by 내림차순"""
+    num = df.drop(columns=["video"]).groupby("variant", sort=False).mean(numeric_only=True)
+    return num.sort_values(sort_by, ascending=False)
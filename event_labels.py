@@ -0,0 +1,221 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from frame_sidecar import read_sidecar, sidecar_path_from_events
+
+"""
+이벤트 CSV(<세션>_events.csv) → 프레임별 A/S/D 구간 라벨 컴파일러
+
+lendmark_npz.ipynb 의 generate_labels_from_csv_dir 는 세션마다 CSV 를 세 번 읽고
+(inspect_event_csv, verify_labels, build_interval_labels)
+build_interval_labels 는 df.iterrows() 로 이벤트마다 토글 상태를 갱신한 뒤
+float32 라벨을 _lange.csv 텍스트로 쓴다.
+
+여기서는
+    - CSV 를 frame_idx / flag_key 두 컬럼만 한 번 읽음
+    - 토글 상태 = 이벤트 one-hot 의 누적 XOR, 이벤트 사이 구간은 np.repeat 으로 한 번에 채움
+      (프레임 수와 상관없이 이벤트 수만큼만 연산)
+    - 같은 파싱 결과로 검증 (verify_labels 와 같은 메시지)
+    - 라벨은 <세션>_lange.npy (uint8, (N, 3)) 로 저장, CSV 는 선택 (기존 _lange.csv 와 같은 내용)
+    - 폴더 단위는 프로세스 풀로 병렬 처리
+
+프레임 수(n_frames)는
+    default_frames → 세션 사이드카(_frames.bin) 레코드 수 → CSV 최대 frame_idx + TAIL_FRAMES
+순서로 정한다.
+
+사용 예:
+    summary = compile_label_dir(r"test_data\\test_flagle", r"test_data\\test_csv", write_csv=True)
+    labels = load_labels(r"test_data\\test_csv\\video_normal_new_001_lange.npy")   # (N, 3) uint8
+"""
+
+KEY_TO_ACTION = {
+    "A": 0,  # 작업 A
+    "S": 1,  # 작업 B
+    "D": 2,  # 작업 C
+}
+ACTION_KEYS = ["A", "S", "D"]   # 라벨 컬럼 순서
+NUM_ACTIONS = len(ACTION_KEYS)
+
+EVENT_FRAME_COL = "frame_idx"
+EVENT_KEY_COL   = "flag_key"
+
+EVENTS_SUFFIX = "_events.csv"
+LABEL_SUFFIX  = "_lange"        # 기존 파일 이름 (score.ipynb 가 이 이름으로 찾음)
+TAIL_FRAMES   = 30              # 프레임 수를 CSV 에서 추정할 때 마지막 이벤트 뒤 여유
+
+NUM_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MIN_PARALLEL_JOBS = 8           # 세션이 이보다 적으면 프로세스를 띄우지 않고 바로 처리
+
+# 0/1 세 개 → 기존 float32 to_csv 와 같은 한 줄 ("0.0,1.0,0.0")
+_CSV_ROWS = np.array([",".join("1.0" if (code >> (NUM_ACTIONS - 1 - i)) & 1 else "0.0"
+                               for i in range(NUM_ACTIONS))
+                      for code in range(1 << NUM_ACTIONS)], dtype=object)
+_CSV_WEIGHTS = (1 << np.arange(NUM_ACTIONS - 1, -1, -1)).astype(np.uint8)
+
+
+# =========================
+# 1. 파싱 / 라벨 생성
+# =========================
+
+def parse_events(csv_path):
+    """
+    이벤트 CSV 를 한 번 읽는다.
+    반환: (frames (E,) int64, actions (E,) int64, keys: CSV 에 나온 키 집합)
+          frames / actions 는 KEY_TO_ACTION 에 있는 키의 이벤트만, frame_idx 순서로 정렬
+    """
+    df = pd.read_csv(csv_path, usecols=[EVENT_FRAME_COL, EVENT_KEY_COL])
+    df = df.dropna(subset=[EVENT_FRAME_COL])
+    keys = df[EVENT_KEY_COL].dropna().astype(str).str.strip().str.upper()
+    key_set = set(keys.unique())
+
+    actions = keys.map(KEY_TO_ACTION).reindex(df.index)
+    known = actions.notna().to_numpy()
+    frames = df[EVENT_FRAME_COL].to_numpy()[known].astype(np.int64)
+    actions = actions.to_numpy()[known].astype(np.int64)
+
+    order = np.argsort(frames, kind="stable")
+    return frames[order], actions[order], key_set
+
+
+def build_interval_labels(n_frames, frames, actions):
+    """
+    토글 이벤트 → (n_frames, NUM_ACTIONS) uint8 라벨.
+    같은 키가 다시 들어오면 0→1, 1→0 으로 반전 (이벤트 프레임부터 적용).
+
+    이벤트 i 이후 상태 = one-hot(actions[:i+1]) 의 누적 XOR,
+    구간 길이 = 다음 이벤트 프레임 - 이번 이벤트 프레임 → np.repeat 으로 펼친다.
+    """
+    n_frames = int(n_frames)
+    onehot = np.zeros((len(actions) + 1, NUM_ACTIONS), dtype=np.uint8)
+    onehot[np.arange(1, len(actions) + 1), actions] = 1
+    states = np.bitwise_xor.accumulate(onehot, axis=0)          # states[0] = 시작 상태(0)
+
+    bounds = np.concatenate(([0], np.clip(frames, 0, n_frames), [n_frames]))
+    return np.repeat(states, np.diff(bounds), axis=0)
+
+
+def check_labels(labels, actions, keys):
+    """
+    라벨 검증 (lendmark_npz.ipynb 의 verify_labels 와 같은 항목). 반환: 문제 메시지 리스트
+    """
+    issues = []
+    used = set(np.unique(actions).tolist())
+    active = labels.any(axis=0) if len(labels) else np.zeros(NUM_ACTIONS, dtype=bool)
+
+    for key, idx in KEY_TO_ACTION.items():
+        if idx not in used and active[idx]:
+            issues.append(f"[verify_labels] '{key}' appears in labels but never appears in CSV.")
+    for key, idx in KEY_TO_ACTION.items():
+        if idx in used and not active[idx]:
+            issues.append(f"[verify_labels] '{key}' appears in CSV but label column is all 0.")
+
+    unknown = sorted(k for k in keys if k not in KEY_TO_ACTION)
+    if unknown:
+        issues.append(f"[verify_labels] undefined keys in CSV: {unknown}")
+    return issues
+
+
+def session_frame_count(csv_path, frames, default_frames=None, tail_frames=TAIL_FRAMES):
+    """프레임 수: default_frames → 사이드카 레코드 수 → 최대 frame_idx + tail_frames"""
+    if default_frames is not None:
+        return int(default_frames), "default"
+    sidecar = sidecar_path_from_events(csv_path)
+    if os.path.exists(sidecar):
+        return len(read_sidecar(sidecar)), "sidecar"
+    max_frame = int(frames.max()) if len(frames) else 0
+    return max_frame + tail_frames, "csv"
+
+
+# =========================
+# 2. 저장 / 읽기
+# =========================
+
+def write_labels_csv(path, labels):
+    """기존 pd.DataFrame(float32).to_csv 와 같은 내용 ("A,S,D" + "0.0,1.0,0.0" ...)"""
+    codes = labels @ _CSV_WEIGHTS if len(labels) else np.zeros(0, dtype=np.uint8)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(ACTION_KEYS) + "\n")
+        if len(codes):
+            f.write("\n".join(_CSV_ROWS[codes]) + "\n")
+
+
+def load_labels(path):
+    """<세션>_lange.npy 또는 _lange.csv → (N, NUM_ACTIONS) uint8"""
+    path = str(path)
+    if path.endswith(".npy"):
+        return np.load(path)
+    return pd.read_csv(path)[ACTION_KEYS].to_numpy().astype(np.uint8)
+
+
+def label_paths(out_dir, sample_name):
+    base = os.path.join(out_dir, f"{sample_name}{LABEL_SUFFIX}")
+    return base + ".npy", base + ".csv"
+
+
+# =========================
+# 3. 세션 / 폴더 단위
+# =========================
+
+def compile_labels(csv_path, out_dir, default_frames=None, write_csv=False):
+    """
+    이벤트 CSV 하나 → <out_dir>/<세션>_lange.npy (+ 선택: _lange.csv)
+    반환: 요약 dict (sample, n_frames, frames_from, n_events, issues)
+    """
+    sample_name = os.path.basename(str(csv_path))
+    if sample_name.endswith(EVENTS_SUFFIX):
+        sample_name = sample_name[:-len(EVENTS_SUFFIX)]
+
+    frames, actions, keys = parse_events(csv_path)
+    n_frames, frames_from = session_frame_count(csv_path, frames, default_frames)
+    labels = build_interval_labels(n_frames, frames, actions)
+    issues = check_labels(labels, actions, keys)
+
+    npy_path, csv_out = label_paths(out_dir, sample_name)
+    np.save(npy_path, labels)
+    if write_csv:
+        write_labels_csv(csv_out, labels)
+
+    return {"sample": sample_name, "n_frames": n_frames, "frames_from": frames_from,
+            "n_events": int(len(actions)), "issues": issues}
+
+
+def _compile_job(args):
+    return compile_labels(*args)
+
+
+def compile_label_dir(csv_dir, out_dir, default_frames=None, write_csv=False,
+                      num_workers=NUM_WORKERS):
+    """
+    csv_dir 의 *_events.csv 전부를 컴파일. 세션이 MIN_PARALLEL_JOBS 개 이상이면 프로세스 풀 사용.
+    반환: 세션별 요약 DataFrame
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    csv_paths = sorted(os.path.join(csv_dir, n) for n in os.listdir(csv_dir)
+                       if n.endswith(EVENTS_SUFFIX))
+    if not csv_paths:
+        print("[ERROR] No *_events.csv found in:", csv_dir)
+        return pd.DataFrame(columns=["sample", "n_frames", "frames_from", "n_events", "issues"])
+
+    t_start = time.perf_counter()
+    jobs = [(p, out_dir, default_frames, write_csv) for p in csv_paths]
+    if num_workers > 1 and len(jobs) >= MIN_PARALLEL_JOBS:
+        chunksize = max(1, len(jobs) // (num_workers * 4))
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            results = list(pool.map(_compile_job, jobs, chunksize=chunksize))
+    else:
+        results = [_compile_job(job) for job in jobs]
+    seconds = time.perf_counter() - t_start
+
+    for r in results:
+        if r["issues"]:
+            print(f"[WARN] issues in {r['sample']}:")
+            for issue in r["issues"]:
+                print("   -", issue)
+    n_bad = sum(1 for r in results if r["issues"])
+    print(f"[INFO] {len(results)} session(s) compiled to {out_dir} in {seconds:.2f}s "
+          f"({n_bad} with issues)")
+    return pd.DataFrame(results)
@@ -0,0 +1,349 @@
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from frame_store import RawFrameWriter
+from metrics import METRICS
+
+"""
+프레임 인코더 (백엔드 선택 + 품질/처리량 조절기)
+
+save_frame 은 지금까지 항상 IMAGE_FORMAT / JPEG_QUALITY=95 (PNG 압축 3) 로
+1280×720 원본을 저장했다. 뒤 단계(MediaPipe, YOLO imgsz=640)가 실제로 필요한 것보다
+CPU / 디스크를 많이 써서, 인코딩 버퍼가 밀리면 프레임이 drop 된다.
+
+    백엔드 (ENCODER_BACKEND)
+        - "opencv"    : cv2.imencode + 파일 쓰기 (jpg / png / 그 외 OpenCV 지원 포맷)
+        - "turbojpeg" : PyTurboJPEG (libjpeg-turbo 직접 호출, jpg 만, 설치되어 있을 때만)
+        - "auto"      : turbojpeg 가 있으면 turbojpeg, 없으면 opencv
+        - 압축 없이 저장하는 raw 는 STORAGE_MODE="raw" (frame_store.RawFrameWriter)
+
+    QualityGovernor
+        인코딩 버퍼 적재율(0~1)을 보고 단계(level)를 올리고 내린다.
+            적재율 > high_water 이면 한 단계 낮은 품질 / 해상도로
+            적재율 < low_water  가 한동안 유지되면 한 단계 복귀
+        단계는 DEFAULT_LEVELS 순서 (뒤로 갈수록 빠르고 작음, 마지막 두 단계는 640 px 로 축소)
+
+    프레임별로 실제 쓴 설정은 <세션폴더>_encode.bin 에 frame_idx 위치로 기록한다.
+        (level, backend, quality, queue_pct, width, height, nbytes, encode_ms)
+        read_encode_log() 로 np.memmap 구조화 배열로 읽는다.
+
+사용 예:
+    governor = QualityGovernor(depth_fn=lambda: len(buffer) / buffer.capacity)
+    encoder = FrameEncoder(frames_dir, "jpg", backend="auto", governor=governor)
+    encoder.write(frame_idx, frame)     # 여러 워커에서 동시에 호출해도 됨
+    encoder.close()
+"""
+
+YOLO_IMGSZ = 640
+
+# jpeg_quality : JPG 품질, png_compression : PNG 압축 레벨(0~9, 낮을수록 빠름)
+# max_side     : 긴 변을 이 크기로 줄여서 저장 (None 이면 원본 크기)
+EncodeLevel = namedtuple("EncodeLevel", ["jpeg_quality", "png_compression", "max_side"])
+
+DEFAULT_LEVELS = (
+    EncodeLevel(95, 3, None),
+    EncodeLevel(85, 1, None),
+    EncodeLevel(75, 1, None),
+    EncodeLevel(85, 1, YOLO_IMGSZ),
+    EncodeLevel(70, 0, YOLO_IMGSZ),
+)
+
+BACKEND_IDS = {"opencv": 0, "turbojpeg": 1, "raw": 2}
+
+ENCODE_LOG_SUFFIX = "_encode.bin"
+ENCODE_LOG_MAGIC = b"FENC"
+ENCODE_LOG_VERSION = 1
+ENCODE_LOG_HEADER_FORMAT = "<4sHH"
+ENCODE_LOG_HEADER_SIZE = struct.calcsize(ENCODE_LOG_HEADER_FORMAT)   # 8
+
+ENCODE_RECORD_DTYPE = np.dtype([
+    ("level", "u1"),
+    ("backend", "u1"),
+    ("quality", "u1"),      # jpg 품질 또는 png 압축 레벨
+    ("queue_pct", "u1"),    # 단계를 고를 때의 버퍼 적재율(%)
+    ("width", "<u2"),
+    ("height", "<u2"),
+    ("nbytes", "<u4"),
+    ("encode_ms", "<f4"),
+])
+
+
+# =========================
+# 1. 백엔드
+# =========================
+
+class OpenCVBackend:
+    name = "opencv"
+
+    def encode(self, frame, fmt, level):
+        """반환: (bytes 버퍼, 기록용 quality 값)"""
+        if fmt in ("jpg", "jpeg"):
+            quality = level.jpeg_quality
+            ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        elif fmt == "png":
+            quality = level.png_compression
+            ok, buf = cv2.imencode(".png", frame, [cv2.IMWRITE_PNG_COMPRESSION, quality])
+        else:
+            quality = 0
+            ok, buf = cv2.imencode("." + fmt, frame)
+        if not ok:
+            raise RuntimeError(f"cv2.imencode failed for format {fmt}")
+        return buf, quality
+
+
+class TurboJpegBackend:
+    """
+    libjpeg-turbo (pip install PyTurboJPEG) 로 JPG 인코딩.
+    OpenCV 빌드에 따라 다르지만 같은 품질에서 보통 더 빠르다. jpg 외 포맷은 OpenCV 로 넘긴다.
+    """
+    name = "turbojpeg"
+
+    def __init__(self):
+        from turbojpeg import TJPF_BGR, TJSAMP_420, TurboJPEG
+
+        self._jpeg = TurboJPEG()
+        self._pixel_format = TJPF_BGR
+        self._subsample = TJSAMP_420
+        self._fallback = OpenCVBackend()
+
+    def encode(self, frame, fmt, level):
+        if fmt not in ("jpg", "jpeg"):
+            return self._fallback.encode(frame, fmt, level)
+        buf = self._jpeg.encode(frame, quality=level.jpeg_quality,
+                                pixel_format=self._pixel_format,
+                                jpeg_subsample=self._subsample)
+        return buf, level.jpeg_quality
+
+
+def make_backend(name="auto"):
+    """
+    "opencv" / "turbojpeg" / "auto".
+    "auto" 는 PyTurboJPEG 가 없거나 libjpeg-turbo 라이브러리를 못 찾으면 opencv 로 돌아간다.
+    """
+    if name == "opencv":
+        return OpenCVBackend()
+    if name == "turbojpeg":
+        return TurboJpegBackend()
+    if name == "auto":
+        try:
+            return TurboJpegBackend()
+        except (ImportError, OSError, RuntimeError):
+            return OpenCVBackend()
+    raise ValueError(f"Unknown encoder backend: {name}")
+
+
+def resize_to_max_side(frame, max_side):
+    """긴 변이 max_side 보다 크면 비율 유지하며 축소 (INTER_AREA)"""
+    if not max_side:
+        return frame
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1.0:
+        return frame
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def write_image(path, frame, fmt, level=DEFAULT_LEVELS[0], backend=None):
+    """
+    세션 인코더 없이 한 장 저장 (기존 save_frame 과 같은 결과).
+    반환: (저장한 bytes 수, quality)
+    """
+    backend = backend or OpenCVBackend()
+    buf, quality = backend.encode(resize_to_max_side(frame, level.max_side), fmt, level)
+    with open(path, "wb") as f:
+        f.write(buf)
+    return len(buf), quality
+
+
+# =========================
+# 2. 품질 / 처리량 조절기
+# =========================
+
+class QualityGovernor:
+    """
+    인코딩 버퍼 적재율에 따라 EncodeLevel 을 고른다.
+
+    depth_fn        : 현재 적재율(0~1)을 돌려주는 함수 (None 이면 항상 min_level)
+    levels          : EncodeLevel 목록 (앞쪽이 고품질)
+    high_water      : 이보다 차 있으면 한 단계 내림
+    low_water       : 이보다 비어 있는 상태가 recover_frames 프레임 동안 이어지면 한 단계 올림
+    cooldown_frames : 단계를 바꾼 뒤 이 프레임 수 동안은 다시 내리지 않음 (버퍼가 줄어들 시간)
+    min_level       : 이보다 좋은 단계로는 올리지 않음 (예: 처음부터 640 px 로 저장)
+
+    여러 인코더 워커가 동시에 choose() 를 불러도 된다.
+    """
+
+    def __init__(self, depth_fn=None, levels=DEFAULT_LEVELS, high_water=0.5, low_water=0.1,
+                 cooldown_frames=15, recover_frames=90, min_level=0):
+        self.depth_fn = depth_fn
+        self.levels = tuple(levels)
+        self.high_water = high_water
+        self.low_water = low_water
+        self.cooldown_frames = cooldown_frames
+        self.recover_frames = recover_frames
+        self.min_level = min(max(0, min_level), len(self.levels) - 1)
+
+        self._lock = threading.Lock()
+        self.level = self.min_level
+        self._since_change = 0
+        self._calm = 0
+
+    def reset(self):
+        with self._lock:
+            self.level = self.min_level
+            self._since_change = 0
+            self._calm = 0
+
+    def choose(self):
+        """반환: (level 번호, EncodeLevel, 적재율)"""
+        depth = float(self.depth_fn()) if self.depth_fn is not None else 0.0
+        with self._lock:
+            self._since_change += 1
+            if depth > self.high_water:
+                self._calm = 0
+                if (self.level < len(self.levels) - 1
+                        and self._since_change >= self.cooldown_frames):
+                    self.level += 1
+                    self._since_change = 0
+                    METRICS.incr("encode_level_down")
+            elif depth < self.low_water:
+                self._calm += 1
+                if self.level > self.min_level and self._calm >= self.recover_frames:
+                    self.level -= 1
+                    self._since_change = 0
+                    self._calm = 0
+                    METRICS.incr("encode_level_up")
+            else:
+                self._calm = 0
+            level = self.level
+        return level, self.levels[level], depth
+
+
+# =========================
+# 3. 세션 인코더 + 프레임별 기록
+# =========================
+
+def encode_log_path(frames_dir):
+    """세션 폴더 video/normal/video_normal_001 → video/normal/video_normal_001_encode.bin"""
+    return os.path.normpath(str(frames_dir)) + ENCODE_LOG_SUFFIX
+
+
+class EncodeLogWriter:
+    """frame_idx 위치에 ENCODE_RECORD_DTYPE 레코드를 쓴다 (frame_sidecar 와 같은 방식)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = open(path, "wb")
+        self._f.write(struct.pack(ENCODE_LOG_HEADER_FORMAT, ENCODE_LOG_MAGIC,
+                                  ENCODE_LOG_VERSION, ENCODE_RECORD_DTYPE.itemsize))
+
+    def write(self, frame_idx, **fields):
+        rec = np.zeros(1, dtype=ENCODE_RECORD_DTYPE)
+        for key, value in fields.items():
+            rec[key] = value
+        with self._lock:
+            self._f.seek(ENCODE_LOG_HEADER_SIZE + frame_idx * ENCODE_RECORD_DTYPE.itemsize)
+            self._f.write(rec.tobytes())
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+
+def read_encode_log(path):
+    """<세션폴더>_encode.bin → (N,) 구조화 배열 (np.memmap)"""
+    with open(path, "rb") as f:
+        magic, version, rec_size = struct.unpack(ENCODE_LOG_HEADER_FORMAT,
+                                                 f.read(ENCODE_LOG_HEADER_SIZE))
+    if magic != ENCODE_LOG_MAGIC:
+        raise ValueError(f"Not an encode log: {path}")
+    if rec_size != ENCODE_RECORD_DTYPE.itemsize:
+        raise ValueError(f"Unsupported encode log record size {rec_size} (version {version}): {path}")
+    n = (os.path.getsize(path) - ENCODE_LOG_HEADER_SIZE) // rec_size
+    if n <= 0:
+        return np.zeros(0, dtype=ENCODE_RECORD_DTYPE)
+    return np.memmap(path, dtype=ENCODE_RECORD_DTYPE, mode="r",
+                     offset=ENCODE_LOG_HEADER_SIZE, shape=(n,))
+
+
+class FrameEncoder:
+    """
+    녹화 세션 하나의 프레임 저장기.
+
+    frames_dir      : 세션 폴더
+    fmt             : "jpg" / "png" / ... 또는 "raw" (frames.raw 하나에 압축 없이 저장)
+    backend         : make_backend() 이름 또는 백엔드 객체 (raw 에서는 무시)
+    governor        : QualityGovernor (None 이면 DEFAULT_LEVELS[0] 고정)
+    log             : True 면 <세션폴더>_encode.bin 에 프레임별 설정 기록
+    raw_prealloc    : raw 모드에서 미리 잡아 둘 프레임 수
+
+    raw 모드는 인코딩이 없으므로 품질 단계는 쓰지 않고, 해상도는 governor.min_level 단계의
+    max_side 로 고정한다. (frames.raw 는 프레임 크기가 모두 같아야 함)
+    """
+
+    def __init__(self, frames_dir, fmt="jpg", backend="auto", governor=None,
+                 log=True, raw_prealloc=1800):
+        os.makedirs(frames_dir, exist_ok=True)
+        self.frames_dir = frames_dir
+        self.fmt = fmt.lower()
+        self.governor = governor
+        self.raw = self.fmt == "raw"
+
+        if self.raw:
+            self.backend = None
+            self.backend_id = BACKEND_IDS["raw"]
+            self._raw_writer = RawFrameWriter(frames_dir, prealloc_frames=raw_prealloc)
+            self._raw_level = (governor.min_level if governor is not None else 0)
+        else:
+            self.backend = make_backend(backend) if isinstance(backend, str) else backend
+            self.backend_id = BACKEND_IDS.get(self.backend.name, 255)
+            self._raw_writer = None
+            self.ext = ".jpg" if self.fmt in ("jpg", "jpeg") else "." + self.fmt
+
+        self.log = EncodeLogWriter(encode_log_path(frames_dir)) if log else None
+
+    def _choose(self):
+        if self.raw:
+            levels = self.governor.levels if self.governor is not None else DEFAULT_LEVELS
+            return self._raw_level, levels[self._raw_level], 0.0
+        if self.governor is None:
+            return 0, DEFAULT_LEVELS[0], 0.0
+        return self.governor.choose()
+
+    def write(self, frame_idx, frame):
+        t_start = time.perf_counter()
+        level_idx, level, depth = self._choose()
+        frame = resize_to_max_side(frame, level.max_side)
+
+        if self.raw:
+            self._raw_writer.write(frame_idx, frame)
+            nbytes, quality = frame.nbytes, 0
+        else:
+            buf, quality = self.backend.encode(frame, self.fmt, level)
+            path = os.path.join(self.frames_dir, f"frame_{frame_idx:06d}{self.ext}")
+            with open(path, "wb") as f:
+                f.write(buf)
+            nbytes = len(buf)
+
+        if self.log is not None:
+            h, w = frame.shape[:2]
+            self.log.write(frame_idx, level=level_idx, backend=self.backend_id,
+                           quality=quality, queue_pct=min(100, int(round(depth * 100))),
+                           width=w, height=h, nbytes=nbytes,
+                           encode_ms=(time.perf_counter() - t_start) * 1000.0)
+        return nbytes
+
+    def close(self):
+        if self._raw_writer is not None:
+            self._raw_writer.close()
+        if self.log is not None:
+            self.log.close()
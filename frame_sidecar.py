@@ -0,0 +1,143 @@
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+"""
+녹화 세션별 프레임 인덱스 사이드카 (<세션이름>_frames.bin)
+
+이벤트 CSV의 time_sec 는 draw_overlay / waitKey 이후에 잰 시간이고
+frame_idx 는 단순 루프 카운터라서, 지금까지는 frame_idx / time_sec 평균으로
+FPS를 추정(estimate_fps_from_events)해야 했다.
+사이드카에는 프레임마다 grab 직후의 시간을 기록해 두므로 실제 타임스탬프를
+그대로 쓸 수 있다.
+
+파일 구조 (little endian):
+    header (16 bytes)
+        magic    : b"FIDX"
+        version  : uint16
+        rec_size : uint16  (레코드 1개 크기, 읽을 때 검증용)
+        t0_wall  : float64 (세션 시작 시각, time.time() 값)
+    record × N (frame_idx 순서, 레코드 i = frame_%06d 의 i)
+        capture_ts : float64 세션 시작 후 경과 시간(초), grab 직후 monotonic clock
+        pos_msec   : float64 cv2.CAP_PROP_POS_MSEC (지원 안 하는 장치는 0 또는 -1)
+        encode_ms  : float32 프레임 저장(인코딩+쓰기)에 걸린 시간(ms)
+        dropped    : uint8   이 프레임 직전에 버려진 프레임 수 (255에서 포화)
+
+읽기는 np.memmap 으로 하기 때문에 프레임 하나 조회가 O(1)이고
+전체 파일을 메모리에 올리지 않는다.
+"""
+
+SIDECAR_SUFFIX = "_frames.bin"
+SIDECAR_MAGIC = b"FIDX"
+SIDECAR_VERSION = 1
+
+HEADER_FORMAT = "<4sHHd"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)   # 16
+
+FRAME_RECORD_DTYPE = np.dtype([
+    ("capture_ts", "<f8"),
+    ("pos_msec", "<f8"),
+    ("encode_ms", "<f4"),
+    ("dropped", "u1"),
+])
+
+
+def sidecar_path_from_events(event_path):
+    """
+    이벤트 CSV 경로에서 사이드카 경로를 만든다.
+    예: video/normal/video_normal_001_events.csv → video/normal/video_normal_001_frames.bin
+    """
+    event_path = str(event_path)
+    if event_path.endswith("_events.csv"):
+        return event_path[:-len("_events.csv")] + SIDECAR_SUFFIX
+    return os.path.splitext(event_path)[0] + SIDECAR_SUFFIX
+
+
+class FrameSidecarWriter:
+    """
+    세션 사이드카 기록기.
+
+    - write() 는 frame_idx 위치에 레코드를 직접 써서, 인코더 워커가
+      프레임 순서와 다르게 끝나도 파일 안에서는 frame_idx 순서가 유지된다
+    - 여러 스레드에서 동시에 호출해도 안전 (내부 lock)
+    """
+
+    def __init__(self, path, t0_wall=None, t0=None):
+        self.path = path
+        self.t0_wall = time.time() if t0_wall is None else t0_wall
+        # capture_ts 기준 시각 (monotonic)
+        # 여러 카메라를 같은 시간축으로 맞출 때는 같은 t0 를 넘긴다 (multi_camera.py)
+        self.t0 = time.monotonic() if t0 is None else t0
+
+        self._lock = threading.Lock()
+        self._f = open(path, "wb")
+        self._f.write(struct.pack(HEADER_FORMAT, SIDECAR_MAGIC, SIDECAR_VERSION,
+                                  FRAME_RECORD_DTYPE.itemsize, self.t0_wall))
+        self.n_frames = 0
+
+    def now(self):
+        """세션 시작 후 경과 시간(초). grab 직후에 호출해서 capture_ts 로 사용"""
+        return time.monotonic() - self.t0
+
+    def write(self, frame_idx, capture_ts, pos_msec=0.0, encode_ms=0.0, dropped=0):
+        rec = np.zeros(1, dtype=FRAME_RECORD_DTYPE)
+        rec["capture_ts"] = capture_ts
+        rec["pos_msec"] = pos_msec
+        rec["encode_ms"] = encode_ms
+        rec["dropped"] = min(int(dropped), 255)
+
+        with self._lock:
+            self._f.seek(HEADER_SIZE + frame_idx * FRAME_RECORD_DTYPE.itemsize)
+            self._f.write(rec.tobytes())
+            self.n_frames = max(self.n_frames, frame_idx + 1)
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+
+def read_sidecar_header(path):
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    magic, version, rec_size, t0_wall = struct.unpack(HEADER_FORMAT, raw)
+    if magic != SIDECAR_MAGIC:
+        raise ValueError(f"Not a frame sidecar file: {path}")
+    if rec_size != FRAME_RECORD_DTYPE.itemsize:
+        raise ValueError(f"Unsupported sidecar record size {rec_size} (version {version}): {path}")
+    return {"version": version, "rec_size": rec_size, "t0_wall": t0_wall}
+
+
+def read_sidecar(path):
+    """
+    사이드카를 memory map 으로 연다.
+
+    반환: (N,) 구조화 배열 (np.memmap)
+        records["capture_ts"][i], records["dropped"][i] ... 처럼 사용
+    """
+    read_sidecar_header(path)
+    n_bytes = os.path.getsize(path) - HEADER_SIZE
+    n = n_bytes // FRAME_RECORD_DTYPE.itemsize
+    if n <= 0:
+        return np.zeros(0, dtype=FRAME_RECORD_DTYPE)
+    return np.memmap(path, dtype=FRAME_RECORD_DTYPE, mode="r",
+                     offset=HEADER_SIZE, shape=(n,))
+
+
+def frame_times(path):
+    """프레임별 capture 타임스탬프(초) 배열 (N,)"""
+    return read_sidecar(path)["capture_ts"]
+
+
+def estimate_fps_from_sidecar(path):
+    """
+    실제 타임스탬프 기반 FPS.
+    (N-1) / (마지막 프레임 시각 - 첫 프레임 시각)
+    """
+    ts = frame_times(path)
+    if len(ts) < 2 or ts[-1] <= ts[0]:
+        return 0.0
+    return float((len(ts) - 1) / (ts[-1] - ts[0]))
@@ -0,0 +1,418 @@
+import os
+import re
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+"""
+세션 프레임 저장소 (frame store)
+
+세션 폴더(video_<code>_<번호>/) 하나를 "프레임 번호로 읽을 수 있는 저장소"로 다룬다.
+형식은 세 가지:
+
+    1) jpeg     : frame_000000.jpg, frame_000001.jpg, ... (기존 방식)
+    2) segments : seg_00000.avi, seg_00001.avi, ... (MJPG, 기본 60초 단위로 분할)
+                  + frame_index.bin (frame_idx → (segment, offset) 인덱스)
+    3) raw      : frames.raw 하나 (헤더 + 압축하지 않은 uint8 BGR 프레임 × N)
+                  인코딩 비용이 0 이라 CPU 가 모자랄 때용, 대신 용량이 크다 (720p 약 2.7MB/프레임)
+
+세션이 수천 개가 되면 jpeg 방식은 작은 파일 수백만 개가 되고
+os.listdir / natsorted 만으로도 오래 걸린다. segments 방식은 세션당 파일이
+몇 개뿐이고, 인덱스로 원하는 프레임을 바로 찾아 읽는다.
+
+읽는 쪽은 형식과 상관없이 open_frame_store() 하나만 쓰면 된다.
+
+    with open_frame_store("video/normal/video_normal_001") as store:
+        print(len(store))
+        frame = store.read(100)              # 임의 접근
+        for idx, frame in store.iter_frames():  # 순차 읽기
+            ...
+
+mp4/avi 파일 경로를 넘기면 영상 파일 자체도 같은 방식으로 읽을 수 있다.
+(video_to_frames 로 프레임을 풀지 않고 바로 사용)
+"""
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+
+SEGMENT_INDEX_NAME = "frame_index.bin"
+SEGMENT_NAME_FORMAT = "seg_{:05d}.avi"
+
+# frame_index.bin 레코드: 프레임 i 가 seg_<segment>.avi 의 offset 번째 프레임
+SEGMENT_INDEX_DTYPE = np.dtype([("segment", "<u4"), ("offset", "<u4")])
+
+# frames.raw 헤더: magic, version, height, width, channels, n_frames
+RAW_FRAMES_NAME = "frames.raw"
+RAW_MAGIC = b"FRAW"
+RAW_VERSION = 1
+RAW_HEADER_FORMAT = "<4sHHHHI"
+RAW_HEADER_SIZE = struct.calcsize(RAW_HEADER_FORMAT)   # 16
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def _natural_key(name):
+    """frame_2.jpg < frame_10.jpg 가 되도록 숫자 부분을 정수로 비교"""
+    return [int(t) if t.isdigit() else t.lower() for t in _DIGITS.split(name)]
+
+
+# =========================
+# 1. 쓰기
+# =========================
+
+class SegmentedFrameWriter:
+    """
+    세션 폴더에 프레임을 MJPG AVI 세그먼트로 나눠서 저장한다.
+
+    session_dir     : 세션 폴더 (예: video/normal/video_normal_001)
+    fps             : 컨테이너에 기록할 nominal fps
+                      (실제 프레임 시각은 _frames.bin 사이드카 참고)
+    segment_seconds : 세그먼트 하나의 길이(초), fps × segment_seconds 프레임마다 새 파일
+    quality         : MJPG 품질 (0~100)
+
+    write(frame_idx, frame) 는 frame_idx 순서대로 호출해야 한다.
+    """
+
+    def __init__(self, session_dir, fps, segment_seconds=60, quality=95, fourcc="MJPG"):
+        os.makedirs(session_dir, exist_ok=True)
+        self.session_dir = session_dir
+        self.fps = fps
+        self.segment_frames = max(1, int(round(fps * segment_seconds)))
+        self.quality = quality
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+
+        self._writer = None
+        self._segment = -1
+        self._offset = 0
+        self._index_f = open(os.path.join(session_dir, SEGMENT_INDEX_NAME), "wb")
+        self.n_frames = 0
+
+    def _open_next_segment(self, frame):
+        if self._writer is not None:
+            self._writer.release()
+
+        self._segment += 1
+        self._offset = 0
+        h, w = frame.shape[:2]
+        path = os.path.join(self.session_dir, SEGMENT_NAME_FORMAT.format(self._segment))
+        self._writer = cv2.VideoWriter(path, self.fourcc, self.fps, (w, h))
+        if not self._writer.isOpened():
+            raise RuntimeError(f"Cannot open VideoWriter for {path}")
+        self._writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.quality)
+
+    def write(self, frame_idx, frame):
+        if frame_idx != self.n_frames:
+            raise ValueError(f"Frames must be written in order "
+                             f"(expected {self.n_frames}, got {frame_idx})")
+
+        if self._writer is None or self._offset >= self.segment_frames:
+            self._open_next_segment(frame)
+
+        self._writer.write(frame)
+        self._index_f.write(struct.pack("<II", self._segment, self._offset))
+        self._offset += 1
+        self.n_frames += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        if not self._index_f.closed:
+            self._index_f.close()
+
+
+class RawFrameWriter:
+    """
+    세션 폴더의 frames.raw 에 프레임을 압축 없이 저장한다.
+
+    session_dir       : 세션 폴더
+    prealloc_frames   : 처음에 미리 잡아 둘 프레임 수 (모자라면 두 배씩 늘림)
+
+    프레임 i 는 고정 위치(header + i × frame_bytes)에 쓰기 때문에
+    인코더 워커 여러 개가 순서와 상관없이 write() 해도 된다.
+    프레임 크기는 첫 write() 의 frame 으로 정해지고, 이후 크기가 다르면 에러.
+    """
+
+    def __init__(self, session_dir, prealloc_frames=1800):
+        os.makedirs(session_dir, exist_ok=True)
+        self.path = os.path.join(session_dir, RAW_FRAMES_NAME)
+        self.prealloc_frames = max(1, int(prealloc_frames))
+        self._lock = threading.Lock()
+        self._f = open(self.path, "w+b")
+        self.shape = None
+        self.frame_bytes = 0
+        self._capacity = 0
+        self.n_frames = 0
+
+    def _write_header(self):
+        h, w, c = self.shape
+        self._f.seek(0)
+        self._f.write(struct.pack(RAW_HEADER_FORMAT, RAW_MAGIC, RAW_VERSION,
+                                  h, w, c, self.n_frames))
+
+    def _reserve(self, n_frames):
+        # 파일 크기를 미리 늘려 두면 프레임마다 파일이 커지면서 생기는 조각화/메타데이터 갱신이 줄어든다
+        self._capacity = n_frames
+        self._f.truncate(RAW_HEADER_SIZE + n_frames * self.frame_bytes)
+
+    def write(self, frame_idx, frame):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+
+        with self._lock:
+            if self.shape is None:
+                self.shape = frame.shape
+                self.frame_bytes = frame.nbytes
+                self._write_header()
+                self._reserve(self.prealloc_frames)
+            elif frame.shape != self.shape:
+                raise ValueError(f"Raw store frame shape is {self.shape}, got {frame.shape}")
+
+            if frame_idx >= self._capacity:
+                self._reserve(max(frame_idx + 1, self._capacity * 2))
+            self._f.seek(RAW_HEADER_SIZE + frame_idx * self.frame_bytes)
+            self._f.write(frame.data)
+            self.n_frames = max(self.n_frames, frame_idx + 1)
+
+    def close(self):
+        with self._lock:
+            if self._f.closed:
+                return
+            if self.shape is not None:
+                # 미리 잡아 둔 뒷부분은 잘라내고, 헤더에 실제 프레임 수 기록
+                self._f.truncate(RAW_HEADER_SIZE + self.n_frames * self.frame_bytes)
+                self._write_header()
+            self._f.close()
+
+
+# =========================
+# 2. 읽기
+# =========================
+
+class _FrameStoreBase:
+    """
+    공통 인터페이스:
+        len(store)          : 프레임 수
+        store.read(i)       : i 번째 프레임 (BGR ndarray, 실패 시 None)
+        store.iter_frames() : (frame_idx, frame) 순차 반복
+        store.name(i)       : i 번째 프레임 이름 (CSV frame_name 컬럼용)
+    """
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def read(self, i):
+        raise NotImplementedError
+
+    def name(self, i):
+        return f"frame_{i:06d}.jpg"
+
+    def iter_frames(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield i, self.read(i)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JpegFolderStore(_FrameStoreBase):
+    """frame_*.jpg / *.png 이미지 폴더 (파일 이름 자연 정렬 순서가 frame_idx)"""
+
+    def __init__(self, frames_dir):
+        self.path = str(frames_dir)
+        with os.scandir(self.path) as it:
+            names = [e.name for e in it
+                     if e.is_file() and e.name.lower().endswith(IMAGE_EXTS)]
+        self.names = sorted(names, key=_natural_key)
+
+    def __len__(self):
+        return len(self.names)
+
+    def read(self, i):
+        return cv2.imread(os.path.join(self.path, self.names[i]))
+
+    def name(self, i):
+        return self.names[i]
+
+    def frame_path(self, i):
+        return os.path.join(self.path, self.names[i])
+
+
+class SegmentedFrameStore(_FrameStoreBase):
+    """
+    SegmentedFrameWriter 로 저장한 세션 폴더.
+
+    인덱스는 np.memmap 으로 열기 때문에 프레임 위치 조회가 O(1)이고,
+    연속된 프레임을 읽을 때는 seek 없이 이어서 decode 한다.
+    """
+
+    def __init__(self, session_dir):
+        self.path = str(session_dir)
+        index_path = os.path.join(self.path, SEGMENT_INDEX_NAME)
+        n = os.path.getsize(index_path) // SEGMENT_INDEX_DTYPE.itemsize
+        if n > 0:
+            self.index = np.memmap(index_path, dtype=SEGMENT_INDEX_DTYPE, mode="r", shape=(n,))
+        else:
+            self.index = np.zeros(0, dtype=SEGMENT_INDEX_DTYPE)
+
+        self._cap = None
+        self._cap_segment = -1
+        self._next_offset = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def _open_segment(self, segment):
+        if self._cap is not None:
+            self._cap.release()
+        path = os.path.join(self.path, SEGMENT_NAME_FORMAT.format(segment))
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Failed to open segment: {path}")
+        self._cap_segment = segment
+        self._next_offset = 0
+
+    def read(self, i):
+        segment, offset = int(self.index[i]["segment"]), int(self.index[i]["offset"])
+        if segment != self._cap_segment:
+            self._open_segment(segment)
+        if offset != self._next_offset:
+            # MJPG 는 모든 프레임이 키프레임이라 seek 위치가 정확함
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, offset)
+
+        ret, frame = self._cap.read()
+        self._next_offset = offset + 1
+        return frame if ret else None
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+            self._cap_segment = -1
+
+
+class RawFrameStore(_FrameStoreBase):
+    """
+    RawFrameWriter 로 저장한 세션 폴더 (frames.raw).
+    np.memmap 으로 열어서 임의 접근도 디코딩 없이 O(1).
+    """
+
+    def __init__(self, session_dir):
+        self.path = str(session_dir)
+        raw_path = os.path.join(self.path, RAW_FRAMES_NAME)
+        with open(raw_path, "rb") as f:
+            magic, version, h, w, c, n = struct.unpack(RAW_HEADER_FORMAT, f.read(RAW_HEADER_SIZE))
+        if magic != RAW_MAGIC:
+            raise ValueError(f"Not a raw frame file: {raw_path}")
+
+        frame_bytes = h * w * c
+        if n == 0 and frame_bytes:
+            # 녹화 도중 종료되어 헤더에 프레임 수가 안 들어간 경우 → 파일 크기로 추정
+            n = (os.path.getsize(raw_path) - RAW_HEADER_SIZE) // frame_bytes
+        if n > 0:
+            self.frames = np.memmap(raw_path, dtype=np.uint8, mode="r",
+                                    offset=RAW_HEADER_SIZE, shape=(n, h, w, c))
+        else:
+            self.frames = np.zeros((0, h, w, c), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def read(self, i):
+        # memmap 을 그대로 넘기면 호출한 쪽에서 그림을 그릴 수 없으므로 복사본 반환
+        return np.array(self.frames[i])
+
+
+class VideoFileStore(_FrameStoreBase):
+    """
+    mp4/avi 영상 파일을 프레임 저장소처럼 읽는다.
+    순차 읽기 위주 (mp4 임의 접근은 코덱에 따라 느리거나 부정확할 수 있음)
+    """
+
+    def __init__(self, video_path):
+        self.path = str(video_path)
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Failed to open video: {self.path}")
+        self._n = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self._next = 0
+
+    def __len__(self):
+        return self._n
+
+    def read(self, i):
+        if i != self._next:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+        ret, frame = self._cap.read()
+        self._next = i + 1
+        return frame if ret else None
+
+    def iter_frames(self, start=0, stop=None):
+        # 프레임 수 메타데이터가 틀린 영상도 있으므로 read 실패할 때까지 읽는다
+        if start != self._next:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self._next = start
+        while stop is None or self._next < stop:
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            yield self._next, frame
+            self._next += 1
+
+    def close(self):
+        self._cap.release()
+
+
+def is_segmented_store(path):
+    return os.path.isfile(os.path.join(path, SEGMENT_INDEX_NAME))
+
+
+def is_raw_store(path):
+    return os.path.isfile(os.path.join(path, RAW_FRAMES_NAME))
+
+
+def open_frame_store(path):
+    """
+    경로 형식에 맞는 프레임 저장소를 연다.
+        - frame_index.bin 이 있는 폴더 → SegmentedFrameStore
+        - frames.raw 가 있는 폴더       → RawFrameStore
+        - 이미지 폴더                   → JpegFolderStore
+        - mp4/avi 등 영상 파일          → VideoFileStore
+    """
+    path = str(path)
+    if os.path.isdir(path):
+        if is_segmented_store(path):
+            return SegmentedFrameStore(path)
+        if is_raw_store(path):
+            return RawFrameStore(path)
+        return JpegFolderStore(path)
+    if path.lower().endswith(VIDEO_EXTS):
+        return VideoFileStore(path)
+    raise ValueError(f"Not a frame store: {path}")
+
+
+def find_frame_stores(root_dir):
+    """
+    root_dir 아래의 세션 폴더(이미지 폴더, 세그먼트 / raw 저장소)를 모두 찾는다.
+    세그먼트 / raw 저장소 폴더 안쪽은 더 내려가지 않는다.
+    """
+    stores = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        if SEGMENT_INDEX_NAME in filenames or RAW_FRAMES_NAME in filenames:
+            stores.append(dirpath)
+            dirnames[:] = []
+            continue
+        if any(f.lower().endswith(IMAGE_EXTS) for f in filenames):
+            stores.append(dirpath)
+    return sorted(stores)
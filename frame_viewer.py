@@ -0,0 +1,383 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from frame_store import open_frame_store
+from result_cache import weights_hash
+from yolo_batch import (CLOSED_IDS, EMPTY_IDS, FULL_IDS, IMG_SIZE, OPEN_IDS,
+                        boxes_to_frame, detect_frames_cached, detector_key, preprocess_batch)
+
+"""
+프레임 리뷰 뷰어 (decode / 검출 캐시 + 앞뒤 prefetch)
+
+test_pred_bbox.ipynb 의 visualize_frames_with_yolo 는 A/D 로 한 칸 움직일 때마다
+JPEG 을 다시 읽고 YOLO 두 모델을 다시 돌린다. 2,000 프레임 세션을 훑어보면
+키를 누를 때마다 수백 ms 씩 기다린다.
+
+    - 디코딩한 프레임 : LRU 캐시 (lru_frames 장)
+    - 검출 결과       : DetectionCache (세션 + 모델 가중치 해시마다 npz 파일 하나)
+                        한 번 본 프레임은 세션을 다시 열어도 추론하지 않는다
+    - prefetch        : 백그라운드 스레드가 현재 프레임 앞뒤 K 장을 미리 읽고
+                        batch 로 검출해 둔다 (앞쪽 먼저: +1, -1, +2, -2, ...)
+    - result_cache    : 공용 ResultCache 를 넘기면 analyze_frame_folders / demo 에서
+                        이미 추론한 프레임은 세션 캐시에 없어도 추론하지 않는다
+
+검출 캐시 위치 (기본):
+    <세션 폴더의 상위>/out_yolo/viewer_cache/<세션이름>_<가중치해시>.npz
+    (analyze_frame_folders_batched 의 out_yolo/ 와 같은 폴더, 세션 폴더 순회에서 제외됨)
+
+사용 예:
+    detector = DualYoloDetector("best_openclose.pt", "best_fullempty.pt")
+    review_session("test_video/video_normal_001", detector, prefetch=8)
+"""
+
+VIEWER_CACHE_DIR = os.path.join("out_yolo", "viewer_cache")
+
+# BGR 색상 (test_pred_bbox.ipynb 와 같음)
+COLOR_OPEN   = (0, 255, 0)
+COLOR_CLOSED = (0, 0, 255)
+COLOR_FULL   = (255, 0, 0)
+COLOR_EMPTY  = (0, 255, 255)
+
+KEY_QUIT = (ord('q'), 27)
+KEY_NEXT = (ord('d'), 83)    # 83: 오른쪽 화살표
+KEY_PREV = (ord('a'), 81)    # 81: 왼쪽 화살표
+
+_EMPTY_BOXES = np.zeros((0, 6), dtype=np.float32)
+
+
+def detection_cache_path(store_path, model_key, cache_dir=None):
+    store_path = Path(store_path)
+    cache_dir = Path(cache_dir) if cache_dir is not None else store_path.parent / VIEWER_CACHE_DIR
+    return cache_dir / f"{store_path.name}_{model_key}.npz"
+
+
+# =========================
+# 1. 캐시
+# =========================
+
+class LRUCache:
+    """스레드 안전 LRU (key → value)"""
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+
+class DetectionCache:
+    """
+    frame_idx → (openclose 박스, fullempty 박스) (원본 프레임 좌표, (N, 6) float32).
+
+    path 를 주면 npz 로 저장 / 불러온다. flush_every 개가 새로 쌓일 때마다,
+    그리고 close() 할 때 저장 (임시 파일에 쓴 뒤 이름 바꾸기).
+        frame_idx (M,), oc_count (M,), fe_count (M,), oc (ΣN, 6), fe (ΣN, 6)
+    """
+
+    def __init__(self, path=None, flush_every=64):
+        self.path = Path(path) if path is not None else None
+        self.flush_every = flush_every
+        self._items = {}
+        self._dirty = 0
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def _load(self):
+        with np.load(self.path) as z:
+            idxs = z["frame_idx"]
+            oc_split = np.split(z["oc"], np.cumsum(z["oc_count"])[:-1]) if len(idxs) else []
+            fe_split = np.split(z["fe"], np.cumsum(z["fe_count"])[:-1]) if len(idxs) else []
+        for i, oc, fe in zip(idxs.tolist(), oc_split, fe_split):
+            self._items[i] = (oc, fe)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, frame_idx):
+        return frame_idx in self._items
+
+    def get(self, frame_idx):
+        return self._items.get(frame_idx)
+
+    def put(self, frame_idx, dets):
+        with self._lock:
+            self._items[frame_idx] = dets
+            self._dirty += 1
+            need_flush = self.path is not None and self._dirty >= self.flush_every
+        if need_flush:
+            self.flush()
+
+    def flush(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if self._dirty == 0:
+                return
+            idxs = sorted(self._items)
+            oc = [self._items[i][0] for i in idxs]
+            fe = [self._items[i][1] for i in idxs]
+            self._dirty = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f,
+                     frame_idx=np.asarray(idxs, dtype=np.int64),
+                     oc_count=np.asarray([len(b) for b in oc], dtype=np.int64),
+                     fe_count=np.asarray([len(b) for b in fe], dtype=np.int64),
+                     oc=np.concatenate(oc) if oc else _EMPTY_BOXES,
+                     fe=np.concatenate(fe) if fe else _EMPTY_BOXES)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self.flush()
+
+
+# =========================
+# 2. 프레임 + 검출 결과 조회 (prefetch)
+# =========================
+
+class FrameReviewer:
+    """
+    store    : frame_store 저장소
+    detector : yolo_batch.DualYoloDetector / MergedYoloDetector (detect_batch 사용)
+    det_cache: DetectionCache (None 이면 메모리에만 보관)
+    prefetch : 현재 프레임 앞뒤로 미리 준비할 프레임 수 K
+    batch_size: prefetch 검출 배치 크기
+    result_cache: result_cache.ResultCache (None 이면 사용 안 함)
+
+    get(idx) → (frame, (oc_boxes, fe_boxes))
+        frame 은 캐시에 있는 배열이므로 그림을 그릴 때는 복사해서 쓴다.
+    """
+
+    def __init__(self, store, detector, det_cache=None, lru_frames=256, prefetch=8,
+                 batch_size=8, img_size=IMG_SIZE, result_cache=None):
+        self.store = store
+        self.detector = detector
+        self.dets = det_cache if det_cache is not None else DetectionCache()
+        self.frames = LRUCache(max(lru_frames, 2 * prefetch + 1))
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.img_size = img_size
+        self.device = getattr(detector, "device", "cpu")
+        self.result_cache = result_cache
+        self._result_key = detector_key(detector, img_size) if result_cache is not None else None
+
+        # 저장소(세그먼트 VideoCapture 등)와 모델은 한 번에 한 스레드만 사용
+        self._io_lock = threading.Lock()
+        self._model_lock = threading.Lock()
+
+        self._center = 0
+        self._wake = threading.Event()
+        self._running = True
+        self._worker = None
+        if prefetch > 0:
+            self._worker = threading.Thread(target=self._prefetch_loop, daemon=True,
+                                            name="frame-prefetch")
+            self._worker.start()
+
+    def __len__(self):
+        return len(self.store)
+
+    def _read(self, idx):
+        frame = self.frames.get(idx)
+        if frame is None:
+            with self._io_lock:
+                frame = self.store.read(idx)
+            if frame is not None:
+                self.frames.put(idx, frame)
+        return frame
+
+    def _detect(self, idxs, frames):
+        if self.result_cache is not None:
+            with self._model_lock:
+                out = detect_frames_cached(self.detector, frames, self.result_cache,
+                                           self.img_size, self._result_key)
+        else:
+            x = preprocess_batch(frames, self.img_size, device=self.device)
+            with self._model_lock:
+                results = self.detector.detect_batch(x)
+            out = [(boxes_to_frame(oc, frame.shape, self.img_size),
+                    boxes_to_frame(fe, frame.shape, self.img_size))
+                   for frame, (oc, fe) in zip(frames, results)]
+        for idx, dets in zip(idxs, out):
+            self.dets.put(idx, dets)
+        return out
+
+    def get(self, idx):
+        self.seek(idx)
+        frame = self._read(idx)
+        if frame is None:
+            return None, (_EMPTY_BOXES, _EMPTY_BOXES)
+        dets = self.dets.get(idx)
+        if dets is None:
+            dets = self._detect([idx], [frame])[0]
+        return frame, dets
+
+    def seek(self, idx):
+        """현재 위치를 알려 주면 prefetch 스레드가 그 주변부터 다시 채운다"""
+        self._center = idx
+        self._wake.set()
+
+    def _prefetch_order(self, center):
+        order = []
+        for d in range(1, self.prefetch + 1):
+            for idx in (center + d, center - d):
+                if 0 <= idx < len(self.store):
+                    order.append(idx)
+        return order
+
+    def _prefetch_loop(self):
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            center = self._center
+            todo = [i for i in self._prefetch_order(center)
+                    if i not in self.dets or i not in self.frames]
+
+            for start in range(0, len(todo), self.batch_size):
+                if not self._running or self._center != center:
+                    break   # 사용자가 이동함 → 새 위치 기준으로 다시
+                idxs, frames = [], []
+                for idx in todo[start:start + self.batch_size]:
+                    frame = self._read(idx)
+                    if frame is not None and idx not in self.dets:
+                        idxs.append(idx)
+                        frames.append(frame)
+                if frames:
+                    try:
+                        self._detect(idxs, frames)
+                    except Exception as e:
+                        print(f"[WARN] Prefetch detection failed near frame {center}: {e}")
+
+    def close(self):
+        self._running = False
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5.0)
+        self.dets.close()
+
+
+# =========================
+# 3. 그리기 / 뷰어 루프
+# =========================
+
+def draw_detections(frame, oc_boxes, fe_boxes):
+    """
+    frame 에 박스를 직접 그리고 (open, closed, full, empty) 개수를 반환.
+    open/close 는 굵은 선 + 위쪽 라벨, full/empty 는 얇은 선 + 아래쪽 라벨.
+    """
+    open_count = closed_count = full_count = empty_count = 0
+
+    for x1, y1, x2, y2, _, cls_id in oc_boxes:
+        x1, y1, x2, y2, cls_id = int(x1), int(y1), int(x2), int(y2), int(cls_id)
+        if cls_id in OPEN_IDS:
+            color, label = COLOR_OPEN, "OPEN"
+            open_count += 1
+        elif cls_id in CLOSED_IDS:
+            color, label = COLOR_CLOSED, "CLOSED"
+            closed_count += 1
+        else:
+            color, label = (200, 200, 200), f"OC_{cls_id}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    for x1, y1, x2, y2, _, cls_id in fe_boxes:
+        x1, y1, x2, y2, cls_id = int(x1), int(y1), int(x2), int(y2), int(cls_id)
+        if cls_id in FULL_IDS:
+            color, label = COLOR_FULL, "FULL"
+            full_count += 1
+        elif cls_id in EMPTY_IDS:
+            color, label = COLOR_EMPTY, "EMPTY"
+            empty_count += 1
+        else:
+            color, label = (150, 150, 150), f"FE_{cls_id}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 1)
+        cv2.putText(frame, label, (x1, y2 + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    return open_count, closed_count, full_count, empty_count
+
+
+def review_session(frames_dir, detector, prefetch=8, lru_frames=256, batch_size=8,
+                   cache_dir=None, use_cache=True, window_name="YOLO Frame Viewer",
+                   result_cache=None):
+    """
+    frames_dir: 프레임 폴더 / 세그먼트 저장소 / 영상 파일
+    - A / 왼쪽 화살표 : 이전 프레임
+    - D / 오른쪽 화살표 : 다음 프레임
+    - Q / ESC : 종료
+    """
+    frames_dir = Path(frames_dir)
+    store = open_frame_store(frames_dir)
+    if len(store) == 0:
+        print(f"[ERROR] No images found in {frames_dir}")
+        store.close()
+        return
+
+    det_cache = None
+    if use_cache:
+        key = weights_hash(detector.weights_paths, getattr(detector, "conf", None))
+        det_cache = DetectionCache(detection_cache_path(frames_dir, key, cache_dir))
+        print(f"[INFO] Detection cache: {det_cache.path} ({len(det_cache)} frames cached)")
+
+    reviewer = FrameReviewer(store, detector, det_cache, lru_frames=lru_frames,
+                             prefetch=prefetch, batch_size=batch_size,
+                             result_cache=result_cache)
+    num_frames = len(store)
+    print(f"[INFO] {frames_dir.name}: {num_frames} frames found.")
+
+    idx = 0
+    try:
+        while True:
+            frame, (oc_boxes, fe_boxes) = reviewer.get(idx)
+            if frame is None:
+                print(f"[WARN] Failed to read image: {store.name(idx)}")
+                idx = (idx + 1) % num_frames
+                continue
+
+            view = frame.copy()
+            open_count, closed_count, full_count, empty_count = draw_detections(
+                view, oc_boxes, fe_boxes)
+            info_text = (
+                f"{frames_dir.name} | frame {idx+1}/{num_frames} "
+                f"| Open:{open_count} Closed:{closed_count} "
+                f"| Full:{full_count} Empty:{empty_count}"
+            )
+            cv2.putText(view, info_text, (10, 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            cv2.imshow(window_name, view)
+
+            key = cv2.waitKey(0) & 0xFF
+            if key in KEY_QUIT:
+                break
+            elif key in KEY_NEXT:
+                idx = min(idx + 1, num_frames - 1)
+            elif key in KEY_PREV:
+                idx = max(idx - 1, 0)
+    finally:
+        reviewer.close()
+        store.close()
+        cv2.destroyWindow(window_name)
@@ -0,0 +1,327 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+
+"""
+TCN + YOLO 이벤트 융합 (A/S/D 플래그)
+
+yolo_tcn_pred.ipynb 의 build_events_from_tcn_yolo 는
+    df.apply(row_to_tcn_label, axis=1) → 프레임마다 zip/np.argmax 루프
+    → 라벨 리스트를 세그먼트 / min_seg_len / 가장 긴 세그먼트용으로 세 번 더 순회
+하는 구조라 프레임 수에 비례해 파이썬 루프가 돈다.
+
+여기서는 라벨을 정수 코드(A=0, S=1, D=2, idle=3)로 두고
+    - TCN argmax, YOLO *_like 마스크, 가중 점수, run-length smoothing
+을 전부 배열 연산으로 처리한다. 결과(df, events_df)는 기존 함수와 같다.
+
+실시간용으로 FusionStream 을 두었다. 프레임 하나씩 push(frame_tcn, frame_yolo) 하면
+세그먼트가 min_seg_len 을 넘는 순간 START, 세그먼트가 끝나는 순간 END 플래그를 낸다.
+(가장 긴 세그먼트만 고르는 오프라인 규칙은 끝까지 봐야 하므로 스트림에서는
+ smoothing 을 통과한 세그먼트를 전부 플래그로 낸다)
+
+    df, events_df = build_events_from_tcn_yolo(tcn_path, yolo_path, fps=7)
+
+    stream = FusionStream(fps=7)
+    for tcn_row, yolo_row in ...:
+        for ev in stream.push(tcn_row, yolo_row):
+            print(ev)       # {"frame_idx", "time_sec", "flag_id", "flag_key", "edge"}
+    stream.flush()
+"""
+
+LABELS = ("A", "S", "D", "idle")
+ACTION_KEYS = LABELS[:3]
+IDLE = 3
+FLAG_ID_MAP = {"A": 1, "S": 2, "D": 3}
+
+YOLO_COLUMNS = ("box_count", "open_count", "closed_count", "full_count", "empty_count")
+EVENT_COLUMNS = ["frame_idx", "time_sec", "flag_id", "flag_key"]
+
+W_TCN = 2.0
+W_YOLO = 1.0
+TCN_THRESHOLD = 0.0     # TCN 최댓값이 이 값 이하면 idle (0/1 예측이면 0 과 같음)
+
+
+# =========================
+# 1. 프레임 단위 규칙 (배열 / 스칼라 공용)
+# =========================
+
+def tcn_codes(tcn, threshold=TCN_THRESHOLD):
+    """
+    tcn: (N, 3) A/S/D 값 (0/1 또는 확률) → (N,) 라벨 코드
+    최댓값이 threshold 이하면 idle, 동률이면 A > S > D 순 (np.argmax 는 첫 번째를 고름)
+    """
+    tcn = np.asarray(tcn, dtype=np.float64)
+    codes = np.argmax(tcn, axis=-1)
+    return np.where(tcn.max(axis=-1) <= threshold, IDLE, codes)
+
+
+def yolo_like(bc, oc, cc, fc, ec, d_bc, d_oc, d_fc, d_ec):
+    """
+    YOLO 개수 / 직전 프레임 대비 변화량 → (A_like, S_like, D_like)
+    인자는 배열이어도 스칼라여도 된다.
+    """
+    # A 단계: 비어 있고 열려있는 상자 | 상자 개수 증가 | 열린 상자 증가
+    a_like = ((bc >= 1) & (oc >= 1) & (fc == 0)) | (d_bc > 0) | (d_oc > 0)
+    # S 단계: 열려 있고 내용물도 있음 | full 증가 & empty 유지/감소
+    s_like = ((oc >= 1) & (fc >= 1)) | ((d_fc > 0) & (d_ec <= 0))
+    # D 단계: 닫힌 상자 보임 | 상자 개수 감소 | 열린 상자 감소
+    d_like = (cc >= 1) | (d_bc < 0) | (d_oc < 0)
+    return a_like, s_like, d_like
+
+
+def fuse_codes(tcn_code, a_like, s_like, d_like, w_tcn=W_TCN, w_yolo=W_YOLO):
+    """
+    TCN 라벨 코드 + YOLO 마스크 → 융합 라벨 코드
+    점수 동률이면 A > S > D > idle 순
+    """
+    tcn_code = np.asarray(tcn_code)
+    scores = np.stack([
+        w_tcn * (tcn_code == 0) + w_yolo * np.asarray(a_like, dtype=np.float64),
+        w_tcn * (tcn_code == 1) + w_yolo * np.asarray(s_like, dtype=np.float64),
+        w_tcn * (tcn_code == 2) + w_yolo * np.asarray(d_like, dtype=np.float64),
+        w_tcn * (tcn_code == IDLE) + 0.0,
+    ], axis=-1)
+    return np.argmax(scores, axis=-1)
+
+
+# =========================
+# 2. run-length
+# =========================
+
+def runs(codes):
+    """
+    연속 구간 → (label, start, end) 배열 세 개 (end 포함)
+    """
+    codes = np.asarray(codes)
+    if len(codes) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    ends = np.concatenate((starts[1:] - 1, [len(codes) - 1]))
+    return codes[starts], starts, ends
+
+
+def smooth_codes(codes, min_seg_len=5):
+    """길이가 min_seg_len 보다 짧은 A/S/D 구간을 idle 로 덮는다 (원래 라벨 기준 한 번만)"""
+    labels, starts, ends = runs(codes)
+    short = (labels != IDLE) & (ends - starts + 1 < min_seg_len)
+    lengths = ends - starts + 1
+    # 구간마다 "idle 로 바꿀지" 를 프레임 단위로 펼침
+    mask = np.repeat(short, lengths)
+    return np.where(mask, IDLE, codes)
+
+
+def longest_segments(codes):
+    """라벨별 가장 긴 구간 {code: (start, end)} (길이가 같으면 앞쪽)"""
+    labels, starts, ends = runs(codes)
+    lengths = ends - starts
+    best = {}
+    for code in range(len(ACTION_KEYS)):
+        sel = np.flatnonzero(labels == code)
+        if len(sel) == 0:
+            continue
+        i = sel[np.argmax(lengths[sel])]
+        best[code] = (int(starts[i]), int(ends[i]))
+    return best
+
+
+# =========================
+# 3. 오프라인 (CSV 두 개)
+# =========================
+
+def _column(df, name, n):
+    return df[name].to_numpy() if name in df.columns else np.zeros(n)
+
+
+def yolo_like_from_df(df_yolo, n):
+    """YOLO 상태 DataFrame 앞 n 행 → (A_like, S_like, D_like) 배열 (직전 프레임 대비 변화량 포함)"""
+    counts = [_column(df_yolo, c, n)[:n].astype(np.float64) for c in YOLO_COLUMNS]
+    bc, oc, cc, fc, ec = counts
+    diffs = [np.diff(x, prepend=x[:1]) for x in (bc, oc, fc, ec)]
+    return yolo_like(bc, oc, cc, fc, ec, *diffs)
+
+
+def fuse_frames(df_tcn, df_yolo, min_seg_len=5, w_tcn=W_TCN, w_yolo=W_YOLO,
+                tcn_threshold=TCN_THRESHOLD):
+    """
+    TCN / YOLO DataFrame → 기존 merged df 와 같은 컬럼의 DataFrame
+    (tcn_label, yolo_*_like, fused_label_raw, fused_label 추가)
+    """
+    n = min(len(df_tcn), len(df_yolo))
+    df_tcn = df_tcn.iloc[:n].reset_index(drop=True)
+    df_yolo = df_yolo.iloc[:n].reset_index(drop=True)
+
+    df = pd.concat([df_tcn, df_yolo], axis=1)
+    df["frame_idx"] = np.arange(n)
+
+    tcn = tcn_codes(df_tcn[list(ACTION_KEYS)].to_numpy(), tcn_threshold)
+    a_like, s_like, d_like = yolo_like_from_df(df_yolo, n)
+
+    raw = fuse_codes(tcn, a_like, s_like, d_like, w_tcn, w_yolo)
+    smooth = smooth_codes(raw, min_seg_len)
+
+    names = np.asarray(LABELS, dtype=object)
+    df["tcn_label"] = names[tcn]
+    df["yolo_A_like"] = a_like
+    df["yolo_S_like"] = s_like
+    df["yolo_D_like"] = d_like
+    df["fused_label_raw"] = names[raw]
+    df["fused_label"] = names[smooth]
+    return df, smooth
+
+
+def events_from_codes(codes, fps=30.0):
+    """라벨별 가장 긴 구간의 시작/끝 → 이벤트 DataFrame"""
+    events = []
+    for code, (start, end) in longest_segments(codes).items():
+        key = LABELS[code]
+        for frame_idx in (start, end):
+            events.append({
+                "frame_idx": frame_idx,
+                "time_sec": frame_idx / fps,
+                "flag_id": FLAG_ID_MAP[key],
+                "flag_key": key,
+            })
+    if not events:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    return pd.DataFrame(events).sort_values(["flag_id", "frame_idx"]).reset_index(drop=True)
+
+
+def build_events_from_tcn_yolo(
+    tcn_path: str,
+    yolo_path: str,
+    out_csv_path: str | None = None,
+    fps: float = 30.0,
+    min_seg_len: int = 5,
+    w_tcn: float = W_TCN,
+    w_yolo: float = W_YOLO,
+    tcn_threshold: float = TCN_THRESHOLD,
+):
+    """
+    TCN 예측 CSV + YOLO 상태 CSV를 이용해서
+    A/S/D 이벤트 플래그 CSV를 생성. (yolo_tcn_pred.ipynb 와 같은 입출력)
+
+    입력:
+        tcn_path  : video_xxx_pred.csv (컬럼 A, S, D)
+        yolo_path : video_xxx_yolo_states.csv
+
+    w_tcn / w_yolo / tcn_threshold / min_seg_len 은 fusion_sweep.run_sweep 으로 고른 값을
+    **best_params 로 그대로 넘길 수 있다.
+
+    출력:
+        (merged df, events_df: frame_idx, time_sec, flag_id, flag_key)
+    """
+    df, smooth = fuse_frames(pd.read_csv(tcn_path), pd.read_csv(yolo_path),
+                             min_seg_len=min_seg_len, w_tcn=w_tcn, w_yolo=w_yolo,
+                             tcn_threshold=tcn_threshold)
+    events_df = events_from_codes(smooth, fps)
+
+    if out_csv_path is not None:
+        base = os.path.basename(tcn_path)
+        filename = base.replace("_pred", "")
+        filename = filename.replace(".csv", "_flag.csv")
+        save_path = os.path.join(out_csv_path, filename)
+        events_df.to_csv(save_path, index=False, encoding="utf-8-sig")
+        print(f"[INFO] Saved events CSV to: {save_path}")
+
+    return df, events_df
+
+
+# =========================
+# 4. 실시간 (프레임 하나씩)
+# =========================
+
+class FusionStream:
+    """
+    프레임 하나씩 TCN / YOLO 결과를 받아 A/S/D START/END 플래그를 바로 낸다.
+
+    push(frame_tcn, frame_yolo)
+        frame_tcn  : (3,) A/S/D 값 (확률 또는 0/1)
+        frame_yolo : dict (YOLO_COLUMNS 키) 또는 같은 순서의 (5,) 배열
+        반환       : 이번 프레임에서 확정된 이벤트 리스트
+                     {"frame_idx", "time_sec", "flag_id", "flag_key", "edge"("START"/"END")}
+
+    오프라인 smoothing 과 같이 min_seg_len 보다 짧은 A/S/D 구간은 idle 로 본다.
+    START 는 구간 길이가 min_seg_len 에 도달한 프레임에 (frame_idx 는 구간 시작),
+    END 는 라벨이 바뀐 프레임에 (frame_idx 는 구간 마지막 프레임) 나온다.
+    """
+
+    def __init__(self, fps=30.0, min_seg_len=5, w_tcn=W_TCN, w_yolo=W_YOLO,
+                 tcn_threshold=TCN_THRESHOLD):
+        self.fps = fps
+        self.min_seg_len = min_seg_len
+        self.w_tcn = w_tcn
+        self.w_yolo = w_yolo
+        self.tcn_threshold = tcn_threshold
+        self.reset()
+
+    def reset(self):
+        self.frame_idx = 0
+        self._prev_counts = None
+        self._run_code = IDLE
+        self._run_start = 0
+        self._run_len = 0
+        self._run_started = False   # 현재 구간의 START 를 이미 냈는지
+        self.last_code = IDLE
+
+    def _event(self, frame_idx, code, edge):
+        key = LABELS[code]
+        return {
+            "frame_idx": frame_idx,
+            "time_sec": frame_idx / self.fps,
+            "flag_id": FLAG_ID_MAP[key],
+            "flag_key": key,
+            "edge": edge,
+        }
+
+    def _close_run(self, events):
+        if self._run_started:
+            events.append(self._event(self._run_start + self._run_len - 1, self._run_code, "END"))
+
+    def push(self, frame_tcn, frame_yolo):
+        with METRICS.timer("fusion"):
+            return self._push(frame_tcn, frame_yolo)
+
+    def _push(self, frame_tcn, frame_yolo):
+        if isinstance(frame_yolo, dict):
+            counts = np.array([frame_yolo.get(c, 0) for c in YOLO_COLUMNS], dtype=np.float64)
+        else:
+            counts = np.asarray(frame_yolo, dtype=np.float64)
+        prev = counts if self._prev_counts is None else self._prev_counts
+        self._prev_counts = counts
+
+        bc, oc, cc, fc, ec = counts
+        d_bc, d_oc, _, d_fc, d_ec = counts - prev
+        a_like, s_like, d_like = yolo_like(bc, oc, cc, fc, ec, d_bc, d_oc, d_fc, d_ec)
+        code = int(fuse_codes(tcn_codes(frame_tcn, self.tcn_threshold), a_like, s_like, d_like,
+                              self.w_tcn, self.w_yolo))
+        self.last_code = code
+
+        events = []
+        if code == self._run_code and self._run_len > 0:
+            self._run_len += 1
+        else:
+            self._close_run(events)
+            self._run_code = code
+            self._run_start = self.frame_idx
+            self._run_len = 1
+            self._run_started = False
+
+        if (code != IDLE and not self._run_started
+                and self._run_len >= self.min_seg_len):
+            self._run_started = True
+            events.append(self._event(self._run_start, code, "START"))
+
+        self.frame_idx += 1
+        return events
+
+    def flush(self):
+        """스트림 종료: 열려 있는 구간의 END 를 낸다"""
+        events = []
+        self._close_run(events)
+        self._run_started = False
+        self._run_len = 0
+        return events
@@ -0,0 +1,357 @@
+import itertools
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from evaluation import (CLASSES, IOU_THRESHOLD, _EPS, _gt_files, frame_counts,
+                        pack_labels, segment_metrics)
+from event_labels import load_labels
+from fusion import (ACTION_KEYS, TCN_THRESHOLD, W_TCN, W_YOLO, fuse_codes,
+                    smooth_codes, tcn_codes, yolo_like_from_df)
+
+"""
+융합 파라미터 스윕 (w_tcn / w_yolo / tcn_threshold / min_seg_len)
+
+yolo_tcn_pred.ipynb 에서는 영상마다 거의 같은 셀을 복사해 build_events_from_tcn_yolo 를 돌리고
+결과 CSV 를 score.ipynb 로 다시 읽어 점수를 보는 식으로 값을 손으로 바꿔 봤다.
+
+여기서는
+    - 영상별 TCN _pred.csv / YOLO _yolo_states.csv / GT _lange.(npy|csv) 를 한 번만 읽어
+      TCN 값, YOLO *_like 마스크(설정과 무관), 비트 패킹 GT 를 메모리에 둠
+    - 설정 하나 = TCN 코드 → fuse_codes → smooth_codes → 프레임 / 세그먼트 지표 (CSV 쓰기 없음)
+    - 같은 (tcn_threshold, w_tcn, w_yolo) 의 융합 결과는 min_seg_len 만 바꿔 재사용
+    - 설정 묶음을 프로세스 풀로 나눠 계산 (세션 데이터는 워커마다 initializer 로 한 번만 전달)
+    - 지표는 전체 영상을 합친 값 (tp/fp/fn 합, onset / offset 오차는 매칭 구간 수 가중 평균)
+    - pareto_front 로 seg_f1(클수록 좋음) vs onset_err(작을수록 좋음) 의 파레토 집합을 뽑음
+
+사용 예:
+    sessions = load_sweep_sessions(find_session_files(r"test_video\\out_TCN",
+                                                      r"test_video\\out_yolo",
+                                                      r"test_data\\test_csv"), fps=7)
+    results = run_sweep(sessions, grid_configs())                 # 또는 random_configs(2000)
+    front = pareto_front(results)
+    best = config_of(front.iloc[0])
+    build_events_from_tcn_yolo(tcn_path, yolo_path, fps=7, **best)
+"""
+
+# =========================
+# 설정
+# =========================
+NUM_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+CHUNK_CONFIGS = 64          # 워커에 한 번에 보낼 설정 수
+MIN_PARALLEL_CONFIGS = 256  # 설정이 이보다 적으면 프로세스를 띄우지 않고 바로 계산
+
+PARAM_NAMES = ("w_tcn", "w_yolo", "tcn_threshold", "min_seg_len")
+DEFAULT_PARAMS = {"w_tcn": W_TCN, "w_yolo": W_YOLO,
+                  "tcn_threshold": TCN_THRESHOLD, "min_seg_len": 5}
+
+# grid_configs 기본 격자 (6 x 5 x 4 x 15 = 1800 설정)
+DEFAULT_GRID = {
+    "w_tcn": (0.5, 1.0, 1.5, 2.0, 3.0, 4.0),
+    "w_yolo": (0.0, 0.5, 1.0, 1.5, 2.0),
+    "tcn_threshold": (0.0, 0.3, 0.5, 0.7),
+    "min_seg_len": tuple(range(1, 16)),
+}
+# random_configs 기본 범위: 튜플 (low, high) 는 균등 분포 (min_seg_len 은 정수), 리스트는 그중 선택
+DEFAULT_SPACE = {
+    "w_tcn": (0.25, 4.0),
+    "w_yolo": (0.0, 2.5),
+    "tcn_threshold": (0.0, 0.9),
+    "min_seg_len": (1, 20),
+}
+
+TCN_SUFFIX = "_pred.csv"
+YOLO_SUFFIX = "_yolo_states.csv"
+
+_sessions = None            # 워커 프로세스의 세션 목록 (initializer 에서 설정)
+
+
+# =========================
+# 1. 세션 로드 (한 번만)
+# =========================
+
+class SweepSession:
+    """
+    영상 하나의 스윕 입력 (공통 길이 n 으로 자름)
+        tcn        : (n, 3) float64 A/S/D 값
+        likes      : (A_like, S_like, D_like) bool 배열
+        y_true     : (n, C) bool GT, gt_packed : (C, B)
+    """
+
+    def __init__(self, name, tcn, likes, y_true, fps=7.0):
+        n = min(len(tcn), len(likes[0]), len(y_true))
+        if len(y_true) != min(len(tcn), len(likes[0])):
+            print(f"[WARN] {name}: length mismatch gt={len(y_true)}, "
+                  f"tcn={len(tcn)}, yolo={len(likes[0])}; using first {n} frames")
+        self.name = name
+        self.n = n
+        self.fps = fps
+        self.tcn = np.asarray(tcn[:n], dtype=np.float64)
+        self.likes = tuple(np.asarray(x[:n], dtype=bool) for x in likes)
+        self.y_true = np.asarray(y_true[:n]).astype(bool)
+        self.gt_packed = pack_labels(self.y_true)
+        self.valid = np.packbits(np.ones(n, dtype=bool))
+
+
+def _normalize_name(name):
+    """파일 이름 비교용: 공백 / 괄호 꼬리표("(normal)", "(fast)") 제거"""
+    return re.sub(r"\([^)]*\)", "", name).replace(" ", "")
+
+
+def find_session_files(tcn_dir, yolo_dir, gt_dir):
+    """
+    <video>_pred.csv ↔ <video>[(꼬리표)]_yolo_states.csv ↔ <video>_lange.(npy|csv) 를 이름으로 짝짓는다.
+    반환: [(name, tcn_path, yolo_path, gt_path), ...]
+    이름이 규칙과 다른 세션(예: "video_ idle_001" ↔ "video_idle_new_001")은 직접 튜플로 넘기면 된다.
+    """
+    def by_base(folder, suffix):
+        found = {}
+        for fname in sorted(os.listdir(folder)):
+            if fname.endswith(suffix):
+                found[_normalize_name(fname[:-len(suffix)])] = os.path.join(folder, fname)
+        return found
+
+    tcn_files = by_base(tcn_dir, TCN_SUFFIX)
+    yolo_files = by_base(yolo_dir, YOLO_SUFFIX)
+    gt_files = {_normalize_name(k): v for k, v in _gt_files(gt_dir).items()}
+
+    triples = []
+    for name, tcn_path in tcn_files.items():
+        if name not in yolo_files or name not in gt_files:
+            missing = [kind for kind, files in (("yolo", yolo_files), ("gt", gt_files))
+                       if name not in files]
+            print(f"[WARN] {name}: missing {', '.join(missing)} (skip)")
+            continue
+        triples.append((name, tcn_path, yolo_files[name], gt_files[name]))
+    return triples
+
+
+def load_sweep_sessions(triples, fps=7.0):
+    """
+    triples: [(name, tcn_path, yolo_path, gt_path[, fps]), ...] → [SweepSession, ...]
+    CSV / npy 는 여기서 한 번만 읽는다.
+    """
+    sessions = []
+    for triple in triples:
+        name, tcn_path, yolo_path, gt_path = triple[:4]
+        session_fps = triple[4] if len(triple) > 4 else fps
+        tcn = pd.read_csv(tcn_path)[list(ACTION_KEYS)].to_numpy()
+        df_yolo = pd.read_csv(yolo_path)
+        n = min(len(tcn), len(df_yolo))
+        likes = yolo_like_from_df(df_yolo.iloc[:n], n)
+        y_true = load_labels(gt_path)[:, :len(CLASSES)]
+        sessions.append(SweepSession(name, tcn, likes, y_true, session_fps))
+    print(f"[INFO] {len(sessions)} session(s) loaded "
+          f"({sum(s.n for s in sessions)} frames)")
+    return sessions
+
+
+# =========================
+# 2. 설정 목록
+# =========================
+
+def grid_configs(grid=None):
+    """{이름: 값 목록} 의 곱집합 → 설정 dict 리스트 (빠진 이름은 DEFAULT_PARAMS)"""
+    grid = {**{k: (v,) for k, v in DEFAULT_PARAMS.items()}, **(grid or DEFAULT_GRID)}
+    values = [grid[name] for name in PARAM_NAMES]
+    return [dict(zip(PARAM_NAMES, combo)) for combo in itertools.product(*values)]
+
+
+def random_configs(n, space=None, seed=0):
+    """
+    무작위 탐색용 설정 n 개.
+    space: {이름: (low, high) 또는 [선택지, ...]}, DEFAULT_SPACE 위에 덮어씀
+        - 튜플은 항상 (low, high) 범위. 값 두 개 중 고르려면 리스트로 [a, b]
+        - 값을 고정하려면 원소 하나짜리 리스트 [값]
+        - space 와 DEFAULT_SPACE 모두에 없는 이름은 DEFAULT_PARAMS 값으로 고정
+    """
+    space = {**DEFAULT_SPACE, **(space or {})}
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name in PARAM_NAMES:
+        spec = space.get(name, [DEFAULT_PARAMS[name]])
+        if isinstance(spec, tuple):
+            if len(spec) != 2:
+                raise ValueError(f"{name}: range must be (low, high), got {spec!r}; "
+                                 f"pass choices as a list")
+            low, high = spec
+            if name == "min_seg_len":
+                columns[name] = rng.integers(int(low), int(high) + 1, size=n)
+            else:
+                columns[name] = np.round(rng.uniform(low, high, size=n), 3)
+        else:
+            columns[name] = rng.choice(np.asarray(spec), size=n)
+    return [{name: columns[name][i].item() for name in PARAM_NAMES} for i in range(n)]
+
+
+def config_of(row):
+    """결과 DataFrame 의 한 행 → build_events_from_tcn_yolo(**config) 에 넘길 dict"""
+    config = {name: float(row[name]) for name in PARAM_NAMES}
+    config["min_seg_len"] = int(config["min_seg_len"])
+    return config
+
+
+# =========================
+# 3. 설정 평가
+# =========================
+
+def _predict(session, config, raw_memo):
+    """세션 하나 + 설정 → (n, 3) bool 예측 (min_seg_len 전 융합 결과는 raw_memo 로 재사용)"""
+    key = (session.name, config["tcn_threshold"], config["w_tcn"], config["w_yolo"])
+    raw = raw_memo.get(key)
+    if raw is None:
+        tcn = tcn_codes(session.tcn, config["tcn_threshold"])
+        raw = raw_memo[key] = fuse_codes(tcn, *session.likes,
+                                         config["w_tcn"], config["w_yolo"])
+    codes = smooth_codes(raw, int(config["min_seg_len"]))
+    return codes[:, None] == np.arange(len(CLASSES))
+
+
+def evaluate_config(sessions, config, iou_thr=IOU_THRESHOLD, raw_memo=None):
+    """
+    설정 하나를 전체 세션에 적용한 지표 dict (영상 합산)
+        frame_f1 / frame_precision / frame_recall : 프레임 micro (tp/fp/fn 합)
+        seg_*      : 세그먼트 tp/fp/fn 합으로 계산
+        onset_err / offset_err (프레임), *_sec (초) : 매칭 구간 수로 가중 평균
+    """
+    raw_memo = {} if raw_memo is None else raw_memo
+    f_tp = f_fp = f_fn = 0
+    s_tp = s_fp = s_fn = 0
+    on_sum = off_sum = on_sec_sum = off_sec_sum = iou_sum = 0.0
+    cls_tp = np.zeros(len(CLASSES), dtype=np.int64)
+    cls_fp = np.zeros(len(CLASSES), dtype=np.int64)
+    cls_fn = np.zeros(len(CLASSES), dtype=np.int64)
+
+    for session in sessions:
+        y_pred = _predict(session, config, raw_memo)
+        tp, fp, fn, _ = frame_counts(session.gt_packed, pack_labels(y_pred), session.valid)
+        f_tp, f_fp, f_fn = f_tp + tp.sum(), f_fp + fp.sum(), f_fn + fn.sum()
+
+        seg = segment_metrics(session.y_true, y_pred, session.fps, iou_thr)
+        s_tp, s_fp, s_fn = s_tp + seg["seg_tp"], s_fp + seg["seg_fp"], s_fn + seg["seg_fn"]
+        if seg["seg_tp"]:
+            on_sum += seg["onset_err"] * seg["seg_tp"]
+            off_sum += seg["offset_err"] * seg["seg_tp"]
+            on_sec_sum += seg["onset_err_sec"] * seg["seg_tp"]
+            off_sec_sum += seg["offset_err_sec"] * seg["seg_tp"]
+            iou_sum += seg["mean_iou"] * seg["seg_tp"]
+        for i, cls in enumerate(CLASSES):
+            cls_tp[i] += seg[f"{cls}_seg_tp"]
+            cls_fp[i] += seg[f"{cls}_seg_fp"]
+            cls_fn[i] += seg[f"{cls}_seg_fn"]
+
+    def f1(tp, fp, fn):
+        p = tp / (tp + fp + _EPS)
+        r = tp / (tp + fn + _EPS)
+        return p, r, 2 * p * r / (p + r + _EPS)
+
+    out = dict(config)
+    out["frame_precision"], out["frame_recall"], out["frame_f1"] = f1(f_tp, f_fp, f_fn)
+    out["seg_precision"], out["seg_recall"], out["seg_f1"] = f1(s_tp, s_fp, s_fn)
+    out.update({"seg_tp": int(s_tp), "seg_fp": int(s_fp), "seg_fn": int(s_fn)})
+    has = s_tp > 0
+    out["mean_iou"] = iou_sum / s_tp if has else np.nan
+    out["onset_err"] = on_sum / s_tp if has else np.nan
+    out["offset_err"] = off_sum / s_tp if has else np.nan
+    out["onset_err_sec"] = on_sec_sum / s_tp if has else np.nan
+    out["offset_err_sec"] = off_sec_sum / s_tp if has else np.nan
+    for i, cls in enumerate(CLASSES):
+        out[f"{cls}_seg_f1"] = f1(cls_tp[i], cls_fp[i], cls_fn[i])[2]
+    return out
+
+
+def _evaluate_chunk(sessions, configs, iou_thr):
+    # (threshold, 가중치) 가 같은 설정이 한 묶음에 몰려 있어 융합 결과를 재사용
+    raw_memo = {}
+    return [evaluate_config(sessions, c, iou_thr, raw_memo) for c in configs]
+
+
+def _init_worker(sessions):
+    global _sessions
+    _sessions = sessions
+
+
+def _worker_chunk(args):
+    configs, iou_thr = args
+    return _evaluate_chunk(_sessions, configs, iou_thr)
+
+
+def run_sweep(sessions, configs, num_workers=NUM_WORKERS, iou_thr=IOU_THRESHOLD,
+              chunk_size=CHUNK_CONFIGS):
+    """
+    설정 목록 전체 평가 → 설정별 지표 DataFrame (config_id = configs 안의 위치)
+    설정이 MIN_PARALLEL_CONFIGS 개 이상이면 프로세스 풀 사용.
+    """
+    configs = [{**DEFAULT_PARAMS, **c} for c in configs]
+    order = sorted(range(len(configs)), key=lambda i: tuple(configs[i][k] for k in PARAM_NAMES))
+    chunks = [[configs[i] for i in order[start:start + chunk_size]]
+              for start in range(0, len(order), chunk_size)]
+
+    t_start = time.perf_counter()
+    if num_workers > 1 and len(configs) >= MIN_PARALLEL_CONFIGS:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                 initargs=(sessions,)) as pool:
+            parts = list(pool.map(_worker_chunk, [(chunk, iou_thr) for chunk in chunks]))
+    else:
+        parts = [_evaluate_chunk(sessions, chunk, iou_thr) for chunk in chunks]
+    seconds = time.perf_counter() - t_start
+
+    rows = [row for part in parts for row in part]
+    df = pd.DataFrame(rows)
+    df.insert(0, "config_id", order)
+    df = df.sort_values("config_id").reset_index(drop=True)
+    print(f"[INFO] {len(configs)} config(s) x {len(sessions)} session(s) in {seconds:.1f}s "
+          f"({len(configs) / max(seconds, 1e-9):.0f} configs/s)")
+    return df
+
+
+# =========================
+# 4. 결과 정리
+# =========================
+
+def pareto_front(df, maximize="seg_f1", minimize="onset_err"):
+    """
+    maximize 는 클수록, minimize 는 작을수록 좋은 두 지표의 파레토 집합 (maximize 내림차순).
+    minimize 가 NaN(매칭 구간 없음)인 행은 무한대로 본다.
+    """
+    cost = df[minimize].fillna(np.inf)
+    order = np.lexsort((cost.to_numpy(), -df[maximize].to_numpy()))
+    keep = []
+    best_cost = np.inf
+    for i in order:
+        if cost.iloc[i] < best_cost:
+            keep.append(i)
+            best_cost = cost.iloc[i]
+    return df.iloc[keep].reset_index(drop=True)
+
+
+def print_sweep_summary(df, front=None, top=10):
+    cols = ["config_id", *PARAM_NAMES, "seg_f1", "onset_err", "onset_err_sec",
+            "offset_err", "frame_f1"]
+    front = pareto_front(df) if front is None else front
+    print(f"\n=== Pareto front (seg_f1 vs onset_err): {len(front)} config(s) ===")
+    print(front[cols].to_string(index=False))
+    print(f"\n=== Top {top} by seg_f1 ===")
+    print(df.sort_values(["seg_f1", "onset_err"], ascending=[False, True])
+            .head(top)[cols].to_string(index=False))
+
+
+def main():
+    tcn_dir = r"test_video\out_TCN"
+    yolo_dir = r"test_video\out_yolo"
+    gt_dir = r"test_data\test_csv"
+
+    sessions = load_sweep_sessions(find_session_files(tcn_dir, yolo_dir, gt_dir), fps=7.0)
+    if not sessions:
+        print("[ERROR] No sessions to sweep")
+        return
+    df = run_sweep(sessions, grid_configs())
+    print_sweep_summary(df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import os
+import zipfile
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from frame_store import open_frame_store
+from metrics import METRICS
+from result_cache import model_key, store_digest
+
+"""
+스트리밍 손 랜드마크 추출 (MediaPipe Hands, tracking 모드)
+
+lendmark_npz.ipynb 의 기존 extract_hands_for_folder 는
+    저장된 JPEG 마다 imread → cvtColor → Hands(static_image_mode=True)
+    → 이중 for 문으로 feat[hi, li, :] 채우기
+방식이라 디스크 decode 가 대부분의 시간을 차지하고, static 모드라 tracking 도 쓰지 않는다.
+
+HandLandmarkStream 은 프레임(BGR ndarray)을 직접 받아서
+    - Hands 를 tracking 모드(static_image_mode=False)로 실행
+    - 미리 할당한 (chunk_size, max_hands, 21, 3) 버퍼에 손 단위로 한 번에 기록
+    - 버퍼가 차면 임시 파일(.part)로 flush → 메모리는 chunk 크기만큼만 사용
+    - close() 에서 임시 파일을 npz 의 hand_kps 항목으로 바로 옮겨 씀
+      (전체 배열을 메모리에 올리지 않음, 결과 형식은 기존과 동일: (N, max_hands*21*3) float32)
+
+사용 예 (캡처 루프 / 영상 리더 어디서든):
+    with HandLandmarkStream("out_npz/hands_video_normal_001.npz") as stream:
+        while ...:
+            stream.push(frame)      # 읽기 실패한 프레임은 push(None) → 0 으로 채워 번호 유지
+
+    extract_hands_stream("video/normal/video_normal_001", "out_npz/hands_video_normal_001.npz")
+
+    # 같은 세션 파일 + 같은 Hands 설정이면 추출하지 않고 캐시에서 npz 를 바로 씀
+    extract_hands_stream(..., cache=open_result_cache())
+
+tracking 모드 결과는 앞 프레임에 따라 달라지므로 프레임 단위가 아니라
+세션(저장소 파일 바이트 해시) 단위로 캐시한다.
+"""
+
+NUM_LANDMARKS = 21
+HAND_KPS_KEY = "hand_kps"
+
+mp_hands = mp.solutions.hands
+
+
+def write_npz_from_raw(npz_path, raw_path, shape, dtype=np.float32, key=HAND_KPS_KEY,
+                       block_bytes=1 << 24):
+    """
+    raw_path(헤더 없는 C-order 배열 바이트)를 npz 의 key.npy 항목으로 옮긴다.
+    np.savez_compressed 와 같은 ZIP_DEFLATED 형식이라 np.load 로 그대로 읽힌다.
+    """
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+              "fortran_order": False,
+              "shape": tuple(int(s) for s in shape)}
+
+    with zipfile.ZipFile(npz_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        with zf.open(f"{key}.npy", "w", force_zip64=True) as out, open(raw_path, "rb") as raw:
+            np.lib.format.write_array_header_2_0(out, header)
+            while True:
+                block = raw.read(block_bytes)
+                if not block:
+                    break
+                out.write(block)
+
+
+def process_hands(hands, frame_bgr, out):
+    """
+    프레임 하나에 Hands 를 돌려 out((max_hands, 21, 3), 0 으로 초기화)에 기록한다.
+    반환: 검출된 손 개수
+    """
+    out[:] = 0.0
+    if frame_bgr is None:
+        return 0
+
+    with METRICS.timer("landmark"):
+        result = hands.process(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+        if not result.multi_hand_landmarks:
+            return 0
+
+        hand_list = result.multi_hand_landmarks[:len(out)]
+        for hi, hand_lms in enumerate(hand_list):
+            # 21개 랜드마크를 (21, 3) 으로 한 번에 기록
+            out[hi] = [(lm.x, lm.y, lm.z) for lm in hand_lms.landmark]
+    return len(hand_list)
+
+
+class HandLandmarkStream:
+    """
+    프레임을 하나씩 받아 손 랜드마크를 추출하고 chunk 단위로 디스크에 쌓는다.
+
+    out_npz_path : 결과 npz 경로 (hand_kps: (N, max_hands*21*3))
+    max_hands    : 최대 손 개수
+    chunk_size   : 메모리에 모아 둘 프레임 수 (가득 차면 .part 파일로 flush)
+    hands        : 이미 만든 mp_hands.Hands 를 재사용할 때 전달 (batch_landmarks 워커)
+                   tracking 상태는 reset() 으로 초기화하고, close() 에서 닫지 않는다
+    """
+
+    def __init__(self, out_npz_path, max_hands=2, chunk_size=1024,
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5, hands=None):
+        self.out_npz_path = str(out_npz_path)
+        self.max_hands = max_hands
+        self.chunk_size = chunk_size
+
+        out_dir = os.path.dirname(self.out_npz_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self._raw_path = self.out_npz_path + ".part"
+        self._raw = open(self._raw_path, "wb")
+
+        self._chunk = np.zeros((chunk_size, max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+        self._fill = 0
+        self.n_frames = 0
+        self.n_detected = 0   # 손이 하나 이상 검출된 프레임 수
+
+        self._own_hands = hands is None
+        if hands is None:
+            hands = mp_hands.Hands(
+                static_image_mode=False,
+                max_num_hands=max_hands,
+                min_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence,
+            )
+        else:
+            # 이전 세션의 tracking 결과가 이어지지 않도록 초기화
+            hands.reset()
+        self.hands = hands
+
+    def push(self, frame_bgr):
+        """
+        프레임 하나 처리. frame_bgr 가 None 이면 손 없음(0)으로 기록해 프레임 번호를 유지한다.
+        반환: 검출된 손 개수
+        """
+        n_hands = process_hands(self.hands, frame_bgr, self._chunk[self._fill])
+        if n_hands:
+            self.n_detected += 1
+        self._fill += 1
+        self.n_frames += 1
+        if self._fill == self.chunk_size:
+            self.flush()
+        return n_hands
+
+    def flush(self):
+        if self._fill:
+            self._raw.write(self._chunk[:self._fill].tobytes())
+            self._fill = 0
+
+    def close(self):
+        """남은 chunk 를 쓰고 npz 로 변환한 뒤 임시 파일을 지운다. 반환: npz 경로"""
+        if self._raw.closed:
+            return self.out_npz_path
+
+        self.flush()
+        self._raw.close()
+        if self._own_hands:
+            self.hands.close()
+
+        # 다 쓴 뒤에 이름을 바꿔서, 중간에 죽어도 불완전한 npz 가 남지 않게 한다
+        shape = (self.n_frames, self.max_hands * NUM_LANDMARKS * 3)
+        tmp_path = self.out_npz_path + ".tmp"
+        write_npz_from_raw(tmp_path, self._raw_path, shape)
+        os.replace(tmp_path, self.out_npz_path)
+        os.remove(self._raw_path)
+        return self.out_npz_path
+
+    def abort(self):
+        """결과 npz 를 만들지 않고 임시 파일만 정리 (추출 중 예외가 난 경우)"""
+        if not self._raw.closed:
+            self._raw.close()
+            if self._own_hands:
+                self.hands.close()
+        if os.path.exists(self._raw_path):
+            os.remove(self._raw_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def hands_cache_key(max_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    """MediaPipe 버전 + Hands 설정 → ResultCache 키 앞부분"""
+    return model_key("mediapipe_hands", version=mp.__version__, static_image_mode=False,
+                     max_hands=max_hands, min_detection_confidence=min_detection_confidence,
+                     min_tracking_confidence=min_tracking_confidence)
+
+
+def _write_cached_npz(out_npz_path, hand_kps):
+    out_dir = os.path.dirname(str(out_npz_path))
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = str(out_npz_path) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **{HAND_KPS_KEY: hand_kps})
+    os.replace(tmp_path, out_npz_path)
+
+
+def extract_hands_stream(source, out_npz_path, max_hands=2, chunk_size=1024, hands=None,
+                         cache=None):
+    """
+    프레임 저장소(이미지 폴더 / 세그먼트 저장소 / 영상 파일) 또는 프레임 iterable 을
+    순서대로 읽어서 hand_kps npz 를 만든다. (hands: HandLandmarkStream 참고)
+
+    cache: result_cache.ResultCache. source 가 경로일 때만 사용
+           (세션 파일 해시 + hands_cache_key 가 같으면 MediaPipe 를 돌리지 않음)
+           hands 를 넘기는 경우 그 Hands 도 기본 confidence(0.5) 로 만든 것이어야 한다.
+
+    반환: (프레임 수, 손 검출 프레임 수)
+    """
+    cache_key = None
+    if cache is not None and isinstance(source, (str, os.PathLike)):
+        cache_key = f"{hands_cache_key(max_hands)}:{store_digest(source)}"
+        hit = cache.get(cache_key)
+        if hit is not None:
+            hand_kps = hit[HAND_KPS_KEY]
+            _write_cached_npz(out_npz_path, hand_kps)
+            n_detected = int(np.count_nonzero(hand_kps.any(axis=1)))
+            print(f"[extract_hands_stream] {source} -> {out_npz_path} (cached), "
+                  f"frames={len(hand_kps)}, detected={n_detected}")
+            return len(hand_kps), n_detected
+
+    store = None
+    if isinstance(source, (str, os.PathLike)):
+        store = open_frame_store(source)
+        frames = (frame for _, frame in store.iter_frames())
+    else:
+        frames = source
+
+    try:
+        with HandLandmarkStream(out_npz_path, max_hands=max_hands, chunk_size=chunk_size,
+                                hands=hands) as stream:
+            for frame in frames:
+                stream.push(frame)
+    finally:
+        if store is not None:
+            store.close()
+
+    if cache_key is not None:
+        with np.load(out_npz_path) as z:
+            cache.put(cache_key, {HAND_KPS_KEY: z[HAND_KPS_KEY]})
+
+    print(f"[extract_hands_stream] {source if store is not None else 'frames'} -> {out_npz_path}, "
+          f"frames={stream.n_frames}, detected={stream.n_detected}")
+    return stream.n_frames, stream.n_detected
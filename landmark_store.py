@@ -0,0 +1,276 @@
+import os
+import re
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+
+"""
+학습 데이터 통합 저장소 (landmark store)
+
+medels.ipynb 의 load_all_data_with_sets 는 노트북을 실행할 때마다
+data/out_csv/* 의 _lange.csv 를 pandas 로, data/out_npz/* 의 hands_*.npz 를
+압축 해제해서 읽는다. 이 파일들을 한 번만 읽어서 아래 형태로 묶어 두고
+이후에는 np.memmap 으로 바로 연다.
+
+저장 구조 (<data_root>/landmark_store/):
+    landmarks.f32 : (전체 프레임, D) float32, 샘플 순서대로 이어 붙임
+    labels.u8     : (전체 프레임, K) uint8, A/S/D 0/1
+    samples.csv   : sample_name, type, number, set_idx, set_id, row_start, row_end
+    store.json    : 행 수 / D / K / 라벨 컬럼 / 원본 파일 최종 수정 시각
+
+memmap 은 mode="c"(copy-on-write)로 열기 때문에 DataLoader 워커들이
+같은 페이지를 공유하고, sliding_window_view 도 그대로 만들 수 있다.
+
+사용 예:
+    store = open_or_build_landmark_store("data")   # 원본이 바뀌었으면 다시 묶음
+    data_dict, meta_dict = store.to_data_dicts()   # load_all_data_with_sets 와 같은 형태
+"""
+
+STORE_DIR_NAME = "landmark_store"
+LANDMARKS_FILE = "landmarks.f32"
+LABELS_FILE = "labels.u8"
+SAMPLES_FILE = "samples.csv"
+META_FILE = "store.json"
+
+SAMPLE_COLUMNS = ["sample_name", "type", "number", "set_idx", "set_id", "row_start", "row_end"]
+
+
+def extract_type_and_number(fname: str):
+    """
+    video_normal_023_lange.csv
+    video_missing1_A_007_lange.csv
+    → (type_str, number_int)
+    """
+    m = re.match(r"video_(.+)_(\d+)_lange\.csv", fname)
+    if not m:
+        return None, None
+    return m.group(1), int(m.group(2))
+
+
+def iter_source_pairs(data_root):
+    """
+    data/out_csv/<sub>/*_lange.csv 와 data/out_npz/<sub>/hands_*.npz 짝을 찾는다.
+    반환: (sample_name, csv_path, npz_path, type_str, number) 를 순서대로 yield
+    """
+    csv_root = os.path.join(data_root, "out_csv")
+    npz_root = os.path.join(data_root, "out_npz")
+
+    subfolders = [d for d in os.listdir(csv_root) if os.path.isdir(os.path.join(csv_root, d))]
+    for sub in sorted(subfolders):
+        csv_dir = os.path.join(csv_root, sub)
+        npz_dir = os.path.join(npz_root, sub)
+
+        for csv_file in sorted(f for f in os.listdir(csv_dir) if f.endswith(".csv")):
+            type_str, number = extract_type_and_number(csv_file)
+            if type_str is None:
+                print("[WARN] 이름 패턴 안맞음:", csv_file)
+                continue
+
+            core_name = os.path.splitext(csv_file)[0].replace("_lange", "")   # video_xxx_007
+            npz_path = os.path.join(npz_dir, "hands_" + core_name + ".npz")
+            if not os.path.exists(npz_path):
+                print("[WARN] npz 없음:", npz_path)
+                continue
+
+            yield f"{sub}/{core_name}", os.path.join(csv_dir, csv_file), npz_path, type_str, number
+
+
+def newest_source_mtime(data_root):
+    """out_csv / out_npz 아래 파일 중 가장 최근 수정 시각 (stat 만 하므로 빠름)"""
+    newest = 0.0
+    for top in ("out_csv", "out_npz"):
+        for dirpath, _, filenames in os.walk(os.path.join(data_root, top)):
+            for f in filenames:
+                newest = max(newest, os.path.getmtime(os.path.join(dirpath, f)))
+    return newest
+
+
+def build_landmark_store(data_root, store_dir=None):
+    """
+    data_root 의 CSV/NPZ 를 모두 읽어 통합 저장소를 만든다.
+    샘플 하나씩 읽어서 바로 파일 끝에 붙이므로 전체 데이터를 메모리에 올리지 않는다.
+    반환: store_dir
+    """
+    store_dir = store_dir or os.path.join(data_root, STORE_DIR_NAME)
+    os.makedirs(store_dir, exist_ok=True)
+    source_mtime = newest_source_mtime(data_root)
+
+    # store.json 을 마지막에 다시 쓰므로, 중간에 실패하면 저장소가 없는 것으로 보임
+    meta_path = os.path.join(store_dir, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    rows = []
+    label_columns = None
+    hand_dim = None
+    n_rows = 0
+
+    x_tmp = os.path.join(store_dir, LANDMARKS_FILE + ".tmp")
+    y_tmp = os.path.join(store_dir, LABELS_FILE + ".tmp")
+    with open(x_tmp, "wb") as fx, open(y_tmp, "wb") as fy:
+        for sample_name, csv_path, npz_path, type_str, number in iter_source_pairs(data_root):
+            df = pd.read_csv(csv_path)
+            if "Unnamed: 0" in df.columns:
+                df = df.drop(columns=["Unnamed: 0"])
+            labels = df.to_numpy(dtype=np.float32)
+
+            with np.load(npz_path) as npz:
+                if "hand_kps" not in npz.files:
+                    print(f"[WARN] 'hand_kps' 키 없음: {npz_path}, keys={npz.files}")
+                    continue
+                landmarks = npz["hand_kps"].astype(np.float32)
+
+            if len(landmarks) != len(labels):
+                print("[WARN] 길이 불일치:", os.path.basename(csv_path))
+                continue
+
+            if label_columns is None:
+                label_columns = list(df.columns)
+                hand_dim = landmarks.shape[1]
+            elif list(df.columns) != label_columns or landmarks.shape[1] != hand_dim:
+                print("[WARN] 컬럼/차원 불일치:", sample_name)
+                continue
+
+            fx.write(np.ascontiguousarray(landmarks).tobytes())
+            fy.write((labels > 0.5).astype(np.uint8).tobytes())
+
+            set_idx = (number - 1) // 10 + 1          # 1~10 → set1, 11~20 → set2 ...
+            rows.append({
+                "sample_name": sample_name,
+                "type": type_str,
+                "number": number,
+                "set_idx": set_idx,
+                "set_id": f"{type_str}_set{set_idx}",
+                "row_start": n_rows,
+                "row_end": n_rows + len(landmarks),
+            })
+            n_rows += len(landmarks)
+
+    os.replace(x_tmp, os.path.join(store_dir, LANDMARKS_FILE))
+    os.replace(y_tmp, os.path.join(store_dir, LABELS_FILE))
+
+    with open(os.path.join(store_dir, SAMPLES_FILE), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SAMPLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    meta = {
+        "n_rows": n_rows,
+        "hand_dim": hand_dim or 0,
+        "label_columns": label_columns or [],
+        "source_mtime": source_mtime,
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    print(f"[INFO] landmark store: {len(rows)} samples, {n_rows} frames → {store_dir}")
+    return store_dir
+
+
+class LandmarkStore:
+    """
+    통합 저장소 읽기.
+
+    landmarks : (전체 프레임, D) float32 memmap
+    labels    : (전체 프레임, K) uint8 memmap
+    samples   : 샘플 표 (pandas DataFrame, SAMPLE_COLUMNS)
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        n, d = self.meta["n_rows"], self.meta["hand_dim"]
+        self.label_columns = self.meta["label_columns"]
+        k = len(self.label_columns)
+
+        if n > 0:
+            self.landmarks = np.memmap(os.path.join(store_dir, LANDMARKS_FILE),
+                                       dtype=np.float32, mode="c", shape=(n, d))
+            self.labels = np.memmap(os.path.join(store_dir, LABELS_FILE),
+                                    dtype=np.uint8, mode="c", shape=(n, k))
+        else:
+            self.landmarks = np.zeros((0, d), dtype=np.float32)
+            self.labels = np.zeros((0, k), dtype=np.uint8)
+
+        self.samples = pd.read_csv(os.path.join(store_dir, SAMPLES_FILE))
+        self._rows = {name: (int(s), int(e)) for name, s, e in
+                      zip(self.samples["sample_name"], self.samples["row_start"],
+                          self.samples["row_end"])}
+
+    def __len__(self):
+        return len(self.samples)
+
+    def sample_names(self):
+        return list(self.samples["sample_name"])
+
+    def rows(self, sample_name):
+        """샘플의 행 구간 (row_start, row_end)"""
+        return self._rows[sample_name]
+
+    def get(self, sample_name):
+        """(landmarks (N, D) view, labels (N, K) uint8 view)"""
+        s, e = self._rows[sample_name]
+        return self.landmarks[s:e], self.labels[s:e]
+
+    def to_data_dicts(self):
+        """
+        load_all_data_with_sets 와 같은 형태로 반환 (배열은 memmap view, 복사 없음)
+          data_dict: sample_name -> {"landmarks", "labels"}
+          meta_dict: sample_name -> {"type", "number", "set_idx", "set_id"}
+        """
+        data_dict = {}
+        meta_dict = {}
+        for row in self.samples.itertuples(index=False):
+            x, y = self.get(row.sample_name)
+            data_dict[row.sample_name] = {"landmarks": x, "labels": y}
+            meta_dict[row.sample_name] = {
+                "type": row.type,
+                "number": int(row.number),
+                "set_idx": int(row.set_idx),
+                "set_id": row.set_id,
+            }
+        return data_dict, meta_dict
+
+    def window_dataset(self, sample_names, window=15, step=5):
+        """sample_names 의 윈도우 데이터셋 (window_dataset.SlidingWindowDataset, 복사 없음)"""
+        from window_dataset import SlidingWindowDataset
+
+        sample_names = sorted(sample_names)
+        bounds = np.array([self._rows[s] for s in sample_names], dtype=np.int64).reshape(-1, 2)
+        return SlidingWindowDataset.from_arrays(self.landmarks, self.labels, sample_names,
+                                                bounds[:, 0], bounds[:, 1], window, step)
+
+
+def is_store_stale(data_root, store_dir=None):
+    store_dir = store_dir or os.path.join(data_root, STORE_DIR_NAME)
+    meta_path = os.path.join(store_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return True
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return newest_source_mtime(data_root) > meta["source_mtime"]
+
+
+def open_or_build_landmark_store(data_root, store_dir=None, rebuild=False):
+    """저장소가 없거나 원본 CSV/NPZ 가 더 새로우면 다시 만든 뒤 연다."""
+    store_dir = store_dir or os.path.join(data_root, STORE_DIR_NAME)
+    if rebuild or is_store_stale(data_root, store_dir):
+        build_landmark_store(data_root, store_dir)
+    return LandmarkStore(store_dir)
+
+
+def load_all_data_with_sets(data_root: str):
+    """
+    medels.ipynb load_all_data_with_sets 의 저장소 버전 (반환 형태 동일).
+    labels 는 uint8 view (윈도우 데이터셋에서 배치 단위로 float 변환)
+    """
+    store = open_or_build_landmark_store(data_root)
+    data_dict, meta_dict = store.to_data_dicts()
+
+    print(f"[INFO] 총 샘플 수: {len(data_dict)}")
+    print(f"[INFO] 세트 개수: {len(set(m['set_id'] for m in meta_dict.values()))}")
+    return data_dict, meta_dict
@@ -0,0 +1,456 @@
+import csv
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from fusion import FusionStream
+from hand_stream import process_hands
+from metrics import METRICS, MetricsDumper, draw_stage_timings
+from tcn_stream import ACTION_KEYS, StreamingTCN
+from yolo_batch import preprocess_batch
+
+"""
+실시간 라인 모니터 (캡처 → 손 랜드마크 → TCN → YOLO → 융합 플래그, 한 프로세스)
+
+지금은 A/S/D 검출이 노트북 여러 개로 나뉘어 있고 단계 사이를 디스크로 넘긴다.
+    recoding_video.py → 프레임 저장
+    lendmark_npz.ipynb → hands_*.npz
+    TCN → _pred.csv,  test_pred_bbox.ipynb → _yolo_states.csv
+    build_events_from_tcn_yolo → 플래그 CSV
+그래서 missing1/missing2 같은 빠진 단계를 작업자가 자리를 뜬 뒤에야 알 수 있다.
+
+LineMonitor 는 같은 단계를 메모리 안에서 크기 제한 큐로 연결한다.
+
+    source ─┬─ hands_q ─→ [hands 워커] MediaPipe → StreamingTCN (프레임 순서대로)
+            │                                       │
+            └─ yolo_q ──→ [yolo 워커]  큐에 쌓인 만큼 배치로 추론
+                                                    ↓
+                                   [fusion] seq 로 두 결과를 맞춰 FusionStream.push
+                                            → frame_idx,time_sec,flag_id,flag_key
+
+    - 두 워커는 같은 decode 프레임(같은 ndarray)을 받는다 (복사 없음)
+    - 카메라 입력이면 큐가 가득 찼을 때 프레임을 버린다 (두 큐에 모두 넣거나 모두 버림)
+      영상/프레임 저장소 재생이면 버리지 않고 기다린다 (결과 재현용)
+    - 프레임마다 hands / tcn / yolo / fusion 시간과 캡처 → 플래그까지의 end-to-end 지연을 기록
+
+실행:
+    python line_monitor.py   (아래 SOURCE / 가중치 경로 수정 후)
+"""
+
+# =========================
+# 1. 설정
+# =========================
+
+# 카메라 인덱스(int) 또는 프레임 저장소 / 영상 파일 경로(str)
+SOURCE = 0
+REPLAY_FPS = 7.5               # 경로 입력일 때 time_sec 계산용 fps
+
+TCN_WEIGHTS   = "tcn_fold0.pt"
+YOLO_OPENCLOSE = os.path.join("yolo", "best_openclose.pt")
+YOLO_FULLEMPTY = os.path.join("yolo", "best_fullempty.pt")
+YOLO_MERGED    = None          # 4클래스 단일 모델을 쓸 때 경로 지정
+
+OUT_DIR = os.path.join("monitor", "events")
+
+QUEUE_SIZE = 8                 # 단계 사이 큐 크기 (프레임 수)
+YOLO_BATCH = 4                 # yolo 워커가 한 번에 묶는 최대 프레임 수
+MAX_HANDS  = 2
+FUSION_MIN_SEG_LEN = 5
+TCN_THRESHOLD = 0.5            # 학습 때 accuracy 와 같은 기준으로 A/S/D 를 0/1 로 바꿔 융합
+PRINT_EVERY = 150              # 이 프레임 수마다 지연 통계 출력
+SHOW_PREVIEW = True
+
+STAGES = ("hands_ms", "tcn_ms", "yolo_ms", "fusion_ms", "e2e_ms")
+
+_STOP = None
+
+
+class LineMonitor:
+    """
+    source     : (seq, frame) 을 내는 iterable. 카메라는 camera_frames(), 파일은 store_frames()
+    tcn_model  : TCNClassifier (tcn_model.load_tcn_classifier)
+    detector   : yolo_batch.DualYoloDetector / MergedYoloDetector
+    drop_when_full : True 면 큐가 가득 찼을 때 프레임을 버림 (카메라), False 면 기다림 (재생)
+
+    run() 은 호출한 스레드에서 fusion 단계를 돌리고, 소스가 끝나거나 stop() 되면 반환한다.
+    """
+
+    def __init__(self, source, tcn_model, detector, events_csv=None, fps=None,
+                 drop_when_full=True, queue_size=QUEUE_SIZE, yolo_batch=YOLO_BATCH,
+                 max_hands=MAX_HANDS, min_seg_len=FUSION_MIN_SEG_LEN,
+                 tcn_threshold=TCN_THRESHOLD, latency_window=300):
+        self.source = source
+        self.tcn = StreamingTCN(tcn_model)
+        self.detector = detector
+        self.events_csv = events_csv
+        self.fps = fps
+        self.drop_when_full = drop_when_full
+        self.yolo_batch = yolo_batch
+        self.max_hands = max_hands
+        self.tcn_threshold = tcn_threshold
+        # FusionStream 의 frame_idx 는 융합된 프레임 수 기준이라 time_sec 은 여기서 다시 계산
+        self.fusion = FusionStream(fps=fps or 30.0, min_seg_len=min_seg_len)
+
+        self.hands_q = queue.Queue(maxsize=queue_size)
+        self.yolo_q = queue.Queue(maxsize=queue_size)
+        self.out_q = queue.Queue()
+
+        self._running = threading.Event()
+        self._failed = threading.Event()
+        self._error = None           # 워커 스레드에서 난 첫 예외 (run() 이 다시 raise)
+        self._threads = []
+        self._t0 = None
+        # 융합 순서 → (seq, capture time). 플래그는 최근 min_seg_len 프레임 안쪽만 가리키므로 ring 으로 충분
+        self._seq_ring = [None] * (max(1, min_seg_len) + 2)
+        self._latency = deque(maxlen=latency_window)
+
+        self.frames_in = 0
+        self.dropped = 0
+        self.frames_fused = 0
+        self.events = []
+        self.latest_frame = None
+        self.last_probs = np.zeros(len(ACTION_KEYS), dtype=np.float32)
+        self.last_counts = None
+
+    # ---------- 단계 스레드 ----------
+
+    def _fail(self, exc):
+        """워커 예외 기록 + 소스 중단 (죽은 워커의 큐에 더 넣지 않도록)"""
+        if self._error is None:
+            self._error = exc
+        self._failed.set()
+        self._running.clear()
+
+    def _put(self, q, item):
+        """재생 모드 put. 다른 워커가 죽어서 큐가 안 비면 False"""
+        while not self._failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _put_stop(self, q):
+        # 워커가 죽은 뒤라면 아무도 안 읽는 큐일 수 있으므로 비우고 넣는다
+        while True:
+            try:
+                q.put(_STOP, timeout=0.1)
+                return
+            except queue.Full:
+                if self._failed.is_set():
+                    while True:
+                        try:
+                            q.get_nowait()
+                        except queue.Empty:
+                            break
+
+    def _source_loop(self):
+        try:
+            for seq, frame in self.source:
+                if not self._running.is_set():
+                    break
+                t_cap = time.monotonic()
+                if self._t0 is None:
+                    self._t0 = t_cap
+                self.latest_frame = frame
+                self.frames_in += 1
+
+                item = (seq, t_cap, frame)
+                if self.drop_when_full:
+                    # 생산자는 이 스레드 하나뿐이라 full() 확인 후 put 해도 안전
+                    if self.hands_q.full() or self.yolo_q.full():
+                        self.dropped += 1
+                        METRICS.incr("dropped")
+                        continue
+                    self.hands_q.put_nowait(item)
+                    self.yolo_q.put_nowait(item)
+                elif not (self._put(self.hands_q, item) and self._put(self.yolo_q, item)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put_stop(self.hands_q)
+            self._put_stop(self.yolo_q)
+
+    def _hands_loop(self):
+        hands = None
+        try:
+            import mediapipe as mp
+
+            hands = mp.solutions.hands.Hands(
+                static_image_mode=False,
+                max_num_hands=self.max_hands,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5,
+            )
+            kps = np.zeros((self.max_hands, 21, 3), dtype=np.float32)
+            while True:
+                item = self.hands_q.get()
+                if item is _STOP:
+                    break
+                seq, t_cap, frame = item
+                t0 = time.perf_counter()
+                process_hands(hands, frame, kps)
+                t1 = time.perf_counter()
+                probs = self.tcn.predict_proba(kps.reshape(-1))
+                t2 = time.perf_counter()
+                self.out_q.put(("hands", seq, t_cap, probs,
+                                {"hands_ms": (t1 - t0) * 1000.0, "tcn_ms": (t2 - t1) * 1000.0}))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            if hands is not None:
+                hands.close()
+            self.out_q.put(("hands", _STOP, None, None, None))
+
+    def _yolo_loop(self):
+        try:
+            stop = False
+            while not stop:
+                batch = [self.yolo_q.get()]
+                # 큐에 이미 쌓인 프레임은 같이 묶어서 한 번에 추론
+                while len(batch) < self.yolo_batch:
+                    try:
+                        batch.append(self.yolo_q.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is _STOP:
+                    batch.pop()
+                    stop = True
+                if not batch:
+                    continue
+
+                t0 = time.perf_counter()
+                x = preprocess_batch([frame for _, _, frame in batch],
+                                     device=getattr(self.detector, "device", "cpu"))
+                counts = self.detector.count_batch(x)
+                per_frame_ms = (time.perf_counter() - t0) * 1000.0 / len(batch)
+                for (seq, t_cap, _), c in zip(batch, counts):
+                    self.out_q.put(("yolo", seq, t_cap, c, {"yolo_ms": per_frame_ms}))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self.out_q.put(("yolo", _STOP, None, None, None))
+
+    # ---------- 실행 ----------
+
+    def start(self):
+        self._running.set()
+        for name, target in (("source", self._source_loop),
+                             ("hands", self._hands_loop),
+                             ("yolo", self._yolo_loop)):
+            t = threading.Thread(target=target, daemon=True, name=f"monitor-{name}")
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        """소스 읽기를 멈춘다. 큐에 남은 프레임은 run() 이 마저 처리하고 반환"""
+        self._running.clear()
+
+    def _time_sec(self, seq, t_cap):
+        if self.fps:
+            return seq / self.fps
+        return t_cap - self._t0
+
+    def _emit(self, events, writer, f):
+        for ev in events:
+            seq, t_cap = self._seq_ring[ev["frame_idx"] % len(self._seq_ring)]
+            row = [seq, round(self._time_sec(seq, t_cap), 3), ev["flag_id"], ev["flag_key"]]
+            self.events.append(row)
+            if writer is not None:
+                writer.writerow(row)
+                f.flush()
+            print(f"[FLAG] {ev['flag_key']} {ev['edge']} frame {seq} ({row[1]:.2f}s)")
+
+    def run(self, on_frame=None):
+        """
+        fusion 단계. on_frame(monitor) 는 프레임이 하나 융합될 때마다 호출 (미리보기 등)
+        반환: 이벤트 리스트 [frame_idx, time_sec, flag_id, flag_key]
+        워커 스레드(소스 / hands / yolo)에서 예외가 나면 남은 스레드를 정리한 뒤 그 예외를 다시 raise
+        """
+        if not self._threads:
+            self.start()
+
+        f = writer = None
+        if self.events_csv is not None:
+            os.makedirs(os.path.dirname(self.events_csv) or ".", exist_ok=True)
+            f = open(self.events_csv, "w", newline="", encoding="utf-8")
+            writer = csv.writer(f)
+            writer.writerow(["frame_idx", "time_sec", "flag_id", "flag_key"])
+            f.flush()
+
+        pending = {}     # seq → {"hands": ..., "yolo": ...}
+        live = {"hands", "yolo"}
+        try:
+            while live:
+                kind, seq, t_cap, value, timing = self.out_q.get()
+                if seq is _STOP:
+                    live.discard(kind)
+                    continue
+
+                slot = pending.setdefault(seq, {"t_cap": t_cap, "timing": {}})
+                slot[kind] = value
+                slot["timing"].update(timing)
+                if "hands" not in slot or "yolo" not in slot:
+                    continue
+                del pending[seq]
+
+                # 두 워커 모두 FIFO 라 seq 가 작은 것부터 완성된다
+                t0 = time.perf_counter()
+                self._seq_ring[self.frames_fused % len(self._seq_ring)] = (seq, slot["t_cap"])
+                tcn_flags = (slot["hands"] > self.tcn_threshold).astype(np.float32)
+                events = self.fusion.push(tcn_flags, slot["yolo"])
+                fusion_ms = (time.perf_counter() - t0) * 1000.0
+
+                self.frames_fused += 1
+                self.last_probs = slot["hands"]
+                self.last_counts = slot["yolo"]
+                timing = slot["timing"]
+                e2e_ms = (time.monotonic() - slot["t_cap"]) * 1000.0
+                METRICS.observe("e2e", e2e_ms)
+                self._latency.append((timing["hands_ms"], timing["tcn_ms"], timing["yolo_ms"],
+                                      fusion_ms, e2e_ms))
+                self._emit(events, writer, f)
+
+                if on_frame is not None:
+                    on_frame(self)
+                if PRINT_EVERY and self.frames_fused % PRINT_EVERY == 0:
+                    print_latency(self.latency_summary(), self.dropped)
+
+            if self._error is None:
+                self._emit(self.fusion.flush(), writer, f)
+        finally:
+            self._running.clear()
+            if f is not None:
+                f.close()
+        for t in self._threads:
+            t.join(timeout=1.0)
+        if self._error is not None:
+            raise self._error
+        return self.events
+
+    def latency_summary(self):
+        """
+        최근 프레임의 단계별 지연(ms)
+            {stage: {"mean", "p95"}}  (stage: hands_ms, tcn_ms, yolo_ms, fusion_ms, e2e_ms)
+        """
+        if not self._latency:
+            return {stage: {"mean": 0.0, "p95": 0.0} for stage in STAGES}
+        lat = np.asarray(self._latency)
+        return {stage: {"mean": float(lat[:, i].mean()),
+                        "p95": float(np.percentile(lat[:, i], 95))}
+                for i, stage in enumerate(STAGES)}
+
+
+def print_latency(summary, dropped=0):
+    parts = [f"{stage[:-3]} {v['mean']:.1f}/{v['p95']:.1f}" for stage, v in summary.items()]
+    print(f"[INFO] latency ms (mean/p95): {', '.join(parts)}, dropped {dropped}")
+
+
+# =========================
+# 2. 입력 소스
+# =========================
+
+def camera_frames(cap, stop_event=None):
+    """열린 카메라에서 (seq, frame) 을 읽기 실패할 때까지"""
+    seq = 0
+    while stop_event is None or not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            print("[WARN] Failed to read frame.")
+            break
+        yield seq, frame
+        seq += 1
+
+
+def store_frames(path):
+    """프레임 저장소 / 영상 파일에서 (frame_idx, frame). 읽기 실패한 프레임은 건너뜀"""
+    from frame_store import open_frame_store
+
+    with open_frame_store(path) as store:
+        for idx, frame in store.iter_frames():
+            if frame is not None:
+                yield idx, frame
+
+
+# =========================
+# 3. 메인
+# =========================
+
+def draw_status(frame, monitor):
+    import cv2
+
+    probs = "  ".join(f"{k}:{p:.2f}" for k, p in zip(ACTION_KEYS, monitor.last_probs))
+    cv2.putText(frame, probs, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    if monitor.events:
+        _, t, _, key = monitor.events[-1]
+        cv2.putText(frame, f"last flag: {key} @ {t:.1f}s", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    e2e = monitor.latency_summary()["e2e_ms"]["mean"]
+    cv2.putText(frame, f"e2e {e2e:.0f}ms  dropped {monitor.dropped}", (10, 90),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+
+def main():
+    import cv2
+    from tcn_model import load_tcn_classifier
+    from yolo_batch import DualYoloDetector, MergedYoloDetector
+
+    if YOLO_MERGED is not None:
+        detector = MergedYoloDetector(YOLO_MERGED)
+    else:
+        detector = DualYoloDetector(YOLO_OPENCLOSE, YOLO_FULLEMPTY)
+    tcn_model = load_tcn_classifier(TCN_WEIGHTS)
+
+    cap = None
+    if isinstance(SOURCE, int):
+        from multi_camera import open_camera
+
+        cap = open_camera(SOURCE)
+        source, fps, drop = camera_frames(cap), None, True
+        name = f"cam{SOURCE}"
+    else:
+        source, fps, drop = store_frames(SOURCE), REPLAY_FPS, False
+        name = os.path.splitext(os.path.basename(os.path.normpath(SOURCE)))[0]
+
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    events_csv = os.path.join(OUT_DIR, f"{name}_{stamp}_events.csv")
+    METRICS.reset()
+    dumper = MetricsDumper(os.path.join(OUT_DIR, f"{name}_{stamp}"))
+    dumper.start()
+    monitor = LineMonitor(source, tcn_model, detector, events_csv=events_csv,
+                          fps=fps, drop_when_full=drop)
+
+    def preview(m):
+        if not SHOW_PREVIEW or m.latest_frame is None:
+            return
+        frame = m.latest_frame.copy()
+        draw_status(frame, m)
+        draw_stage_timings(frame, origin=(10, 120))
+        cv2.imshow("Line Monitor", frame)
+        if cv2.waitKey(1) & 0xFF in (ord('q'), 27):
+            m.stop()
+
+    print(f"[INFO] Monitoring {SOURCE} → {events_csv} (Q/ESC or Ctrl+C to stop)")
+    try:
+        monitor.run(on_frame=preview)
+    except KeyboardInterrupt:
+        monitor.stop()
+    finally:
+        if cap is not None:
+            cap.release()
+        cv2.destroyAllWindows()
+        dumper.stop()
+
+    print(f"[INFO] frames in {monitor.frames_in}, fused {monitor.frames_fused}, "
+          f"dropped {monitor.dropped}, flags {len(monitor.events)}")
+    print_latency(monitor.latency_summary(), monitor.dropped)
+
+
+if __name__ == "__main__":
+    main()
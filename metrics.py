@@ -0,0 +1,222 @@
+import csv
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+"""
+단계별 지연 / 처리량 계측 (timer, counter, histogram)
+
+캡처, 오버레이, 인코딩, 손 랜드마크, YOLO, TCN, 융합이 모두 같은 METRICS 에 기록한다.
+
+    from metrics import METRICS
+
+    with METRICS.timer("encode"):
+        cv2.imwrite(...)
+    METRICS.incr("dropped")
+    METRICS.observe("yolo", batch_ms / len(batch))   # 직접 잰 값
+
+    METRICS.snapshot()
+    → {"elapsed_sec", "counters": {...},
+       "stages": {"encode": {"count", "rate", "mean", "p50", "p95", "p99", "max"}, ...}}
+
+항상 켜 두어도 되도록 가볍게 만든다.
+    - 기록 1번 = perf_counter 2번 + lock + 고정 크기 ring 에 float 1개 쓰기
+    - 백분위수는 snapshot() 할 때만 최근 window 개 값으로 계산
+    - METRICS.enabled = False 면 timer 는 아무것도 재지 않는다
+
+세션마다 파일로 남기려면 MetricsDumper 를 쓴다. (interval 초마다)
+    - <prefix>_metrics.json : 최신 snapshot (덮어쓰기)
+    - <prefix>_metrics.csv  : time_sec, stage, count, rate, mean, p50, p95, p99, max (누적)
+"""
+
+DEFAULT_WINDOW = 2048
+CSV_COLUMNS = ["time_sec", "stage", "count", "rate", "mean", "p50", "p95", "p99", "max"]
+
+
+class Histogram:
+    """최근 window 개 값(ms)을 ring 에 보관. count / total 은 전체 누적"""
+
+    __slots__ = ("_values", "_pos", "count", "total", "max")
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._values = np.zeros(window, dtype=np.float64)
+        self._pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self._values[self._pos] = value
+        self._pos = (self._pos + 1) % len(self._values)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def summary(self, elapsed_sec=None):
+        n = min(self.count, len(self._values))
+        if n == 0:
+            return {"count": 0, "rate": 0.0, "mean": 0.0, "p50": 0.0,
+                    "p95": 0.0, "p99": 0.0, "max": 0.0}
+        p50, p95, p99 = np.percentile(self._values[:n], (50, 95, 99))
+        rate = self.count / elapsed_sec if elapsed_sec else 0.0
+        return {"count": self.count, "rate": float(rate),
+                "mean": float(self._values[:n].mean()),
+                "p50": float(p50), "p95": float(p95), "p99": float(p99),
+                "max": float(self.max)}
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_t0")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, (time.perf_counter() - self._t0) * 1000.0)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    단계 이름 → Histogram, 카운터 이름 → int.
+    여러 스레드(인코더 워커, 추론 워커 등)에서 동시에 기록해도 된다.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._t0 = time.monotonic()
+
+    def timer(self, name):
+        """with METRICS.timer("stage"): ... → 블록 실행 시간(ms) 기록"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, value_ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._stages.get(name)
+            if hist is None:
+                hist = self._stages[name] = Histogram(self.window)
+            hist.record(value_ms)
+
+    def incr(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        """세션 시작 시 호출 (누적값 / 시작 시각 초기화)"""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._t0 = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._t0
+            return {
+                "elapsed_sec": elapsed,
+                "counters": dict(self._counters),
+                "stages": {name: hist.summary(elapsed) for name, hist in self._stages.items()},
+            }
+
+
+# 프로세스 전체에서 같이 쓰는 기본 레지스트리
+METRICS = Metrics()
+
+
+# =========================
+# 파일 출력 / 화면 표시
+# =========================
+
+class MetricsDumper(threading.Thread):
+    """
+    interval 초마다 metrics 를 <prefix>_metrics.json / .csv 로 저장하는 스레드.
+    stop() 하면 마지막으로 한 번 더 저장하고 끝난다.
+    """
+
+    def __init__(self, prefix, metrics=METRICS, interval=5.0):
+        super().__init__(daemon=True, name="metrics-dumper")
+        self.metrics = metrics
+        self.interval = interval
+        self.json_path = prefix + "_metrics.json"
+        self.csv_path = prefix + "_metrics.csv"
+        self._stop_event = threading.Event()
+
+        os.makedirs(os.path.dirname(self.json_path) or ".", exist_ok=True)
+        self._csv_f = open(self.csv_path, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._csv_f)
+        self._csv.writerow(CSV_COLUMNS)
+
+    def dump(self):
+        snap = self.metrics.snapshot()
+
+        # 다 쓴 뒤에 이름을 바꿔서, 읽는 쪽이 쓰다 만 JSON 을 보지 않게 한다
+        tmp_path = self.json_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snap, f, indent=2)
+        os.replace(tmp_path, self.json_path)
+
+        t = round(snap["elapsed_sec"], 3)
+        for stage, s in sorted(snap["stages"].items()):
+            self._csv.writerow([t, stage] + [round(s[k], 3) for k in CSV_COLUMNS[2:]])
+        self._csv_f.flush()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.dump()
+        self._csv_f.close()
+
+
+def format_stage_lines(metrics=METRICS, stages=None):
+    """["encode  p50 3.1  p95 5.2 ms", ...] 형태의 문자열 목록 (오버레이/로그용)"""
+    snap = metrics.snapshot()["stages"]
+    names = stages if stages is not None else sorted(snap)
+    return [f"{name:<9} p50 {snap[name]['p50']:5.1f}  p95 {snap[name]['p95']:5.1f} ms"
+            for name in names if name in snap]
+
+
+def draw_stage_timings(frame, metrics=METRICS, origin=(10, 100), stages=None):
+    """frame 에 단계별 p50/p95 를 직접 그린다 (복사하지 않음)"""
+    import cv2
+
+    x, y = origin
+    for line in format_stage_lines(metrics, stages):
+        cv2.putText(frame, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45,
+                    (200, 255, 200), 1, cv2.LINE_AA)
+        y += 18
+    return frame
@@ -0,0 +1,506 @@
+import cv2
+import os
+import time
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from capture_pipeline import ThreadedRecorder
+from frame_sidecar import FrameSidecarWriter, frame_times
+from frame_store import SegmentedFrameWriter
+from session_catalog import SessionCatalog, record_session
+
+"""
+여러 카메라 동시 녹화 (스테이션 여러 대 → 하나의 세션)
+
+init_camera() 는 CAMERA_INDEX 하나만 열기 때문에, 라인에 카메라가 여러 대면
+스크립트를 따로 띄워야 했고 세션 번호/시간축도 카메라마다 달랐다.
+
+구성:
+    - discover_cameras() : 카메라 인덱스를 병렬로 열어서 사용 가능한 것만 반환
+    - open_camera()      : init_camera() 를 인덱스 인자로 일반화
+    - MultiCameraRecorder: 카메라마다 ThreadedRecorder(읽기 스레드 + 인코더 워커)
+                           모든 사이드카가 같은 t0 를 쓰므로 capture_ts 가 같은 시간축
+    - align_frame_times(): 기준 카메라(첫 번째) 프레임마다 다른 카메라의 가장 가까운
+                           프레임을 찾아 정렬 (허용 오차 밖이면 -1)
+
+조작 키: recoding_video 와 동일 (SPACE 시작/종료, A/S/D 플래그, Q/ESC 종료)
+
+출력 구조:
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>/cam<인덱스>/frame_000000.jpg, ...
+      (STORAGE_MODE = "segments" 이면 cam 폴더마다 seg_*.avi + frame_index.bin)
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>/cam<인덱스>_frames.bin
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_events.csv
+      (save_events_csv 와 같은 컬럼, frame_idx 는 기준 카메라 프레임 번호)
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_sync.csv
+      (기준 카메라 프레임별 각 카메라 프레임 번호 + skew)
+"""
+
+# =========================
+# 1. 설정 가능한 전역 변수
+# =========================
+
+# --- 카메라 / 영상 설정 ---
+# None 이면 0 ~ MAX_CAMERA_INDEX 를 검사해서 열리는 카메라를 모두 사용
+# 예: [0, 1, 2] (첫 번째 카메라가 이벤트 CSV frame_idx 기준)
+CAMERA_INDICES   = None
+MAX_CAMERA_INDEX = 5
+FRAME_WIDTH  = 1280
+FRAME_HEIGHT = 720
+FPS          = 30
+EXPOSURE     = -9         # None 이면 설정 안 함
+
+# --- 저장 경로 설정 ---
+BASE_DIR      = "video"
+SCENARIO_DIR  = "normal"
+SCENARIO_CODE = "normal"
+
+# --- 프레임 저장 옵션 ---
+JPEG_QUALITY    = 95
+STORAGE_MODE    = "jpeg"   # "jpeg" 또는 "segments" (recoding_video copy 2.py 참고)
+SEGMENT_SECONDS = 60
+
+# --- 캡처 파이프라인 옵션 (카메라마다 적용) ---
+RING_BUFFER_SIZE = 64
+ENCODER_WORKERS  = 2
+
+# --- 동기화 옵션 ---
+# 기준 카메라 프레임과 이 시간 이내인 프레임만 같은 시점으로 인정 (초)
+SYNC_TOLERANCE_SEC = 0.020
+
+# --- 미리보기 ---
+PREVIEW_HEIGHT = 360     # 카메라 화면을 이 높이로 줄여서 가로로 이어 붙임
+
+# segments 모드: 카메라 폴더 → SegmentedFrameWriter (녹화 중인 세션만)
+_segment_writers = {}
+
+
+# =========================
+# 2. 카메라 검색 / 열기
+# =========================
+
+def probe_camera(index, backend=cv2.CAP_DSHOW):
+    """카메라 인덱스를 열어서 프레임 1장이 읽히면 True"""
+    cap = cv2.VideoCapture(index, backend)
+    try:
+        if not cap.isOpened():
+            return False
+        ret, _ = cap.read()
+        return bool(ret)
+    finally:
+        cap.release()
+
+
+def discover_cameras(max_index=5, backend=cv2.CAP_DSHOW, max_workers=None):
+    """
+    0 ~ max_index 카메라를 병렬로 검사한다.
+    (하나씩 열면 없는 인덱스마다 드라이버 타임아웃을 기다려야 해서 오래 걸림)
+
+    반환: 사용 가능한 카메라 인덱스 리스트 (오름차순)
+    """
+    indices = list(range(max_index + 1))
+    with ThreadPoolExecutor(max_workers=max_workers or len(indices)) as pool:
+        results = list(pool.map(lambda i: probe_camera(i, backend), indices))
+
+    available = [i for i, ok in zip(indices, results) if ok]
+    for i in available:
+        print(f"Camera index {i}: OK")
+    return available
+
+
+def open_camera(index, width=FRAME_WIDTH, height=FRAME_HEIGHT, fps=FPS,
+                exposure=EXPOSURE, backend=cv2.CAP_DSHOW):
+    """
+    init_camera() 와 같은 설정으로 index 번 카메라를 연다.
+    """
+    cap = cv2.VideoCapture(index, backend)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open camera index {index}")
+
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH,  width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS,          fps)
+
+    if exposure is not None:
+        cap.set(cv2.CAP_PROP_EXPOSURE, exposure)
+
+    return cap
+
+
+# =========================
+# 3. 저장 / 정렬 유틸
+# =========================
+
+def get_output_dir():
+    out_dir = os.path.join(BASE_DIR, SCENARIO_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    return out_dir
+
+
+def get_next_index(out_dir, scenario_code):
+    """video_<scenario_code>_<번호> 다음 번호 발급 (session_catalog, 단일 카메라 녹화와 번호 공유)"""
+    return SessionCatalog(out_dir).next_index(f"video_{scenario_code}")
+
+
+def make_session_paths():
+    """
+    반환:
+        session_dir: 카메라별 폴더가 들어갈 세션 폴더
+        event_path : 통합 이벤트 CSV 경로
+        sync_path  : 프레임 정렬 CSV 경로
+    """
+    out_dir = get_output_dir()
+    index = get_next_index(out_dir, SCENARIO_CODE)
+    base_name = f"video_{SCENARIO_CODE}_{index:03d}"
+
+    session_dir = os.path.join(out_dir, base_name)
+    event_path = os.path.join(out_dir, base_name + "_events.csv")
+    sync_path = os.path.join(out_dir, base_name + "_sync.csv")
+    return session_dir, event_path, sync_path
+
+
+def save_frame(frames_dir, frame_idx, frame):
+    """카메라 폴더에 프레임 저장 (ThreadedRecorder 의 save_fn)"""
+    if STORAGE_MODE == "segments":
+        _segment_writers[frames_dir].write(frame_idx, frame)
+        return
+
+    path = os.path.join(frames_dir, f"frame_{frame_idx:06d}.jpg")
+    if not cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]):
+        print(f"[WARN] Failed to write frame: {path}")
+
+
+def save_events_csv(event_path, events):
+    """recoding_video 의 save_events_csv 와 같은 형식"""
+    if not events:
+        return
+
+    with open(event_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame_idx", "time_sec", "flag_id", "flag_key"])
+        writer.writerows(events)
+
+
+def align_frame_times(times, tolerance=SYNC_TOLERANCE_SEC):
+    """
+    카메라별 프레임 시각을 기준 카메라(times[0]) 프레임에 맞춰 정렬한다.
+
+    times: 카메라별 capture_ts 배열 리스트 (같은 t0 기준, 각 배열은 오름차순)
+
+    반환:
+        matched: (M, N) int64, matched[i, c] = 기준 프레임 i 에 대응하는 카메라 c 프레임 번호
+                 (tolerance 안에 프레임이 없으면 -1)
+        skew   : (M,) 대응된 프레임들 사이의 최대 시간 차이(초)
+    """
+    ref = np.asarray(times[0], dtype=np.float64)
+    m, n = len(ref), len(times)
+
+    matched = np.full((m, n), -1, dtype=np.int64)
+    matched[:, 0] = np.arange(m)
+    matched_ts = np.full((m, n), np.nan)
+    matched_ts[:, 0] = ref
+
+    for c in range(1, n):
+        t = np.asarray(times[c], dtype=np.float64)
+        if len(t) == 0 or m == 0:
+            continue
+        # ref 바로 앞/뒤 프레임 중 더 가까운 쪽
+        right = np.clip(np.searchsorted(t, ref), 0, len(t) - 1)
+        left = np.clip(right - 1, 0, len(t) - 1)
+        pick = np.where(np.abs(t[left] - ref) <= np.abs(t[right] - ref), left, right)
+
+        ok = np.abs(t[pick] - ref) <= tolerance
+        matched[ok, c] = pick[ok]
+        matched_ts[ok, c] = t[pick[ok]]
+
+    if m == 0:
+        return matched, np.zeros(0)
+    skew = np.nanmax(matched_ts, axis=1) - np.nanmin(matched_ts, axis=1)
+    return matched, skew
+
+
+def save_sync_csv(sync_path, camera_indices, ref_times, matched, skew):
+    with open(sync_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time_sec"] + [f"cam{c}_frame_idx" for c in camera_indices] + ["skew_ms"])
+        for t, row, s in zip(ref_times, matched, skew):
+            writer.writerow([f"{t:.6f}"] + row.tolist() + [f"{s * 1000.0:.3f}"])
+
+
+# =========================
+# 4. 멀티 카메라 녹화기
+# =========================
+
+class MultiCameraRecorder:
+    """
+    카메라 N 대를 각각 ThreadedRecorder 로 열어 하나의 세션으로 녹화한다.
+
+    camera_indices : 카메라 인덱스 리스트 (첫 번째가 기준 카메라)
+    buffer_size    : 카메라별 인코딩 대기 프레임 최대 수
+    num_workers    : 카메라별 인코더 워커 수
+
+    사용 예:
+        rec = MultiCameraRecorder([0, 1])
+        rec.start()
+        frames = rec.read_all()                     # 카메라별 최신 프레임
+        rec.start_session(session_dir)
+        stats = rec.stop_session(sync_path)         # 카메라별 처리량 + skew 통계
+        rec.close()
+    """
+
+    def __init__(self, camera_indices, buffer_size=RING_BUFFER_SIZE, num_workers=ENCODER_WORKERS):
+        if not camera_indices:
+            raise RuntimeError("No cameras to record")
+
+        self.camera_indices = list(camera_indices)
+        if STORAGE_MODE == "segments":
+            # 세그먼트 파일은 순서대로 써야 하므로 카메라당 워커 1개
+            num_workers = 1
+
+        self.caps = [open_camera(i) for i in self.camera_indices]
+        self.recorders = [
+            ThreadedRecorder(cap, save_frame, buffer_size=buffer_size, num_workers=num_workers)
+            for cap in self.caps
+        ]
+        self._seqs = [0] * len(self.recorders)
+        self._latest = [None] * len(self.recorders)
+
+        self.session_dir = None
+        self._camera_dirs = []
+        self._sidecars = []
+        self._t0 = None
+
+    def start(self):
+        for r in self.recorders:
+            r.start()
+
+    def read_all(self, timeout=1.0):
+        """
+        카메라별 가장 최근 프레임 리스트.
+        새 프레임이 없는 카메라는 직전 프레임을 그대로 돌려준다 (한 번도 못 읽었으면 None)
+        """
+        for i, r in enumerate(self.recorders):
+            # 첫 번째 카메라만 새 프레임을 기다리고 나머지는 있는 것만 가져옴
+            seq, frame = r.read(self._seqs[i], timeout if i == 0 else 0.0)
+            if frame is not None:
+                self._seqs[i] = seq
+                self._latest[i] = frame
+        return list(self._latest)
+
+    @property
+    def failed(self):
+        return any(r.failed for r in self.recorders)
+
+    @property
+    def frame_idx(self):
+        """기준 카메라의 가장 최근 저장 대기 프레임 번호 (이벤트 CSV 용)"""
+        return self.recorders[0].frame_idx
+
+    def start_session(self, session_dir):
+        """
+        세션 폴더 아래에 카메라별 폴더/사이드카를 만들고 모든 카메라 녹화를 시작한다.
+        사이드카는 같은 t0 를 쓰므로 capture_ts 를 카메라끼리 바로 비교할 수 있다.
+        """
+        os.makedirs(session_dir, exist_ok=True)
+        self.session_dir = session_dir
+        self._t0 = time.monotonic()
+        t0_wall = time.time()
+
+        self._camera_dirs = []
+        self._sidecars = []
+        for cam, r in zip(self.camera_indices, self.recorders):
+            cam_dir = os.path.join(session_dir, f"cam{cam}")
+            os.makedirs(cam_dir, exist_ok=True)
+            if STORAGE_MODE == "segments":
+                _segment_writers[cam_dir] = SegmentedFrameWriter(
+                    cam_dir, FPS, segment_seconds=SEGMENT_SECONDS, quality=JPEG_QUALITY)
+
+            sidecar = FrameSidecarWriter(os.path.join(session_dir, f"cam{cam}_frames.bin"),
+                                         t0_wall=t0_wall, t0=self._t0)
+            self._camera_dirs.append(cam_dir)
+            self._sidecars.append(sidecar)
+
+        for r, cam_dir, sidecar in zip(self.recorders, self._camera_dirs, self._sidecars):
+            r.start_session(cam_dir, sidecar)
+
+    def stop_session(self, sync_path=None):
+        """
+        모든 카메라 녹화를 멈추고 남은 프레임 저장을 기다린 뒤 통계를 반환한다.
+        sync_path 를 주면 프레임 정렬 결과를 CSV 로 저장한다.
+
+        반환:
+            {"cameras": [{"camera", "frames", "dropped", "queue_high_water",
+                          "queue_capacity", "fps"}, ...],
+             "sync": {"matched_ratio", "skew_mean_ms", "skew_p95_ms", "skew_max_ms"}}
+        """
+        cam_stats = [r.stop_session() for r in self.recorders]
+
+        for sidecar in self._sidecars:
+            sidecar.close()
+        for cam_dir in self._camera_dirs:
+            writer = _segment_writers.pop(cam_dir, None)
+            if writer is not None:
+                writer.close()
+
+        times = [np.array(frame_times(s.path)) for s in self._sidecars]
+
+        cameras = []
+        for cam, st, t in zip(self.camera_indices, cam_stats, times):
+            duration = t[-1] - t[0] if len(t) >= 2 else 0.0
+            st = dict(st, camera=cam,
+                      fps=(len(t) - 1) / duration if duration > 0 else 0.0)
+            cameras.append(st)
+
+        matched, skew = align_frame_times(times)
+        full = (matched >= 0).all(axis=1)
+        full_skew_ms = skew[full] * 1000.0
+        sync = {
+            "matched_ratio": float(full.mean()) if len(full) else 0.0,
+            "skew_mean_ms": float(full_skew_ms.mean()) if len(full_skew_ms) else 0.0,
+            "skew_p95_ms": float(np.percentile(full_skew_ms, 95)) if len(full_skew_ms) else 0.0,
+            "skew_max_ms": float(full_skew_ms.max()) if len(full_skew_ms) else 0.0,
+        }
+        if sync_path is not None:
+            save_sync_csv(sync_path, self.camera_indices, times[0], matched, skew)
+
+        self.session_dir = None
+        self._camera_dirs = []
+        self._sidecars = []
+        return {"cameras": cameras, "sync": sync}
+
+    def close(self):
+        for r in self.recorders:
+            r.close()
+        for cap in self.caps:
+            cap.release()
+
+
+def log_camera_stats(events, frame_idx, elapsed_time_sec, stats):
+    """
+    카메라별 drop / 버퍼 통계를 통합 이벤트 리스트에 추가한다.
+    flag_id 는 단일 카메라와 같고, flag_key 뒤에 @cam<인덱스> 를 붙여 구분한다.
+    """
+    for st in stats["cameras"]:
+        cam = st["camera"]
+        events.append((frame_idx, elapsed_time_sec, 7, f"DROPPED:{st['dropped']}@cam{cam}"))
+        events.append((frame_idx, elapsed_time_sec, 8,
+                       f"QUEUE_HWM:{st['queue_high_water']}/{st['queue_capacity']}@cam{cam}"))
+
+
+def print_camera_stats(stats):
+    for st in stats["cameras"]:
+        print(f"[INFO] cam{st['camera']}: frames {st['frames']}, fps {st['fps']:.2f}, "
+              f"dropped {st['dropped']}, "
+              f"queue high-water {st['queue_high_water']}/{st['queue_capacity']}")
+    sync = stats["sync"]
+    print(f"[INFO] sync: matched {sync['matched_ratio'] * 100:.1f}%, "
+          f"skew mean {sync['skew_mean_ms']:.1f}ms, p95 {sync['skew_p95_ms']:.1f}ms, "
+          f"max {sync['skew_max_ms']:.1f}ms")
+
+
+def make_preview(frames, recording, elapsed):
+    """카메라 화면을 PREVIEW_HEIGHT 로 줄여 가로로 붙이고 상태 표시"""
+    tiles = []
+    for cam, frame in frames:
+        if frame is None:
+            tile = np.zeros((PREVIEW_HEIGHT, PREVIEW_HEIGHT * 16 // 9, 3), dtype=np.uint8)
+        else:
+            h, w = frame.shape[:2]
+            tile = cv2.resize(frame, (int(w * PREVIEW_HEIGHT / h), PREVIEW_HEIGHT))
+        cv2.putText(tile, f"cam{cam}", (10, 20), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (255, 255, 255), 1, cv2.LINE_AA)
+        tiles.append(tile)
+
+    preview = np.hstack(tiles)
+    if recording:
+        cv2.putText(preview, f"REC {elapsed:5.1f}s", (10, 40), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (0, 0, 255), 2, cv2.LINE_AA)
+    else:
+        cv2.putText(preview, "Press SPACE to start recording", (10, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    return preview
+
+
+# =========================
+# 5. 메인 루프
+# =========================
+
+def main():
+    camera_indices = CAMERA_INDICES
+    if camera_indices is None:
+        camera_indices = discover_cameras(MAX_CAMERA_INDEX)
+    if not camera_indices:
+        print("[WARN] No cameras found.")
+        return
+    print(f"[INFO] Cameras: {camera_indices} (reference: cam{camera_indices[0]})")
+
+    rec = MultiCameraRecorder(camera_indices)
+    rec.start()
+
+    recording = False
+    event_path = None
+    sync_path = None
+    record_start_time = None
+    events = []
+
+    print("[INFO] Press SPACE to start/stop recording. A/S/D for flags. Q or ESC to quit.")
+
+    def stop(elapsed_end):
+        stats = rec.stop_session(sync_path)
+        last_frame_idx = max(0, stats["cameras"][0]["frames"] - 1)
+        log_camera_stats(events, last_frame_idx, elapsed_end, stats)
+        events.append((last_frame_idx, elapsed_end, 9, "END"))
+        save_events_csv(event_path, events)
+        ref = stats["cameras"][0]
+        record_session(event_path, events, frames=ref["frames"], fps=round(ref["fps"], 3),
+                       duration_sec=round(elapsed_end, 3), cameras=list(camera_indices),
+                       matched_ratio=round(stats["sync"]["matched_ratio"], 4))
+        print(f"[INFO] Recording stopped. Events saved to: {event_path}")
+        print_camera_stats(stats)
+
+    while True:
+        frames = rec.read_all()
+        if rec.failed:
+            print("[WARN] Failed to read frame from camera. Exiting.")
+            if recording:
+                stop(time.time() - record_start_time)
+                recording = False
+            break
+
+        elapsed = time.time() - record_start_time if recording else 0.0
+        cv2.imshow("Multi Camera Capture",
+                   make_preview(list(zip(camera_indices, frames)), recording, elapsed))
+        key = cv2.waitKey(1) & 0xFF
+
+        if key in (ord('q'), 27):
+            if recording:
+                stop(elapsed)
+                recording = False
+            print("[INFO] Quit requested. Exiting.")
+            break
+
+        if key == 32:
+            if not recording:
+                session_dir, event_path, sync_path = make_session_paths()
+                events = [(0, 0.0, 0, "START")]
+                record_start_time = time.time()
+                rec.start_session(session_dir)
+                recording = True
+                print(f"[INFO] Recording started. Frames will be saved in: {session_dir}")
+            else:
+                stop(elapsed)
+                recording = False
+                events = []
+            continue
+
+        if recording and key in (ord('a'), ord('s'), ord('d')):
+            flag_id, flag_key = {ord('a'): (1, 'A'), ord('s'): (2, 'S'), ord('d'): (3, 'D')}[key]
+            events.append((rec.frame_idx, elapsed, flag_id, flag_key))
+
+    rec.close()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
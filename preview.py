@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+"""
+미리보기 렌더링 (텍스트 캐시 + 별도 스레드)
+
+기존 draw_overlay() 는 프레임마다
+    overlay = frame.copy()  (1280×720 전체 복사)
+    → cv2.putText 최대 5번 (시나리오/해상도/대기 문구처럼 거의 안 바뀌는 글자도 매번 래스터화)
+를 캡처 루프 안에서 한다.
+
+    - TextSpriteCache : 글자를 한 번만 작은 alpha mask 로 그려 두고,
+                        프레임에는 그 ROI 만 섞는다 (같은 글자는 다시 그리지 않음)
+    - PreviewThread   : 최신 프레임을 PREVIEW_HZ(기본 15Hz)로만 가져가서
+                        재사용 버퍼에 복사 → 오버레이 → imshow / waitKey
+                        키 입력은 큐로 넘겨 주므로 캡처 / 저장 / 이벤트 기록 루프는
+                        미리보기 비용을 기다리지 않는다
+
+사용 예:
+    preview = PreviewThread(render_fn, rate_hz=15, window_name="Capture")
+    preview.start()
+    while ...:
+        preview.submit(frame, status)   # 참조만 넘김 (복사 없음)
+        key = preview.poll_key()        # 없으면 255
+    preview.stop()
+"""
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+NO_KEY = 255
+
+
+class TextSpriteCache:
+    """
+    (text, scale, thickness) → alpha mask (uint8) 캐시. 색은 섞을 때 정한다.
+    REC 경과 시간처럼 바뀌는 글자도 같은 경로로 그리고, 오래 안 쓴 것부터 버린다(LRU).
+    """
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+
+    def get(self, text, scale, thickness):
+        key = (text, scale, thickness)
+        sprite = self._items.get(key)
+        if sprite is not None:
+            self._items.move_to_end(key)
+            return sprite
+
+        (w, h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+        pad = thickness + 1
+        mask = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+        # putText 의 org 는 글자 baseline 왼쪽 아래 → mask 안에서는 (pad, pad + h)
+        cv2.putText(mask, text, (pad, pad + h), FONT, scale, 255, thickness, cv2.LINE_AA)
+        sprite = (mask, pad + h)          # (alpha, mask 위쪽에서 baseline 까지 거리)
+
+        self._items[key] = sprite
+        if len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+        return sprite
+
+    def draw(self, buf, text, org, scale, color, thickness=1):
+        """
+        buf 에 text 를 그린다 (cv2.putText 와 같은 org 규칙). 글자 영역(ROI)만 섞는다.
+        """
+        mask, baseline_y = self.get(text, scale, thickness)
+        x, y = org[0] - (thickness + 1), org[1] - baseline_y
+        H, W = buf.shape[:2]
+        # 화면 밖으로 나가는 부분 자르기
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(W, x + mask.shape[1]), min(H, y + mask.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        alpha = mask[y0 - y:y1 - y, x0 - x:x1 - x, None].astype(np.uint16)
+        roi = buf[y0:y1, x0:x1]
+        color = np.asarray(color, dtype=np.uint16)
+        roi[:] = ((roi * (255 - alpha) + color * alpha + 127) // 255).astype(np.uint8)
+
+
+class PreviewThread(threading.Thread):
+    """
+    최신 프레임을 rate_hz 로 화면에 표시하는 스레드.
+
+    render_fn(buf, status) : 재사용 버퍼(buf, 프레임 복사본)에 오버레이를 직접 그린다
+    submit(frame, status)  : 캡처 루프에서 최신 프레임 참조 + 상태 dict 를 넘김
+    poll_key()             : 쌓인 키 입력 하나 (없으면 255)
+
+    imshow / waitKey 는 이 스레드에서만 호출한다 (창 생성도 이 스레드).
+    """
+
+    def __init__(self, render_fn, rate_hz=15.0, window_name="Preview"):
+        super().__init__(daemon=True, name="preview")
+        self.render_fn = render_fn
+        self.period = 1.0 / rate_hz if rate_hz else 0.0
+        self.window_name = window_name
+
+        self._lock = threading.Lock()
+        self._frame = None
+        self._status = {}
+        self._new = False
+        self._keys = []
+        self._running = True
+        self._buf = None
+        self.frames_shown = 0
+
+    def submit(self, frame, status=None):
+        with self._lock:
+            self._frame = frame
+            if status is not None:
+                self._status = status
+            self._new = True
+
+    def poll_key(self):
+        with self._lock:
+            return self._keys.pop(0) if self._keys else NO_KEY
+
+    def run(self):
+        next_t = time.monotonic()
+        try:
+            while self._running:
+                with self._lock:
+                    frame, status, new = self._frame, self._status, self._new
+                    self._new = False
+
+                if new and frame is not None:
+                    with METRICS.timer("overlay"):
+                        if self._buf is None or self._buf.shape != frame.shape:
+                            self._buf = np.empty_like(frame)
+                        np.copyto(self._buf, frame)
+                        self.render_fn(self._buf, status)
+                    cv2.imshow(self.window_name, self._buf)
+                    self.frames_shown += 1
+
+                # waitKey 가 창 이벤트도 처리하므로 새 프레임이 없어도 계속 호출
+                delay_ms = max(1, int((next_t + self.period - time.monotonic()) * 1000))
+                key = cv2.waitKey(delay_ms) & 0xFF
+                if key != NO_KEY:
+                    with self._lock:
+                        self._keys.append(key)
+                next_t = max(next_t + self.period, time.monotonic() - self.period)
+        finally:
+            cv2.destroyWindow(self.window_name)
+
+    def stop(self):
+        self._running = False
+        if self.is_alive():
+            self.join(timeout=2.0)
@@ -0,0 +1,111 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+"""
+작업 목록 프로세스 풀 실행 + 워커를 죽이는 작업만 골라내기
+
+ProcessPoolExecutor 는 워커 하나가 죽으면(os._exit, segfault, OOM kill 등) 풀 전체가 깨지고
+아직 안 끝난 future 가 전부 BrokenProcessPool 을 낸다. 어느 작업 때문인지는 알 수 없으므로
+
+    1) 공용 풀(num_workers 개 워커)에서 전부 실행
+    2) 풀이 깨지면 안 끝난 작업은 시도 횟수를 세지 않고 다시 돌릴 목록에 모음
+    3) 그 작업들은 작업마다 워커 1개짜리 풀에서 실행 (동시에 num_workers 개까지)
+       → 여기서 죽으면 그 작업 탓이므로 시도 횟수 +1,
+         max_attempts 번 죽으면 "worker crashed" 로 실패 보고
+       → 나머지 작업은 정상적으로 끝남
+
+batch_landmarks.py / transcode.py / tcn_cv.py 가 같이 쓴다.
+"""
+
+
+def run_isolated(fn, jobs, num_workers, max_attempts, initializer=None, initargs=(),
+                 mp_context=None, on_done=None, label=str):
+    """
+    jobs 의 job(인자 튜플)마다 fn(*job) 을 프로세스 풀로 실행.
+    fn / initializer 는 모듈 최상위 함수여야 함 (pickle 로 워커에 넘어감)
+
+    on_done(job, value): 작업이 끝날 때마다 메인 프로세스에서 호출 (진행 출력 / 통계 누적)
+    label(job)         : 경고 메시지에 쓸 작업 이름
+
+    반환:
+        done  : [(job, fn 반환값), ...]   (끝난 순서)
+        failed: [(job, 에러 메시지), ...]
+    """
+    jobs = list(jobs)
+    done = []
+    failed = []
+
+    def collect(i, fut):
+        """끝난 future 처리. 워커가 죽어서 결과가 없으면 False"""
+        try:
+            value = fut.result()
+        except BrokenProcessPool:
+            return False
+        except Exception as e:
+            msg = f"{type(e).__name__}: {e}"
+            failed.append((jobs[i], msg))
+            print(f"[WARN] {label(jobs[i])}: {msg}")
+            return True
+        done.append((jobs[i], value))
+        if on_done is not None:
+            on_done(jobs[i], value)
+        return True
+
+    def new_pool(max_workers):
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                                   initializer=initializer, initargs=initargs)
+
+    # 1) 공용 풀
+    crashed = []
+    with new_pool(num_workers) as pool:
+        futures = {pool.submit(fn, *job): i for i, job in enumerate(jobs)}
+        for fut in as_completed(futures):
+            if not collect(futures[fut], fut):
+                crashed.append(futures[fut])
+    if not crashed:
+        return done, failed
+
+    # 2) 작업마다 워커 1개짜리 풀 → 죽으면 그 작업 탓
+    print(f"[WARN] Worker crashed. Retrying {len(crashed)} job(s) one per process.")
+    attempts = {i: 0 for i in crashed}
+    pending = deque(sorted(crashed))
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < num_workers:
+                i = pending.popleft()
+                attempts[i] += 1
+                pool = new_pool(1)
+                running[pool.submit(fn, *jobs[i])] = (i, pool)
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                i, pool = running.pop(fut)
+                pool.shutdown()
+                if collect(i, fut):
+                    continue
+                if attempts[i] < max_attempts:
+                    print(f"[WARN] {label(jobs[i])}: worker crashed, retrying")
+                    pending.append(i)
+                else:
+                    failed.append((jobs[i], "worker crashed"))
+                    print(f"[WARN] {label(jobs[i])}: worker crashed {attempts[i]} time(s)")
+    finally:
+        for _, pool in running.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return done, failed
+
+
+def print_worker_stats(worker_stats, wall_seconds):
+    """worker_stats: {pid: {"jobs", "frames", "seconds"}}"""
+    total_frames = 0
+    for pid, st in sorted(worker_stats.items()):
+        fps = st["frames"] / st["seconds"] if st["seconds"] > 0 else 0.0
+        total_frames += st["frames"]
+        print(f"[INFO] worker {pid}: jobs {st['jobs']}, frames {st['frames']}, "
+              f"{fps:.1f} frames/sec")
+    if wall_seconds > 0:
+        print(f"[INFO] total: {total_frames} frames in {wall_seconds:.1f}s "
+              f"({total_frames / wall_seconds:.1f} frames/sec)")
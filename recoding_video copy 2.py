@@ -2,8 +2,14 @@ import cv2
 import os
 import time
 import csv
-import glob
-import re
+
+from capture_pipeline import ThreadedRecorder
+from frame_sidecar import FrameSidecarWriter, sidecar_path_from_events
+from frame_encoder import DEFAULT_LEVELS, FrameEncoder, QualityGovernor, write_image
+from frame_store import SegmentedFrameWriter
+from metrics import METRICS, MetricsDumper, draw_stage_timings
+from preview import PreviewThread, TextSpriteCache
+from session_catalog import SessionCatalog, record_session
 
 """
 카메라 영상 수집 + 이벤트 플래그(키보드 A/S/D) 기록 스크립트 (프레임 저장 버전)
@@ -18,10 +24,22 @@ import re
 추가 플래그:
     - START : 녹화 시작 시점 (flag_id = 0)
     - END   : 녹화 종료 시점 (flag_id = 9, 수동/자동/프로그램 종료 모두)
+    - DROPPED:<n>      : threaded 모드에서 버퍼가 가득 차 버려진 프레임 수 (flag_id = 7)
+    - QUEUE_HWM:<n>/<cap> : threaded 모드 인코딩 버퍼 최대 적재량 (flag_id = 8)
 
 출력 구조:
     - video/<SCENARIO_DIR>/<세션폴더>/frame_000000.jpg, frame_000001.jpg, ...
+      (STORAGE_MODE = "segments" 이면 seg_00000.avi, ... + frame_index.bin,
+       STORAGE_MODE = "raw" 이면 frames.raw 하나)
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_encode.bin
+      (프레임별로 실제 쓴 품질 / 해상도 / 크기, frame_encoder.py 참고)
     - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_events.csv
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_frames.bin
+      (프레임별 capture 타임스탬프 / drop 여부 / 인코딩 시간, frame_sidecar.py 참고)
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_metrics.json / _metrics.csv
+      (capture / overlay / encode 단계별 p50/p95/p99, metrics.py 참고)
+    - video/<SCENARIO_DIR>/_catalog_index.json, _catalog.jsonl
+      (세션 번호 발급 + 세션별 프레임 수 / 길이 / 실측 FPS / 이벤트 수, session_catalog.py 참고)
 
 예시:
     - SCENARIO_DIR="normal", SCENARIO_CODE="normal" 이고 첫 세션이면
@@ -69,10 +87,61 @@ IMAGE_FORMAT = "jpg"
 # JPG일 때 품질 (0~100, 높을수록 화질↑, 용량↑)
 JPEG_QUALITY = 95
 
+# 세션 폴더 저장 형식
+# "jpeg"     : 프레임마다 이미지 파일 1개 (frame_000000.jpg, ...)
+# "segments" : MJPG AVI 세그먼트(seg_00000.avi, ...) + 프레임 인덱스(frame_index.bin)
+#              세션당 파일 수가 몇 개뿐이라 폴더 스캔이 빠름, 읽기는 frame_store.open_frame_store()
+# "raw"      : 압축 없이 frames.raw 하나에 저장 (인코딩 CPU 0, 대신 720p 약 2.7MB/프레임)
+STORAGE_MODE     = "jpeg"
+SEGMENT_SECONDS  = 60   # segments 모드에서 세그먼트 하나의 길이(초)
+RAW_PREALLOC_SECONDS = 120  # raw 모드에서 처음에 미리 잡아 둘 파일 크기(초 단위, 모자라면 늘림)
+
+# --- 인코더 옵션 (jpeg / raw 모드) ---
+# "auto"      : PyTurboJPEG(libjpeg-turbo) 가 설치되어 있으면 사용, 없으면 OpenCV
+# "opencv"    : cv2.imencode
+# "turbojpeg" : PyTurboJPEG 강제 (없으면 에러)
+ENCODER_BACKEND = "auto"
+# True 면 threaded 모드에서 인코딩 버퍼가 밀릴 때 품질 → 해상도(640px) 순으로 자동으로 낮춤
+# (버퍼가 다시 비면 원래 품질로 복귀, 프레임별 설정은 _encode.bin 에 기록)
+ENCODE_GOVERNOR = True
+# True 면 처음부터 YOLO 입력 크기(긴 변 640px)로 줄여서 저장
+ENCODE_DOWNSCALE = False
+
+# --- 캡처 파이프라인 옵션 ---
+# "sync"     : 한 루프에서 읽기 → 화면 표시 → 프레임 저장을 순서대로 처리 (기존 방식)
+# "threaded" : 카메라 읽기 전용 스레드 + 프레임 버퍼 + 인코딩 워커 풀
+#              (프레임 저장이 카메라 루프를 막지 않아 카메라 본래 FPS 유지)
+CAPTURE_MODE     = "threaded"
+RING_BUFFER_SIZE = 64   # 인코딩 대기 프레임 최대 수 (넘치면 drop 후 CSV에 기록)
+ENCODER_WORKERS  = 3    # 인코딩 워커 스레드 수 (segments 모드는 순서 보장을 위해 1개)
+
 # --- 플래그 표시 옵션 ---
 # 화면에 "FLAG A/S/D" 텍스트를 얼마 동안 표시할지 (초 단위)
 FLAG_DISPLAY_DURATION = 1.0  # 1초 동안 표시
 
+# --- 계측 옵션 ---
+METRICS_INTERVAL   = 5.0    # 녹화 중 _metrics.json / _metrics.csv 를 갱신하는 간격(초)
+SHOW_STAGE_TIMINGS = False  # True 면 미리보기 화면에 단계별 p50/p95 표시
+
+# --- 미리보기 옵션 ---
+# 숫자 : 별도 스레드에서 최신 프레임만 이 주기(Hz)로 표시 (오버레이/imshow 가 캡처 루프를 막지 않음)
+# None : 캡처 루프 안에서 매 프레임 오버레이 + imshow (기존 방식)
+PREVIEW_HZ = 15
+
+# segments 모드: 세션 폴더 → SegmentedFrameWriter (녹화 중인 세션만)
+_segment_writers = {}
+# jpeg / raw 모드: 세션 폴더 → FrameEncoder (녹화 중인 세션만)
+_frame_encoders = {}
+# 세션 폴더 → MetricsDumper (녹화 중인 세션만)
+_metrics_dumpers = {}
+# 인코딩 품질 조절기 (depth_fn 은 main 에서 threaded 녹화기의 버퍼에 연결)
+_ENCODE_LEVELS = (DEFAULT_LEVELS[0]._replace(jpeg_quality=JPEG_QUALITY),) + DEFAULT_LEVELS[1:]
+_encode_governor = QualityGovernor(
+    levels=_ENCODE_LEVELS,
+    min_level=next(i for i, lv in enumerate(_ENCODE_LEVELS) if lv.max_side) if ENCODE_DOWNSCALE else 0)
+# 오버레이 글자 mask 캐시 (시나리오/해상도 같은 고정 문구는 한 번만 래스터화)
+_text_cache = TextSpriteCache()
+
 
 # =========================
 # 2. 유틸리티 함수들
@@ -113,29 +182,19 @@ def get_output_dir():
 
 def get_next_index(out_dir, scenario_code):
     """
-    현재 시나리오 폴더(out_dir)에 있는
-    video_<scenario_code>_<번호>* 파일/폴더들을 검사하여
-    다음에 사용할 번호를 계산한다.
+    현재 시나리오 폴더(out_dir)에서 video_<scenario_code>_<번호> 에 쓸
+    다음 번호를 발급한다. (session_catalog.py 참고)
+
+    폴더를 매번 훑지 않고 out_dir/_catalog_index.json 의 카운터를 파일 잠금 안에서
+    읽고 올리므로, 여러 녹화 프로세스가 같은 폴더를 써도 번호가 겹치지 않는다.
+    카탈로그가 없는 기존 폴더는 처음 한 번만 video_<scenario_code>_<번호>* 를 훑어서
+    이어지는 번호부터 시작한다.
 
     예:
-        video_normal_001.mp4, video_normal_001_events.csv, video_normal_002/
-        이런 것들이 있으면 → 다음 인덱스는 3 반환
-        아무 것도 없으면 → 1 반환
+        video_normal_001_events.csv, video_normal_002/ 가 있는 폴더의 첫 호출 → 3
+        아무 것도 없으면 → 1
     """
-    pattern = os.path.join(out_dir, f"video_{scenario_code}_*")
-    paths = glob.glob(pattern)
-
-    indices = []
-    for path in paths:
-        name = os.path.basename(path)
-        # video_<scenario_code>_<번호>... 에서 번호만 추출 (확장자/뒤에 붙는 것 무시)
-        m = re.match(rf"video_{re.escape(scenario_code)}_(\d+)", name)
-        if m:
-            indices.append(int(m.group(1)))
-
-    if not indices:
-        return 1
-    return max(indices) + 1
+    return SessionCatalog(out_dir).next_index(f"video_{scenario_code}")
 
 
 def make_session_paths():
@@ -166,29 +225,31 @@ def save_frame(frames_dir, frame_idx, frame):
     frames_dir : 프레임들이 들어갈 세션 폴더
     frame_idx  : 0부터 시작하는 프레임 번호 (파일명에 사용)
     frame      : 저장할 이미지 (OpenCV BGR ndarray)
+
+    STORAGE_MODE == "segments" 이면 세션의 세그먼트 파일에 이어서 기록한다.
     """
-    fmt = IMAGE_FORMAT.lower()
-    if fmt in ("jpg", "jpeg"):
-        ext = ".jpg"
-        params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
-    elif fmt == "png":
-        ext = ".png"
-        # 0~9, 높을수록 압축↑ (기본 3 정도)
-        params = [cv2.IMWRITE_PNG_COMPRESSION, 3]
-    else:
-        ext = "." + fmt
-        params = []
+    with METRICS.timer("encode"):
+        _save_frame(frames_dir, frame_idx, frame)
 
-    filename = f"frame_{frame_idx:06d}{ext}"
-    path = os.path.join(frames_dir, filename)
 
-    if params:
-        ok = cv2.imwrite(path, frame, params)
-    else:
-        ok = cv2.imwrite(path, frame)
+def _save_frame(frames_dir, frame_idx, frame):
+    if STORAGE_MODE == "segments":
+        _segment_writers[frames_dir].write(frame_idx, frame)
+        return
 
-    if not ok:
-        print(f"[WARN] Failed to write frame: {path}")
+    try:
+        encoder = _frame_encoders.get(frames_dir)
+        if encoder is not None:
+            encoder.write(frame_idx, frame)
+            return
+
+        # 녹화 세션 밖에서 바로 호출된 경우 (bench.py 등): 기본 설정으로 한 장 저장
+        fmt = IMAGE_FORMAT.lower()
+        ext = ".jpg" if fmt in ("jpg", "jpeg") else "." + fmt
+        write_image(os.path.join(frames_dir, f"frame_{frame_idx:06d}{ext}"),
+                    frame, fmt, _ENCODE_LEVELS[0])
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"[WARN] Failed to write frame {frame_idx} in {frames_dir}: {e}")
 
 
 def log_event(events, frame_idx, elapsed_time_sec, key_code):
@@ -230,6 +291,8 @@ def save_events_csv(event_path, events):
         1 : FLAG A
         2 : FLAG S
         3 : FLAG D
+        7 : drop 된 프레임 수 (DROPPED:<n>, threaded 모드)
+        8 : 인코딩 버퍼 최대 적재량 (QUEUE_HWM:<n>/<cap>, threaded 모드)
         9 : 녹화 종료 (END)
     """
     if not events:
@@ -242,11 +305,22 @@ def save_events_csv(event_path, events):
         writer.writerows(events)
 
 
+def log_pipeline_stats(events, frame_idx, elapsed_time_sec, stats):
+    """
+    threaded 모드 녹화 통계(drop 수, 버퍼 최대 적재량)를 이벤트 리스트에 추가한다.
+
+    stats: ThreadedRecorder.stop_session() 반환값
+    """
+    events.append((frame_idx, elapsed_time_sec, 7, f"DROPPED:{stats['dropped']}"))
+    events.append((frame_idx, elapsed_time_sec, 8,
+                   f"QUEUE_HWM:{stats['queue_high_water']}/{stats['queue_capacity']}"))
+
+
 def draw_overlay(frame, recording, record_start_time,
                  last_flag_text, last_flag_time):
     """
     영상에 현재 상태(시나리오, 해상도, REC 상태, 최근 플래그 등)를
-    오버레이(텍스트)로 그려준다.
+    오버레이(텍스트)로 그려준다. 원본 frame 은 건드리지 않고 복사본을 반환.
 
     recording        : 녹화 중 여부 (True/False)
     record_start_time: 녹화 시작 시각 (time.time 값) 또는 None
@@ -254,23 +328,31 @@ def draw_overlay(frame, recording, record_start_time,
     last_flag_time   : 최근 플래그가 눌린 시점 (time.time 값)
     """
     overlay = frame.copy()
+    render_overlay(overlay, recording, record_start_time, last_flag_text, last_flag_time)
+    return overlay
+
 
+def render_overlay(buf, recording, record_start_time,
+                   last_flag_text, last_flag_time):
+    """
+    draw_overlay 와 같은 내용을 buf 에 직접 그린다 (복사 없음).
+    글자는 _text_cache 의 mask 로 해당 영역(ROI)만 섞는다.
+    """
     # 프레임 실제 높이/너비 사용 (설정값과 다를 수도 있음)
-    h, w = overlay.shape[:2]
+    h, w = buf.shape[:2]
 
-    # (x, y) 좌표 및 글자 스타일 설정
-    font = cv2.FONT_HERSHEY_SIMPLEX
+    # 글자 스타일 설정
     scale = 0.5
     thickness = 1
     color_text = (255, 255, 255)  # 흰색
 
     # 1) 시나리오 정보 (왼쪽 상단)
     text1 = f"Scenario: {SCENARIO_DIR} ({SCENARIO_CODE})"
-    cv2.putText(overlay, text1, (10, 20), font, scale, color_text, thickness, cv2.LINE_AA)
+    _text_cache.draw(buf, text1, (10, 20), scale, color_text, thickness)
 
     # 2) 해상도 / FPS 정보
     text2 = f"Res: {w}x{h} (target {FRAME_WIDTH}x{FRAME_HEIGHT}) @ {FPS}fps"
-    cv2.putText(overlay, text2, (10, 40), font, scale, color_text, thickness, cv2.LINE_AA)
+    _text_cache.draw(buf, text2, (10, 40), scale, color_text, thickness)
 
     # 3) 녹화 상태 / 시간
     if recording and record_start_time is not None:
@@ -278,17 +360,17 @@ def draw_overlay(frame, recording, record_start_time,
         # 빨간색으로 REC 표시
         color_rec = (0, 0, 255)
         rec_text = f"REC {elapsed:5.1f}s"
-        cv2.putText(overlay, rec_text, (10, 60), font, scale, color_rec, thickness + 1, cv2.LINE_AA)
+        _text_cache.draw(buf, rec_text, (10, 60), scale, color_rec, thickness + 1)
 
         # 자동 녹화 시간 설정된 경우 남은 시간 표시
         if AUTO_RECORD_SECONDS is not None:
             remaining = max(0.0, AUTO_RECORD_SECONDS - elapsed)
             auto_text = f"AUTO STOP IN {remaining:5.1f}s"
-            cv2.putText(overlay, auto_text, (10, 80), font, scale, color_rec, thickness, cv2.LINE_AA)
+            _text_cache.draw(buf, auto_text, (10, 80), scale, color_rec, thickness)
     else:
         # 대기 상태
         idle_text = "Press SPACE to start recording"
-        cv2.putText(overlay, idle_text, (10, 60), font, scale, color_text, thickness, cv2.LINE_AA)
+        _text_cache.draw(buf, idle_text, (10, 60), scale, color_text, thickness)
 
     # 4) 최근 플래그 표시 (화면 왼쪽 아래, 일정 시간 동안만 표시)
     now = time.time()
@@ -296,10 +378,17 @@ def draw_overlay(frame, recording, record_start_time,
         flag_color = (0, 255, 255)  # 노란색 느낌 (BGR)
         flag_text = f"{last_flag_text} (RECORDED)"
         y_pos = h - 20  # 화면 아래쪽에서 조금 위로 올려서 표시
-        cv2.putText(overlay, flag_text, (10, y_pos),
-                    font, scale, flag_color, thickness + 1, cv2.LINE_AA)
+        _text_cache.draw(buf, flag_text, (10, y_pos), scale, flag_color, thickness + 1)
 
-    return overlay
+    return buf
+
+
+def render_preview(buf, status):
+    """PreviewThread 용: status dict(render_overlay 인자)로 buf 에 오버레이를 그린다"""
+    if status:
+        render_overlay(buf, **status)
+    if SHOW_STAGE_TIMINGS:
+        draw_stage_timings(buf, origin=(10, 100))
 
 
 # =========================
@@ -312,31 +401,84 @@ def start_recording():
 
     - 세션 폴더(프레임 저장용)를 생성
     - 이벤트 CSV 경로를 정함
+    - 프레임 타임스탬프 사이드카(_frames.bin) 생성
     - 시작 시간 기록
 
     반환:
-        frames_dir, event_path, record_start_time, frame_idx, events
+        frames_dir, event_path, record_start_time, frame_idx, events, sidecar
     """
     frames_dir, event_path = make_session_paths()
     os.makedirs(frames_dir, exist_ok=True)
+    if STORAGE_MODE == "segments":
+        _segment_writers[frames_dir] = SegmentedFrameWriter(
+            frames_dir, FPS, segment_seconds=SEGMENT_SECONDS, quality=JPEG_QUALITY)
+    else:
+        _encode_governor.reset()
+        fmt = "raw" if STORAGE_MODE == "raw" else IMAGE_FORMAT
+        _frame_encoders[frames_dir] = FrameEncoder(
+            frames_dir, fmt, backend=ENCODER_BACKEND, governor=_encode_governor,
+            raw_prealloc=FPS * RAW_PREALLOC_SECONDS)
 
     record_start_time = time.time()
     frame_idx = 0
     events = []
+    sidecar = FrameSidecarWriter(sidecar_path_from_events(event_path),
+                                 t0_wall=record_start_time)
+
+    # 세션마다 계측을 새로 시작 (video_<code>_<번호>_metrics.json / .csv)
+    METRICS.reset()
+    dumper = MetricsDumper(event_path[:-len("_events.csv")], interval=METRICS_INTERVAL)
+    dumper.start()
+    _metrics_dumpers[frames_dir] = dumper
 
     print(f"[INFO] Recording started. Frames will be saved in: {frames_dir}")
     print(f"[INFO] Event log path: {event_path}")
-    return frames_dir, event_path, record_start_time, frame_idx, events
+    return frames_dir, event_path, record_start_time, frame_idx, events, sidecar
 
 
-def stop_recording(event_path, events):
+def stop_recording(event_path, events, sidecar=None, frames_dir=None):
     """
     녹화를 종료하고, 이벤트 CSV를 저장한다.
+    (사이드카가 있으면 닫고, 세그먼트 파일 / 프레임 인코더도 닫음)
     """
     save_events_csv(event_path, events)
+    if sidecar is not None:
+        sidecar.close()
+    segment_writer = _segment_writers.pop(frames_dir, None)
+    if segment_writer is not None:
+        segment_writer.close()
+    encoder = _frame_encoders.pop(frames_dir, None)
+    if encoder is not None:
+        encoder.close()
+    dumper = _metrics_dumpers.pop(frames_dir, None)
+    if dumper is not None:
+        dumper.stop()
+        print(f"[INFO] Stage metrics saved to: {dumper.json_path}")
+    record_session(event_path, events, sidecar.path if sidecar is not None else None,
+                   storage=STORAGE_MODE)
     print(f"[INFO] Recording stopped. Events saved to: {event_path}")
 
 
+def stop_threaded_recording(recorder, event_path, events, elapsed_end,
+                            sidecar=None, frames_dir=None):
+    """
+    threaded 모드 녹화 종료.
+
+    - 버퍼에 남은 프레임이 모두 저장될 때까지 기다린 뒤
+    - drop/버퍼 통계와 END 이벤트를 기록하고 CSV 저장
+    """
+    stats = recorder.stop_session()
+
+    # 마지막으로 저장된 프레임 인덱스
+    last_frame_idx = max(0, stats["frames"] - 1)
+    log_pipeline_stats(events, last_frame_idx, elapsed_end, stats)
+    events.append((last_frame_idx, elapsed_end, 9, "END"))
+
+    stop_recording(event_path, events, sidecar, frames_dir)
+    print(f"[INFO] Frames saved: {stats['frames']}, dropped: {stats['dropped']}, "
+          f"queue high-water: {stats['queue_high_water']}/{stats['queue_capacity']}")
+
+
 # =========================
 # 4. 메인 루프
 # =========================
@@ -352,12 +494,32 @@ def main():
     - A/S/D 플래그 입력 시 화면에 잠시 표시
     - 녹화 중일 때는 각 프레임을 이미지 파일로 저장
     - 녹화 시작/끝 시점도 START/END 플래그로 CSV에 기록
+    - CAPTURE_MODE == "threaded" 이면 읽기/저장을 별도 스레드에서 처리
+    - PREVIEW_HZ 가 설정되면 화면 표시(오버레이/imshow/키 입력)는 미리보기 스레드에서 처리
     """
     cap = init_camera()
 
+    preview = None
+    if PREVIEW_HZ:
+        preview = PreviewThread(render_preview, rate_hz=PREVIEW_HZ, window_name="Capture")
+        preview.start()
+
+    recorder = None
+    seq = 0
+    if CAPTURE_MODE == "threaded":
+        # segments 모드는 세그먼트 파일에 순서대로 써야 하므로 워커 1개
+        num_workers = 1 if STORAGE_MODE == "segments" else ENCODER_WORKERS
+        recorder = ThreadedRecorder(cap, save_frame,
+                                    buffer_size=RING_BUFFER_SIZE,
+                                    num_workers=num_workers)
+        recorder.start()
+        if ENCODE_GOVERNOR:
+            _encode_governor.depth_fn = lambda: len(recorder.buffer) / recorder.buffer.capacity
+
     recording = False
     frames_dir = None
     event_path = None
+    sidecar = None
     record_start_time = None
     frame_idx = 0
     events = []
@@ -369,17 +531,44 @@ def main():
     print("[INFO] Press SPACE to start/stop recording. A/S/D for flags. Q or ESC to quit.")
 
     while True:
-        ret, frame = cap.read()
+        if recorder is not None:
+            seq, frame = recorder.read(seq)
+            ret = frame is not None
+        else:
+            # grab 직후 시각을 사이드카 타임스탬프로 사용
+            with METRICS.timer("capture"):
+                ret = cap.grab()
+                grabbed_at = time.monotonic()
+                pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if ret:
+                    ret, frame = cap.retrieve()
         if not ret:
             print("[WARN] Failed to read frame from camera. Exiting.")
+            if recording and recorder is not None:
+                # 이미 버퍼에 들어간 프레임은 마저 저장하고 CSV까지 남긴다
+                stop_threaded_recording(recorder, event_path, events,
+                                        time.time() - record_start_time, sidecar, frames_dir)
+                recording = False
             break
 
-        # 상태 오버레이를 입힌 프레임 (플래그 표시 정보도 같이 전달)
-        display_frame = draw_overlay(frame, recording, record_start_time,
-                                     last_flag_text, last_flag_time)
-        cv2.imshow("Capture", display_frame)
-
-        key = cv2.waitKey(1) & 0xFF
+        if preview is not None:
+            # 프레임 참조와 상태만 넘기고 바로 다음 단계로 (복사/그리기는 미리보기 스레드)
+            preview.submit(frame, {"recording": recording,
+                                   "record_start_time": record_start_time,
+                                   "last_flag_text": last_flag_text,
+                                   "last_flag_time": last_flag_time})
+            key = preview.poll_key()
+        else:
+            # 상태 오버레이를 입힌 프레임 (플래그 표시 정보도 같이 전달)
+            with METRICS.timer("overlay"):
+                display_frame = draw_overlay(frame, recording, record_start_time,
+                                             last_flag_text, last_flag_time)
+            if SHOW_STAGE_TIMINGS:
+                # display_frame 은 이미 복사본이라 그 위에 바로 그림
+                draw_stage_timings(display_frame, origin=(10, 100))
+            cv2.imshow("Capture", display_frame)
+
+            key = cv2.waitKey(1) & 0xFF
 
         # 프로그램 종료 키 (q 또는 ESC)
         if key in (ord('q'), 27):
@@ -390,11 +579,15 @@ def main():
                 else:
                     elapsed_end = 0.0
 
-                # 마지막으로 저장된 프레임 인덱스
-                last_frame_idx = max(0, frame_idx - 1)
-                events.append((last_frame_idx, elapsed_end, 9, "END"))
+                if recorder is not None:
+                    stop_threaded_recording(recorder, event_path, events, elapsed_end,
+                                            sidecar, frames_dir)
+                else:
+                    # 마지막으로 저장된 프레임 인덱스
+                    last_frame_idx = max(0, frame_idx - 1)
+                    events.append((last_frame_idx, elapsed_end, 9, "END"))
 
-                stop_recording(event_path, events)
+                    stop_recording(event_path, events, sidecar, frames_dir)
                 recording = False
             print("[INFO] Quit requested. Exiting.")
             break
@@ -407,13 +600,17 @@ def main():
                  event_path,
                  record_start_time,
                  frame_idx,
-                 events) = start_recording()
+                 events,
+                 sidecar) = start_recording()
                 recording = True
 
                 # 녹화 시작 이벤트 기록 (START)
                 # frame_idx는 0부터 시작, 시작 시점 time=0.0 으로 기록
                 events.append((frame_idx, 0.0, 0, "START"))
 
+                if recorder is not None:
+                    recorder.start_session(frames_dir, sidecar)
+
                 # 녹화 시작 시 플래그 표시 초기화
                 last_flag_text = ""
                 last_flag_time = 0.0
@@ -424,14 +621,19 @@ def main():
                 else:
                     elapsed_end = 0.0
 
-                # 마지막으로 저장된 프레임 인덱스
-                last_frame_idx = max(0, frame_idx - 1)
-                events.append((last_frame_idx, elapsed_end, 9, "END"))
+                if recorder is not None:
+                    stop_threaded_recording(recorder, event_path, events, elapsed_end,
+                                            sidecar, frames_dir)
+                else:
+                    # 마지막으로 저장된 프레임 인덱스
+                    last_frame_idx = max(0, frame_idx - 1)
+                    events.append((last_frame_idx, elapsed_end, 9, "END"))
 
-                stop_recording(event_path, events)
+                    stop_recording(event_path, events, sidecar, frames_dir)
                 recording = False
                 frames_dir = None
                 event_path = None
+                sidecar = None
                 record_start_time = None
                 frame_idx = 0
                 events = []
@@ -441,8 +643,16 @@ def main():
 
         # 녹화 중일 때만 실제 프레임/이벤트 기록 수행
         if recording:
-            # 원본 프레임을 이미지 파일로 저장
-            save_frame(frames_dir, frame_idx, frame)
+            if recorder is not None:
+                # 저장은 인코더 워커가 처리, 여기서는 가장 최근에 저장 대기열에
+                # 들어간 프레임 번호만 가져와 이벤트 기록에 사용
+                frame_idx = recorder.frame_idx
+            else:
+                # 원본 프레임을 이미지 파일로 저장 (저장 시간은 사이드카에 기록)
+                t_encode = time.perf_counter()
+                save_frame(frames_dir, frame_idx, frame)
+                encode_ms = (time.perf_counter() - t_encode) * 1000.0
+                sidecar.write(frame_idx, grabbed_at - sidecar.t0, pos_msec, encode_ms)
 
             elapsed = time.time() - record_start_time
 
@@ -450,13 +660,18 @@ def main():
             if (AUTO_RECORD_SECONDS is not None) and (elapsed >= AUTO_RECORD_SECONDS):
                 print("[INFO] Auto stop time reached.")
 
-                # 방금 저장한 프레임 인덱스(frame_idx)를 기준으로 END 이벤트 기록
-                events.append((frame_idx, elapsed, 9, "END"))
+                if recorder is not None:
+                    stop_threaded_recording(recorder, event_path, events, elapsed,
+                                            sidecar, frames_dir)
+                else:
+                    # 방금 저장한 프레임 인덱스(frame_idx)를 기준으로 END 이벤트 기록
+                    events.append((frame_idx, elapsed, 9, "END"))
 
-                stop_recording(event_path, events)
+                    stop_recording(event_path, events, sidecar, frames_dir)
                 recording = False
                 frames_dir = None
                 event_path = None
+                sidecar = None
                 record_start_time = None
                 frame_idx = 0
                 events = []
@@ -475,6 +690,10 @@ def main():
                 frame_idx += 1
 
     # 리소스 정리
+    if preview is not None:
+        preview.stop()
+    if recorder is not None:
+        recorder.close()
     cap.release()
     cv2.destroyAllWindows()
 
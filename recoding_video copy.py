@@ -2,8 +2,9 @@ import cv2
 import os
 import time
 import csv
-import glob
-import re
+
+from frame_sidecar import FrameSidecarWriter, sidecar_path_from_events
+from session_catalog import SessionCatalog, record_session
 
 """
 카메라 영상 수집 + 이벤트 플래그(키보드 A/S/D) 기록 스크립트 (프레임 저장 버전)
@@ -18,6 +19,8 @@ import re
 출력 구조:
     - video/<SCENARIO_DIR>/<세션폴더>/frame_000000.jpg, frame_000001.jpg, ...
     - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_events.csv
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_frames.bin
+      (프레임별 capture 타임스탬프 / 인코딩 시간, frame_sidecar.py 참고)
 
 예시:
     - SCENARIO_DIR="normal", SCENARIO_CODE="normal" 이고 첫 세션이면
@@ -109,29 +112,19 @@ def get_output_dir():
 
 def get_next_index(out_dir, scenario_code):
     """
-    현재 시나리오 폴더(out_dir)에 있는
-    video_<scenario_code>_<번호>* 파일/폴더들을 검사하여
-    다음에 사용할 번호를 계산한다.
+    현재 시나리오 폴더(out_dir)에서 video_<scenario_code>_<번호> 에 쓸
+    다음 번호를 발급한다. (session_catalog.py 참고)
+
+    폴더를 매번 훑지 않고 out_dir/_catalog_index.json 의 카운터를 파일 잠금 안에서
+    읽고 올리므로, 여러 녹화 프로세스가 같은 폴더를 써도 번호가 겹치지 않는다.
+    카탈로그가 없는 기존 폴더는 처음 한 번만 video_<scenario_code>_<번호>* 를 훑어서
+    이어지는 번호부터 시작한다.
 
     예:
-        video_normal_001.mp4, video_normal_001_events.csv, video_normal_002/
-        이런 것들이 있으면 → 다음 인덱스는 3 반환
-        아무 것도 없으면 → 1 반환
+        video_normal_001_events.csv, video_normal_002/ 가 있는 폴더의 첫 호출 → 3
+        아무 것도 없으면 → 1
     """
-    pattern = os.path.join(out_dir, f"video_{scenario_code}_*")
-    paths = glob.glob(pattern)
-
-    indices = []
-    for path in paths:
-        name = os.path.basename(path)
-        # video_<scenario_code>_<번호>... 에서 번호만 추출 (확장자/뒤에 붙는 것 무시)
-        m = re.match(rf"video_{re.escape(scenario_code)}_(\d+)", name)
-        if m:
-            indices.append(int(m.group(1)))
-
-    if not indices:
-        return 1
-    return max(indices) + 1
+    return SessionCatalog(out_dir).next_index(f"video_{scenario_code}")
 
 
 def make_session_paths():
@@ -302,10 +295,11 @@ def start_recording():
 
     - 세션 폴더(프레임 저장용)를 생성
     - 이벤트 CSV 경로를 정함
+    - 프레임 타임스탬프 사이드카(_frames.bin) 생성
     - 시작 시간 기록
 
     반환:
-        frames_dir, event_path, record_start_time, frame_idx, events
+        frames_dir, event_path, record_start_time, frame_idx, events, sidecar
     """
     frames_dir, event_path = make_session_paths()
     os.makedirs(frames_dir, exist_ok=True)
@@ -313,17 +307,22 @@ def start_recording():
     record_start_time = time.time()
     frame_idx = 0
     events = []
+    sidecar = FrameSidecarWriter(sidecar_path_from_events(event_path),
+                                 t0_wall=record_start_time)
 
     print(f"[INFO] Recording started. Frames will be saved in: {frames_dir}")
     print(f"[INFO] Event log path: {event_path}")
-    return frames_dir, event_path, record_start_time, frame_idx, events
+    return frames_dir, event_path, record_start_time, frame_idx, events, sidecar
 
 
-def stop_recording(event_path, events):
+def stop_recording(event_path, events, sidecar=None):
     """
-    녹화를 종료하고, 이벤트 CSV를 저장한다.
+    녹화를 종료하고, 이벤트 CSV를 저장한다. (사이드카가 있으면 닫음)
     """
     save_events_csv(event_path, events)
+    if sidecar is not None:
+        sidecar.close()
+    record_session(event_path, events, sidecar.path if sidecar is not None else None)
     print(f"[INFO] Recording stopped. Events saved to: {event_path}")
 
 
@@ -347,6 +346,7 @@ def main():
     recording = False
     frames_dir = None
     event_path = None
+    sidecar = None
     record_start_time = None
     frame_idx = 0
     events = []
@@ -358,7 +358,12 @@ def main():
     print("[INFO] Press SPACE to start/stop recording. A/S/D for flags. Q or ESC to quit.")
 
     while True:
-        ret, frame = cap.read()
+        # grab 직후 시각을 사이드카 타임스탬프로 사용
+        ret = cap.grab()
+        grabbed_at = time.monotonic()
+        pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if ret:
+            ret, frame = cap.retrieve()
         if not ret:
             print("[WARN] Failed to read frame from camera. Exiting.")
             break
@@ -374,7 +379,7 @@ def main():
         if key in (ord('q'), 27):
             if recording:
                 # 녹화 중이면 먼저 녹화를 종료
-                stop_recording(event_path, events)
+                stop_recording(event_path, events, sidecar)
                 recording = False
             print("[INFO] Quit requested. Exiting.")
             break
@@ -387,17 +392,19 @@ def main():
                  event_path,
                  record_start_time,
                  frame_idx,
-                 events) = start_recording()
+                 events,
+                 sidecar) = start_recording()
                 recording = True
                 # 녹화 시작 시 플래그 표시 초기화
                 last_flag_text = ""
                 last_flag_time = 0.0
             else:
                 # 녹화 종료
-                stop_recording(event_path, events)
+                stop_recording(event_path, events, sidecar)
                 recording = False
                 frames_dir = None
                 event_path = None
+                sidecar = None
                 record_start_time = None
                 frame_idx = 0
                 events = []
@@ -407,18 +414,22 @@ def main():
 
         # 녹화 중일 때만 실제 프레임/이벤트 기록 수행
         if recording:
-            # 원본 프레임을 이미지 파일로 저장
+            # 원본 프레임을 이미지 파일로 저장 (저장 시간은 사이드카에 기록)
+            t_encode = time.perf_counter()
             save_frame(frames_dir, frame_idx, frame)
+            encode_ms = (time.perf_counter() - t_encode) * 1000.0
+            sidecar.write(frame_idx, grabbed_at - sidecar.t0, pos_msec, encode_ms)
 
             elapsed = time.time() - record_start_time
 
             # 자동 녹화 시간이 설정된 경우, 시간이 다 되면 자동 종료
             if (AUTO_RECORD_SECONDS is not None) and (elapsed >= AUTO_RECORD_SECONDS):
                 print("[INFO] Auto stop time reached.")
-                stop_recording(event_path, events)
+                stop_recording(event_path, events, sidecar)
                 recording = False
                 frames_dir = None
                 event_path = None
+                sidecar = None
                 record_start_time = None
                 frame_idx = 0
                 events = []
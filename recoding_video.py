@@ -2,8 +2,9 @@ import cv2
 import os
 import time
 import csv
-import glob
-import re
+
+from frame_sidecar import FrameSidecarWriter, sidecar_path_from_events
+from session_catalog import SessionCatalog, record_session
 
 """
 카메라 영상 수집 + 이벤트 플래그(키보드 A/S/D) 기록 스크립트
@@ -18,6 +19,8 @@ import re
 출력:
     - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>.mp4
     - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_events.csv
+    - video/<SCENARIO_DIR>/video_<SCENARIO_CODE>_<번호>_frames.bin
+      (프레임별 capture 타임스탬프 / 인코딩 시간, frame_sidecar.py 참고)
 """
 
 # =========================
@@ -97,28 +100,14 @@ def get_output_dir():
 
 def get_next_index(out_dir, scenario_code):
     """
-    현재 시나리오 폴더(out_dir)에 있는
-    video_<scenario_code>_<번호>.mp4 파일을 검사하여
-    다음에 사용할 번호를 계산한다.
+    현재 시나리오 폴더(out_dir)에서 video_<scenario_code>_<번호>.mp4 에 쓸
+    다음 번호를 발급한다. (session_catalog.py 참고, 폴더를 매번 훑지 않음)
 
     예:
-        video_normal_001.mp4, video_normal_002.mp4 가 있으면 → 3 반환
-        아무 것도 없으면 → 1 반환
+        video_normal_001.mp4, video_normal_002.mp4 가 있는 폴더의 첫 호출 → 3
+        아무 것도 없으면 → 1
     """
-    pattern = os.path.join(out_dir, f"video_{scenario_code}_*.mp4")
-    files = glob.glob(pattern)
-
-    indices = []
-    for path in files:
-        name = os.path.basename(path)
-        # video_<scenario_code>_<번호>.mp4 에서 번호만 추출
-        m = re.match(rf"video_{re.escape(scenario_code)}_(\d+)\.mp4$", name)
-        if m:
-            indices.append(int(m.group(1)))
-
-    if not indices:
-        return 1
-    return max(indices) + 1
+    return SessionCatalog(out_dir).next_index(f"video_{scenario_code}")
 
 
 def make_output_paths():
@@ -260,10 +249,11 @@ def draw_overlay(frame, recording, record_start_time,
 
 def start_recording():
     """
-    녹화를 시작하기 위해 VideoWriter와 이벤트 파일 경로, 시작시간 등을 세팅한다.
+    녹화를 시작하기 위해 VideoWriter와 이벤트 파일 경로, 시작시간,
+    프레임 타임스탬프 사이드카(_frames.bin) 등을 세팅한다.
 
     반환:
-        writer, event_path, record_start_time, frame_idx, events
+        writer, event_path, record_start_time, frame_idx, events, sidecar
     """
     video_path, event_path = make_output_paths()
     writer = create_writer(video_path)
@@ -271,18 +261,23 @@ def start_recording():
     record_start_time = time.time()
     frame_idx = 0
     events = []
+    sidecar = FrameSidecarWriter(sidecar_path_from_events(event_path),
+                                 t0_wall=record_start_time)
 
     print(f"[INFO] Recording started: {video_path}")
-    return writer, event_path, record_start_time, frame_idx, events
+    return writer, event_path, record_start_time, frame_idx, events, sidecar
 
 
-def stop_recording(writer, event_path, events):
+def stop_recording(writer, event_path, events, sidecar=None):
     """
-    녹화를 종료하고, VideoWriter를 닫고, 이벤트 CSV를 저장한다.
+    녹화를 종료하고, VideoWriter를 닫고, 이벤트 CSV를 저장한다. (사이드카가 있으면 닫음)
     """
     if writer is not None:
         writer.release()
     save_events_csv(event_path, events)
+    if sidecar is not None:
+        sidecar.close()
+    record_session(event_path, events, sidecar.path if sidecar is not None else None)
     print(f"[INFO] Recording stopped. Events saved to: {event_path}")
 
 
@@ -305,6 +300,7 @@ def main():
     recording = False
     writer = None
     event_path = None
+    sidecar = None
     record_start_time = None
     frame_idx = 0
     events = []
@@ -316,7 +312,12 @@ def main():
     print("[INFO] Press SPACE to start/stop recording. A/S/D for flags. Q or ESC to quit.")
 
     while True:
-        ret, frame = cap.read()
+        # grab 직후 시각을 사이드카 타임스탬프로 사용
+        ret = cap.grab()
+        grabbed_at = time.monotonic()
+        pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if ret:
+            ret, frame = cap.retrieve()
         if not ret:
             print("[WARN] Failed to read frame from camera. Exiting.")
             break
@@ -332,7 +333,7 @@ def main():
         if key in (ord('q'), 27):
             if recording:
                 # 녹화 중이면 먼저 녹화를 종료
-                stop_recording(writer, event_path, events)
+                stop_recording(writer, event_path, events, sidecar)
                 recording = False
                 writer = None
             print("[INFO] Quit requested. Exiting.")
@@ -342,16 +343,18 @@ def main():
         if key == 32:  # Space bar
             if not recording:
                 # 녹화 시작
-                writer, event_path, record_start_time, frame_idx, events = start_recording()
+                (writer, event_path, record_start_time,
+                 frame_idx, events, sidecar) = start_recording()
                 recording = True
                 # 녹화 시작 시 플래그 표시 초기화 (NEW)
                 last_flag_text = ""
                 last_flag_time = 0.0
             else:
                 # 녹화 종료
-                stop_recording(writer, event_path, events)
+                stop_recording(writer, event_path, events, sidecar)
                 recording = False
                 writer = None
+                sidecar = None
                 record_start_time = None
                 frame_idx = 0
                 events = []
@@ -361,17 +364,21 @@ def main():
 
         # 녹화 중일 때만 실제 프레임/이벤트 기록 수행
         if recording:
-            # 영상 프레임 저장
+            # 영상 프레임 저장 (인코딩 시간은 사이드카에 기록)
+            t_encode = time.perf_counter()
             writer.write(frame)
+            encode_ms = (time.perf_counter() - t_encode) * 1000.0
+            sidecar.write(frame_idx, grabbed_at - sidecar.t0, pos_msec, encode_ms)
 
             elapsed = time.time() - record_start_time
 
             # 자동 녹화 시간이 설정된 경우, 시간이 다 되면 자동 종료
             if (AUTO_RECORD_SECONDS is not None) and (elapsed >= AUTO_RECORD_SECONDS):
                 print("[INFO] Auto stop time reached.")
-                stop_recording(writer, event_path, events)
+                stop_recording(writer, event_path, events, sidecar)
                 recording = False
                 writer = None
+                sidecar = None
                 record_start_time = None
                 frame_idx = 0
                 events = []
@@ -3,11 +3,13 @@ import time
 import numpy as np
 import json
 
+from frame_sidecar import FrameSidecarWriter, frame_times
+
 
 def main():
     # === 설정 ===
     cam_index = 0          # 카메라 번호 (노트북 기본 웹캠이면 보통 0)
-    fps = 60               # 라벨 계산용으로만 쓸 예정
+    fps = 60               # VideoWriter 에 기록할 nominal fps (라벨은 사이드카 시각 기준)
     duration = 30.0        # 녹화 시간(초)
     width, height = 1280, 720  # 720p
 
@@ -56,10 +58,19 @@ def main():
     start_time = time.time()
     frame_idx = 0
 
+    # === 프레임 타임스탬프 사이드카 (라벨을 실제 프레임 시각 기준으로 계산) ===
+    sidecar_path = 'sample_720p_15fps_frames.bin'
+    sidecar = FrameSidecarWriter(sidecar_path, t0_wall=start_time)
+
     print("[INFO] 녹화를 시작합니다. A: 라벨 ON/OFF, Q 또는 ESC: 종료")
 
     while True:
-        ret, frame = cap.read()
+        # grab 직후 시각을 사이드카 타임스탬프로 사용
+        ret = cap.grab()
+        capture_ts = sidecar.now()
+        pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if ret:
+            ret, frame = cap.retrieve()
         if not ret:
             print("카메라에서 프레임을 읽지 못했습니다. 종료합니다.")
             break
@@ -70,8 +81,11 @@ def main():
         if elapsed >= duration:
             break
 
-        # 비디오 파일로 저장
+        # 비디오 파일로 저장 (인코딩 시간은 사이드카에 기록)
+        t_encode = time.perf_counter()
         out.write(frame)
+        encode_ms = (time.perf_counter() - t_encode) * 1000.0
+        sidecar.write(frame_idx, capture_ts, pos_msec, encode_ms)
 
         # 화면에 현재 상태 표시
         status_text = f"t={elapsed:5.2f}s  Label={'ON' if labeling else 'OFF'}"
@@ -108,6 +122,7 @@ def main():
 
     cap.release()
     out.release()
+    sidecar.close()
     cv2.destroyAllWindows()
 
     print("[INFO] 녹화 종료.")
@@ -118,19 +133,19 @@ def main():
     n_frames = frame_idx
     labels = np.zeros(n_frames, dtype=np.int32)
 
+    # 고정 fps 로 (초 → 프레임)을 환산하지 않고, 사이드카에 기록된
+    # 프레임별 실제 시각이 구간 안에 들어오는 프레임에 라벨을 붙인다
+    ts = np.asarray(frame_times(sidecar_path))[:n_frames]
     for (st, en) in intervals:
-        st_idx = int(st * fps)
-        en_idx = int(en * fps)
-        st_idx = max(0, min(st_idx, n_frames))
-        en_idx = max(0, min(en_idx, n_frames))
-        labels[st_idx:en_idx] = 1
+        labels[:len(ts)][(ts >= st) & (ts < en)] = 1
 
     np.save("labels.npy", labels)
     with open("intervals.json", "w", encoding="utf-8") as f:
         json.dump(intervals, f, ensure_ascii=False, indent=2)
 
     print(f"[INFO] 총 프레임 수: {n_frames}")
-    print("[INFO] intervals.json, labels.npy, sample_720p_15fps.mp4 저장 완료.")
+    print("[INFO] intervals.json, labels.npy, sample_720p_15fps.mp4, "
+          f"{sidecar_path} 저장 완료.")
 
 
 if __name__ == "__main__":
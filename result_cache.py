@@ -0,0 +1,278 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from metrics import METRICS
+
+"""
+추론 결과 공용 캐시 (내용 주소 방식, SQLite 파일 하나)
+
+같은 프레임이
+    - analyze_frame_folders_no_fps (YOLO 상태 CSV)
+    - demo_video.ipynb 의 YOLO 시각화
+    - visualize_frames_with_yolo (리뷰 뷰어)
+에서 매번 best_openclose.pt / best_fullempty.pt 를 다시 거치고,
+MediaPipe Hands 도 extract_hands_for_folder / batch_landmarks 에서 다시 돈다.
+
+키 = <모델 키>:<내용 해시>
+    모델 키  : model_key(종류, 가중치 파일들, imgsz=..., conf=...)
+               → 가중치 파일 "내용" 해시 + 추론 파라미터. 파일 이름이 같아도 다시 학습하면 다른 키
+    내용 해시: YOLO 는 프레임 하나(frame_digest, 디코딩된 픽셀),
+               MediaPipe Hands(tracking 모드)는 앞 프레임 결과에 따라 달라지므로
+               세션 전체(store_digest, 세션 파일 바이트)를 한 단위로 캐시
+
+값 = 이름 → ndarray dict (np.savez 바이트로 저장)
+
+용량이 max_bytes 를 넘으면 가장 오래 안 쓴 항목부터 지운다 (LRU).
+hit / miss 는 cache.stats() 와 METRICS 카운터(result_cache_hit / result_cache_miss)에 남는다.
+여러 프로세스(batch_landmarks 워커 등)가 같은 파일을 같이 써도 된다 (SQLite 잠금).
+
+사용 예:
+    cache = open_result_cache()                       # 기본 위치 (RESULT_CACHE_PATH)
+    key = model_key("yolo_dual", ["best_openclose.pt", "best_fullempty.pt"], imgsz=640, conf=0.25)
+    value = cache.get(f"{key}:{frame_digest(frame)}")
+    if value is None:
+        ...
+        cache.put(f"{key}:{frame_digest(frame)}", {"oc": oc_boxes, "fe": fe_boxes})
+"""
+
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "sessac", "results.sqlite"))
+DEFAULT_MAX_BYTES = 4 << 30        # 4 GiB
+EVICT_TARGET = 0.9                 # 넘치면 max_bytes 의 90% 까지 줄임
+EVICT_CHECK_EVERY = 256            # put 몇 번마다 전체 용량을 확인할지
+EVICT_CHECK_BYTES = 0.02           # 또는 max_bytes 의 이 비율만큼 새로 쓸 때마다
+
+_SQL_CHUNK = 500                   # IN (...) 한 번에 넣을 키 수
+
+_weights_hash_memo = {}
+
+
+# =========================
+# 1. 키 만들기
+# =========================
+
+def frame_digest(frame):
+    """디코딩된 프레임(ndarray) 내용 해시 (shape / dtype 포함)"""
+    frame = np.ascontiguousarray(frame)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{frame.shape}{frame.dtype}".encode())
+    h.update(frame.data)
+    return h.hexdigest()
+
+
+def _update_with_file(h, path, chunk_size=1 << 20):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+
+
+def store_digest(store_path):
+    """
+    세션 저장소(이미지 폴더 / 세그먼트 / raw 폴더 또는 영상 파일)의 파일 바이트 해시.
+    디코딩 없이 파일만 읽으므로 디스크 I/O 시간만 든다.
+    """
+    from frame_store import _natural_key
+
+    store_path = str(store_path)
+    h = hashlib.blake2b(digest_size=16)
+    if os.path.isfile(store_path):
+        _update_with_file(h, store_path)
+        return h.hexdigest()
+
+    with os.scandir(store_path) as it:
+        names = sorted((e.name for e in it if e.is_file()), key=_natural_key)
+    for name in names:
+        h.update(name.encode("utf-8") + b"\0")
+        _update_with_file(h, os.path.join(store_path, name))
+    return h.hexdigest()
+
+
+def weights_hash(paths, conf=None):
+    """
+    모델 가중치 파일 내용(+ conf) 의 sha1 앞 16자리.
+    파일마다 (경로, 크기, 수정 시각) 이 같으면 다시 읽지 않는다.
+    """
+    h = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = _weights_hash_memo.get(memo_key)
+        if digest is None:
+            fh = hashlib.sha1()
+            _update_with_file(fh, path)
+            digest = _weights_hash_memo[memo_key] = fh.hexdigest()
+        h.update(digest.encode())
+    if conf is not None:
+        h.update(f"conf={conf}".encode())
+    return h.hexdigest()[:16]
+
+
+def model_key(kind, weights_paths=(), **params):
+    """
+    모델 종류 + 가중치 내용 + 추론 파라미터(imgsz, conf, ...) → 키 앞부분 (16자리)
+    """
+    h = hashlib.sha1()
+    h.update(kind.encode())
+    if weights_paths:
+        h.update(weights_hash(weights_paths).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return f"{kind}-{h.hexdigest()[:16]}"
+
+
+# =========================
+# 2. 캐시
+# =========================
+
+def _pack(arrays):
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _unpack(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}
+
+
+class ResultCache:
+    """
+    key(str) → {name: ndarray} 를 SQLite 파일 하나에 저장하는 LRU 캐시.
+
+    path      : SQLite 파일 경로
+    max_bytes : 값(blob) 크기 합계 상한, 넘으면 last_access 가 오래된 것부터 삭제
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results ("
+                         "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "size INTEGER NOT NULL, last_access REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_access ON results(last_access)")
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+        self._puts_since_check = 0
+        self._bytes_since_check = 0
+
+    def get_many(self, keys):
+        """반환: {key: value} (없는 키는 빠짐). 찾은 항목은 last_access 갱신"""
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[start:start + _SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM results WHERE key IN ({marks})", chunk).fetchall()
+                for key, blob in rows:
+                    found[key] = blob
+            if found:
+                self._db.executemany("UPDATE results SET last_access=? WHERE key=?",
+                                     [(now, k) for k in found])
+                self._db.commit()
+
+            n_hit = len(found)
+            self.hits += n_hit
+            self.misses += len(keys) - n_hit
+        METRICS.incr("result_cache_hit", n_hit)
+        METRICS.incr("result_cache_miss", len(keys) - n_hit)
+        return {k: _unpack(v) for k, v in found.items()}
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """items: {key: {name: ndarray}} 또는 (key, value) iterable"""
+        items = items.items() if isinstance(items, dict) else items
+        now = time.time()
+        rows = []
+        for key, arrays in items:
+            blob = _pack(arrays)
+            rows.append((key, sqlite3.Binary(blob), len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+            self.puts += len(rows)
+            self._puts_since_check += len(rows)
+            self._bytes_since_check += sum(r[2] for r in rows)
+            if (self._puts_since_check >= EVICT_CHECK_EVERY
+                    or self._bytes_since_check >= self.max_bytes * EVICT_CHECK_BYTES):
+                self._evict_locked()
+
+    def put(self, key, arrays):
+        self.put_many([(key, arrays)])
+
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict_locked(self):
+        self._puts_since_check = 0
+        self._bytes_since_check = 0
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICT_TARGET)
+        rows = self._db.execute("SELECT key, size FROM results ORDER BY last_access").fetchall()
+        drop = []
+        for key, size in rows:
+            if total <= target:
+                break
+            drop.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE key=?", drop)
+        self._db.commit()
+        self.evictions += len(drop)
+
+    def evict(self):
+        """용량 확인 후 필요하면 오래된 항목 삭제"""
+        with self._lock:
+            self._evict_locked()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "puts": self.puts, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            if self._puts_since_check:
+                self._evict_locked()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_result_cache(path=None, max_bytes=None):
+    """기본 위치 / 용량으로 ResultCache 열기 (RESULT_CACHE_PATH 환경 변수로 위치 변경 가능)"""
+    return ResultCache(path or RESULT_CACHE_PATH,
+                       max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES)
@@ -0,0 +1,227 @@
+import glob
+import json
+import os
+import re
+import socket
+import time
+
+"""
+세션 번호 / 메타데이터 카탈로그 (BASE_DIR/SCENARIO_DIR 폴더마다 하나)
+
+get_next_index() 는 지금까지 세션을 시작할 때마다(cap.py 는 사진 한 장마다)
+glob("video_<code>_*") + 정규식으로 폴더 전체를 훑었다. 파일이 쌓일수록 느려지고,
+두 프로세스가 동시에 녹화를 시작하면 같은 번호를 받을 수 있었다.
+
+폴더 안 파일 3개:
+    _catalog_index.json : {"video_normal": 12, "photo_normal": 40, ...}  다음에 줄 번호
+    _catalog.jsonl      : 추가만 하는 기록 (한 줄 = 한 레코드)
+        {"op": "alloc",   "name": "video_normal_012", "prefix": ..., "index": 12,
+         "time": ..., "host": ..., "pid": ...}
+        {"op": "session", "name": "video_normal_012", "frames": 1800, "duration_sec": 60.1,
+         "fps": 29.95, "events": 14, ...}
+    _catalog.lock       : 파일 잠금용 (여러 캡처 프로세스 / 공유 폴더에서도 번호가 겹치지 않음)
+
+번호 발급은 잠금 → index.json 읽기 / 쓰기 → 잠금 해제 라서 폴더 크기와 상관없이 O(1).
+카탈로그가 없는 기존 폴더는 처음 한 번만 예전 방식(glob + 정규식)으로 훑어서 시작 번호를 정한다.
+발급한 번호는 녹화를 취소해도 다시 쓰지 않는다 (번호가 비어도 겹치지는 않음).
+
+사용 예:
+    catalog = SessionCatalog(out_dir)
+    index = catalog.next_index(f"video_{SCENARIO_CODE}")    # 3 → video_normal_003
+    ...
+    catalog.record(f"video_{SCENARIO_CODE}_{index:03d}", frames=1800, fps=29.9, events=12)
+    catalog.sessions()   # {name: 합친 메타데이터 dict}
+"""
+
+CATALOG_INDEX_NAME = "_catalog_index.json"
+CATALOG_LOG_NAME = "_catalog.jsonl"
+CATALOG_LOCK_NAME = "_catalog.lock"
+
+LOCK_TIMEOUT_SEC = 10.0
+LOCK_POLL_SEC = 0.05
+
+
+class FileLock:
+    """
+    프로세스 간 배타 잠금 (Windows: msvcrt.locking, 그 외: fcntl.lockf).
+    lockf 는 NFS 에서도 동작하고, msvcrt 는 SMB 공유 폴더에서도 동작한다.
+
+        with FileLock(path):
+            ...
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT_SEC):
+        self.path = path
+        self.timeout = timeout
+        self._f = None
+
+    def _try_lock(self):
+        if os.name == "nt":
+            import msvcrt
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.lockf(self._f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(self):
+        if os.name == "nt":
+            import msvcrt
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.lockf(self._f.fileno(), fcntl.LOCK_UN)
+
+    def acquire(self):
+        self._f = open(self.path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._try_lock()
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._f.close()
+                    self._f = None
+                    raise TimeoutError(f"Could not lock {self.path} within {self.timeout}s")
+                time.sleep(LOCK_POLL_SEC)
+
+    def release(self):
+        if self._f is None:
+            return
+        try:
+            self._unlock()
+        finally:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def scan_max_index(out_dir, prefix):
+    """
+    예전 get_next_index 와 같은 방식: <prefix>_<번호>* 중 가장 큰 번호 (없으면 0).
+    카탈로그를 처음 만들 때 한 번만 쓴다.
+    """
+    indices = []
+    for path in glob.glob(os.path.join(glob.escape(out_dir), f"{glob.escape(prefix)}_*")):
+        m = re.match(rf"{re.escape(prefix)}_(\d+)", os.path.basename(path))
+        if m:
+            indices.append(int(m.group(1)))
+    return max(indices) if indices else 0
+
+
+class SessionCatalog:
+    """out_dir 하나의 세션 번호 발급 + 메타데이터 기록"""
+
+    def __init__(self, out_dir):
+        self.out_dir = str(out_dir)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.index_path = os.path.join(self.out_dir, CATALOG_INDEX_NAME)
+        self.log_path = os.path.join(self.out_dir, CATALOG_LOG_NAME)
+        self.lock_path = os.path.join(self.out_dir, CATALOG_LOCK_NAME)
+
+    def _read_counters(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # 파일이 없거나 깨졌으면 폴더를 다시 훑어서 시작 번호를 정한다
+            return {}
+
+    def _write_counters(self, counters):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(counters, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _append(self, rec):
+        # 잠금 안에서 한 줄씩 쓰므로 여러 프로세스가 써도 줄이 섞이지 않는다
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    def next_index(self, prefix):
+        """
+        <prefix>_<번호> 에 쓸 다음 번호를 발급한다 (1부터).
+        발급 즉시 카탈로그에 기록되므로 다른 프로세스는 같은 번호를 받지 않는다.
+        """
+        with FileLock(self.lock_path):
+            counters = self._read_counters()
+            index = counters.get(prefix)
+            if index is None:
+                index = scan_max_index(self.out_dir, prefix) + 1
+            counters[prefix] = index + 1
+            self._write_counters(counters)
+            self._append({"op": "alloc", "name": f"{prefix}_{index:03d}", "prefix": prefix,
+                          "index": index, "time": time.time(),
+                          "host": socket.gethostname(), "pid": os.getpid()})
+        return index
+
+    def record(self, name, **meta):
+        """세션(또는 사진) name 의 메타데이터를 추가 기록. 같은 name 으로 여러 번 불러도 됨"""
+        rec = {"op": "session", "name": name, "time": time.time()}
+        rec.update(meta)
+        with FileLock(self.lock_path):
+            self._append(rec)
+
+    def sessions(self):
+        """{name: 메타데이터} (같은 name 의 레코드는 나중 것이 덮어씀, op/time 은 제외)"""
+        result = {}
+        if not os.path.exists(self.log_path):
+            return result
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue   # 다른 프로세스가 쓰다 죽은 줄
+                entry = result.setdefault(rec["name"], {})
+                if rec.get("op") == "alloc":
+                    entry.setdefault("created", rec.get("time"))
+                entry.update({k: v for k, v in rec.items() if k not in ("op", "time")})
+        return result
+
+
+def sidecar_stats(sidecar_path):
+    """
+    _frames.bin 사이드카에서 세션 메타데이터용 값 계산.
+    반환: {"frames", "duration_sec", "fps"} (사이드카가 없으면 빈 dict)
+    """
+    from frame_sidecar import estimate_fps_from_sidecar, frame_times
+
+    if not sidecar_path or not os.path.exists(sidecar_path):
+        return {}
+    ts = frame_times(sidecar_path)
+    duration = float(ts[-1] - ts[0]) if len(ts) >= 2 else 0.0
+    return {"frames": int(len(ts)), "duration_sec": round(duration, 3),
+            "fps": round(estimate_fps_from_sidecar(sidecar_path), 3)}
+
+
+def record_session(event_path, events, sidecar_path=None, **extra):
+    """
+    녹화 종료 시 호출: 이벤트 CSV 경로로 세션 이름 / 폴더를 정하고
+    프레임 수, 길이, 실측 FPS(사이드카), A/S/D 이벤트 수를 카탈로그에 기록한다.
+    카탈로그 기록에 실패해도 녹화 결과에는 영향이 없도록 경고만 출력.
+
+    events: [(frame_idx, time_sec, flag_id, flag_key), ...] (recoding_video 형식)
+    """
+    event_path = str(event_path)
+    name = os.path.basename(event_path)
+    if name.endswith("_events.csv"):
+        name = name[:-len("_events.csv")]
+    meta = {"events": sum(1 for e in events if e[2] in (1, 2, 3))}
+    meta.update(sidecar_stats(sidecar_path))
+    meta.update(extra)
+    try:
+        SessionCatalog(os.path.dirname(event_path) or ".").record(name, **meta)
+    except (OSError, TimeoutError) as e:
+        print(f"[WARN] Failed to update session catalog for {name}: {e}")
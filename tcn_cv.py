@@ -0,0 +1,475 @@
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from landmark_store import LandmarkStore, STORE_DIR_NAME, open_or_build_landmark_store
+from process_pool import run_isolated
+from tcn_model import TCNClassifier
+from window_dataset import WindowBatchSampler
+
+"""
+TCN group k-fold 교차검증 (fold 별 프로세스, 이어서 학습 가능)
+
+medels.ipynb 의 CV 루프는 fold 4개를 차례로 100 epoch 씩 학습하고,
+train_one_epoch / eval_one_epoch 에서 배치마다 loss.item() / correct.item() 으로
+값을 꺼내 합산한다 (배치마다 동기화). 중간에 멈추면 처음부터 다시 돌려야 한다.
+
+여기서는
+    - fold 하나 = 프로세스 하나 (ProcessPoolExecutor), 프로세스마다 torch.set_num_threads 로
+      스레드 수를 나눠서 코어를 겹쳐 쓰지 않게 함
+    - 데이터는 landmark_store 의 memmap 을 각 프로세스가 같은 파일로 열기만 함
+      (읽기 전용 페이지는 OS 페이지 캐시 하나를 공유, 윈도우도 복사 없는 view)
+    - loss / 정답 수는 device 텐서에 누적하고 epoch 끝에 한 번만 .item()
+    - val_loss 가 PATIENCE epoch 동안 좋아지지 않으면 조기 종료
+    - 실행 폴더(run_dir) 구조
+          config.json / folds.json          : 학습 설정, fold 별 train/val 세트
+          fold<k>/best.pt                   : val_loss 최소 모델 state_dict (load_tcn_classifier 로 읽음)
+          fold<k>/last.pt                   : 매 epoch 체크포인트 (모델, optimizer, RNG, 기록)
+          fold<k>/history.csv               : epoch 별 loss / acc
+          fold<k>/result.json               : 끝난 fold 의 결과 (있으면 다시 돌리지 않음)
+      같은 run_dir 로 다시 실행하면 끝난 fold 는 건너뛰고, 중단된 fold 는 last.pt 다음 epoch 부터 이어감
+
+실행:
+    python tcn_cv.py    (아래 DATA_ROOT / RUN_DIR 수정 후)
+    또는 노트북에서 results = run_cv("data", r"runs\\tcn_cv\\exp1")
+"""
+
+# =========================
+# 1. 설정
+# =========================
+
+DATA_ROOT = "data"
+RUN_DIR = os.path.join("runs", "tcn_cv")
+N_FOLDS = 4
+SPLIT_SEED = 42
+
+NUM_WORKERS = max(1, min(N_FOLDS, (os.cpu_count() or 2) - 1))   # 동시에 학습할 fold 수
+THREADS_PER_WORKER = None   # None 이면 코어 수 / NUM_WORKERS
+MAX_ATTEMPTS = 2            # fold 하나가 워커를 죽여도 다시 돌려 보는 최대 횟수 (last.pt 부터 이어감)
+
+TRAIN_CONFIG = {
+    "window": 15,
+    "step": 5,
+    "batch_size": 64,
+    "epochs": 100,
+    "lr": 1e-3,
+    "patience": 20,          # None 이면 조기 종료 없이 epochs 까지
+    "channels": [32, 32],
+    "kernel_size": 3,
+    "dropout": 0.5,
+    "seed": 42,
+    "device": "cpu",         # "cuda" 면 fold 를 한 프로세스에서 차례로 학습
+}
+LOG_EVERY = 10
+
+_store = None               # 워커 프로세스의 LandmarkStore (initializer 에서 열기)
+
+
+# =========================
+# 2. fold 분할 / 데이터
+# =========================
+
+def build_group_kfold_splits(meta_dict, n_folds=4, seed=42):
+    """
+    meta_dict: sample_name -> { 'set_id': ..., ... }
+    n_folds: K-fold 개수
+    return:
+      folds: list of dict
+        [
+          {
+            "train_keys": [... sample_name ...],
+            "val_keys":   [... sample_name ...],
+          },
+          ...
+        ]
+    """
+    # 1) 모든 세트 ID 수집
+    set_ids = sorted(set(m["set_id"] for m in meta_dict.values()))
+    print("[INFO] unique set_ids:", len(set_ids))
+
+    # 2) 셔플
+    rnd = random.Random(seed)
+    rnd.shuffle(set_ids)
+
+    # 3) 세트 단위로 folds 분할
+    folds_set_ids = [[] for _ in range(n_folds)]
+    for i, sid in enumerate(set_ids):
+        folds_set_ids[i % n_folds].append(sid)
+
+    # 4) 각 fold마다 train/val 샘플 리스트 생성
+    folds = []
+    for fold_idx in range(n_folds):
+        val_set_ids   = set(folds_set_ids[fold_idx])
+        train_set_ids = set(sid for sid in set_ids if sid not in val_set_ids)
+
+        train_keys = []
+        val_keys   = []
+        for sample_name, meta in meta_dict.items():
+            if meta["set_id"] in train_set_ids:
+                train_keys.append(sample_name)
+            elif meta["set_id"] in val_set_ids:
+                val_keys.append(sample_name)
+
+        folds.append({
+            "train_keys": train_keys,
+            "val_keys":   val_keys,
+            "train_set_ids": train_set_ids,
+            "val_set_ids":   val_set_ids,
+        })
+
+        print(f"[FOLD {fold_idx}] train sets: {len(train_set_ids)}, "
+              f"val sets: {len(val_set_ids)}, "
+              f"train samples: {len(train_keys)}, "
+              f"val samples: {len(val_keys)}")
+
+    return folds
+
+
+def build_fold_dataloaders(store, fold_info, window=15, step=5, batch_size=64, seed=None):
+    """저장소 memmap 위에서 fold 샘플의 윈도우만 잡음 (복사 없음)"""
+    train_dataset = store.window_dataset(fold_info["train_keys"], window=window, step=step)
+    val_dataset   = store.window_dataset(fold_info["val_keys"],   window=window, step=step)
+
+    # 배치 단위로 가져오므로 DataLoader 의 batch_size 는 None
+    train_sampler = WindowBatchSampler(train_dataset, batch_size=batch_size, shuffle=True, seed=seed)
+    val_sampler   = WindowBatchSampler(val_dataset,   batch_size=batch_size, shuffle=False)
+    train_loader = DataLoader(train_dataset, batch_size=None, sampler=train_sampler)
+    val_loader   = DataLoader(val_dataset,   batch_size=None, sampler=val_sampler)
+
+    return train_dataset, val_dataset, train_loader, val_loader
+
+
+# =========================
+# 3. epoch (device 누적)
+# =========================
+
+def train_one_epoch(model, loader, optimizer, criterion, device="cpu"):
+    """
+    반환: (평균 loss, 완전일치 정확도). 배치마다 .item() 하지 않고 epoch 끝에 한 번만 꺼냄
+    정확도: sigmoid(logits) > 0.5 (= logits > 0) 가 K 개 라벨 모두 맞은 비율
+    """
+    model.train()
+    total_loss = torch.zeros((), device=device)
+    total_correct = torch.zeros((), dtype=torch.long, device=device)
+    total_examples = 0
+
+    for batch in loader:
+        x = batch["x"].to(device, non_blocking=True)          # (B, T, D)
+        y = batch["y_last"].to(device, non_blocking=True)     # (B, K) 0/1
+
+        optimizer.zero_grad(set_to_none=True)
+        logits = model(x)                                     # (B, K)
+        loss = criterion(logits, y)
+
+        loss.backward()
+        optimizer.step()
+
+        total_loss += loss.detach() * x.size(0)
+        total_examples += x.size(0)
+        total_correct += ((logits.detach() > 0) == (y > 0.5)).all(dim=1).sum()
+
+    n = max(total_examples, 1)
+    return total_loss.item() / n, total_correct.item() / n
+
+
+def eval_one_epoch(model, loader, criterion, device="cpu"):
+    model.eval()
+    total_loss = torch.zeros((), device=device)
+    total_correct = torch.zeros((), dtype=torch.long, device=device)
+    total_examples = 0
+
+    with torch.inference_mode():
+        for batch in loader:
+            x = batch["x"].to(device, non_blocking=True)
+            y = batch["y_last"].to(device, non_blocking=True)
+
+            logits = model(x)
+            total_loss += criterion(logits, y) * x.size(0)
+            total_examples += x.size(0)
+            total_correct += ((logits > 0) == (y > 0.5)).all(dim=1).sum()
+
+    n = max(total_examples, 1)
+    return total_loss.item() / n, total_correct.item() / n
+
+
+# =========================
+# 4. fold 학습 (체크포인트 / 이어서 학습)
+# =========================
+
+def fold_dir(run_dir, fold_idx):
+    return os.path.join(run_dir, f"fold{fold_idx}")
+
+
+def _save_atomic(obj, path):
+    # 저장 도중 멈춰도 이전 체크포인트가 남도록 임시 파일에 쓴 뒤 교체
+    tmp = path + ".tmp"
+    torch.save(obj, tmp)
+    os.replace(tmp, path)
+
+
+def _write_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def load_fold_result(run_dir, fold_idx):
+    """끝난 fold 의 result.json (없으면 None)"""
+    path = os.path.join(fold_dir(run_dir, fold_idx), "result.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def train_fold(store, run_dir, fold_idx, fold_info, config=None):
+    """
+    fold 하나 학습. fold<k>/last.pt 가 있으면 다음 epoch 부터 이어서 학습.
+    반환: result dict (fold, best_val_loss, best_val_acc, best_epoch, epochs_run, stopped_early, seconds)
+    """
+    config = {**TRAIN_CONFIG, **(config or {})}
+    device = torch.device(config["device"])
+    out_dir = fold_dir(run_dir, fold_idx)
+    os.makedirs(out_dir, exist_ok=True)
+    last_path = os.path.join(out_dir, "last.pt")
+    best_path = os.path.join(out_dir, "best.pt")
+
+    seed = config["seed"] + fold_idx
+    torch.manual_seed(seed)
+    train_dataset, val_dataset, train_loader, val_loader = build_fold_dataloaders(
+        store, fold_info, config["window"], config["step"], config["batch_size"], seed=seed)
+    train_sampler = train_loader.sampler
+
+    sample_batch = train_dataset[0:1]
+    input_dim = sample_batch["x"].shape[-1]
+    num_classes = sample_batch["y_last"].shape[-1]
+
+    model = TCNClassifier(input_dim, num_classes,
+                          channels=tuple(config["channels"]),
+                          kernel_size=config["kernel_size"],
+                          dropout=config["dropout"]).to(device)
+    criterion = nn.BCEWithLogitsLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=config["lr"])
+
+    state = {"epoch": 0, "best_val_loss": float("inf"), "best_val_acc": 0.0,
+             "best_epoch": 0, "bad_epochs": 0, "history": [], "seconds": 0.0}
+    if os.path.exists(last_path):
+        ckpt = torch.load(last_path, map_location=device)
+        model.load_state_dict(ckpt["model"])
+        optimizer.load_state_dict(ckpt["optimizer"])
+        torch.set_rng_state(ckpt["torch_rng"])
+        train_sampler.rng.bit_generator.state = ckpt["sampler_rng"]
+        state = ckpt["state"]
+        print(f"[fold {fold_idx}] resume from epoch {state['epoch']} "
+              f"(best val_loss={state['best_val_loss']:.4f} @ {state['best_epoch']})")
+
+    patience = config["patience"]
+    for epoch in range(state["epoch"] + 1, config["epochs"] + 1):
+        if patience is not None and state["bad_epochs"] >= patience:
+            break
+
+        t_epoch = time.perf_counter()
+        train_loss, train_acc = train_one_epoch(model, train_loader, optimizer, criterion, device)
+        val_loss,   val_acc   = eval_one_epoch(model, val_loader, criterion, device)
+        seconds = time.perf_counter() - t_epoch
+
+        state["history"].append({"epoch": epoch, "train_loss": train_loss, "val_loss": val_loss,
+                                 "train_acc": train_acc, "val_acc": val_acc, "seconds": seconds})
+        state["epoch"] = epoch
+        state["seconds"] += seconds
+        if val_loss < state["best_val_loss"]:
+            state.update(best_val_loss=val_loss, best_val_acc=val_acc,
+                         best_epoch=epoch, bad_epochs=0)
+            _save_atomic(model.state_dict(), best_path)
+        else:
+            state["bad_epochs"] += 1
+
+        _save_atomic({"model": model.state_dict(), "optimizer": optimizer.state_dict(),
+                      "torch_rng": torch.get_rng_state(),
+                      "sampler_rng": train_sampler.rng.bit_generator.state,
+                      "state": state}, last_path)
+
+        if epoch % LOG_EVERY == 0 or epoch == 1:
+            print(f"[fold {fold_idx}] epoch {epoch:03d} | "
+                  f"train_loss={train_loss:.4f}, val_loss={val_loss:.4f}, "
+                  f"train_acc={train_acc:.3f}, val_acc={val_acc:.3f}")
+
+    stopped_early = (patience is not None and state["bad_epochs"] >= patience
+                     and state["epoch"] < config["epochs"])
+    if stopped_early:
+        print(f"[fold {fold_idx}] early stop at epoch {state['epoch']} "
+              f"(no val_loss improvement for {patience} epochs)")
+    print(f"[fold {fold_idx}] BEST val_loss={state['best_val_loss']:.4f}, "
+          f"val_acc={state['best_val_acc']:.3f} (epoch {state['best_epoch']})")
+
+    pd.DataFrame(state["history"]).to_csv(os.path.join(out_dir, "history.csv"), index=False)
+    result = {
+        "fold": fold_idx,
+        "best_val_loss": state["best_val_loss"],
+        "best_val_acc": state["best_val_acc"],
+        "best_epoch": state["best_epoch"],
+        "epochs_run": state["epoch"],
+        "stopped_early": stopped_early,
+        "seconds": state["seconds"],
+        "train_windows": len(train_dataset),
+        "val_windows": len(val_dataset),
+    }
+    _write_json(os.path.join(out_dir, "result.json"), result)
+    return result
+
+
+# =========================
+# 5. 워커
+# =========================
+
+def _init_worker(store_dir, num_threads):
+    """워커 프로세스마다 한 번: 스레드 수 제한, 저장소(memmap) 열기"""
+    global _store
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass   # 이미 병렬 작업이 시작된 프로세스에서는 바꿀 수 없음
+    _store = LandmarkStore(store_dir)
+
+
+def _fold_job(run_dir, fold_idx, fold_info, config):
+    return os.getpid(), train_fold(_store, run_dir, fold_idx, fold_info, config)
+
+
+# =========================
+# 6. 실행
+# =========================
+
+def _json_folds(folds):
+    return [{k: sorted(v) for k, v in fold.items()} for fold in folds]
+
+
+def prepare_run_dir(run_dir, config, folds, n_folds, split_seed):
+    """
+    config.json / folds.json 을 쓰거나, 이미 있으면 같은 설정인지 확인한다.
+    (설정이나 fold 구성이 바뀌었는데 이어서 학습하면 결과가 섞이므로 에러)
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    run_config = {"n_folds": n_folds, "split_seed": split_seed, "train": config}
+    run_config = json.loads(json.dumps(run_config))
+    folds_json = _json_folds(folds)
+
+    config_path = os.path.join(run_dir, "config.json")
+    folds_path = os.path.join(run_dir, "folds.json")
+    if os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            saved = json.load(f)
+        with open(folds_path, encoding="utf-8") as f:
+            saved_folds = json.load(f)
+        if saved != run_config or saved_folds != folds_json:
+            raise ValueError(f"{run_dir} was created with a different config or fold split; "
+                             f"use a new run_dir")
+        return
+    _write_json(folds_path, folds_json)
+    _write_json(config_path, run_config)
+
+
+def run_cv(data_root=DATA_ROOT, run_dir=RUN_DIR, config=None, n_folds=N_FOLDS,
+           split_seed=SPLIT_SEED, num_workers=NUM_WORKERS, threads_per_worker=THREADS_PER_WORKER,
+           max_attempts=MAX_ATTEMPTS, store_dir=None):
+    """
+    group k-fold CV 전체 실행 (끝난 fold 는 건너뛰고, 중단된 fold 는 이어서).
+    반환: fold 별 결과 DataFrame (fold 순서)
+    실패한 fold 가 있으면 (끝난 fold 는 result.json 으로 남긴 채) RuntimeError
+    """
+    config = {**TRAIN_CONFIG, **(config or {})}
+    store_dir = store_dir or os.path.join(data_root, STORE_DIR_NAME)
+    store = open_or_build_landmark_store(data_root, store_dir)
+    _, meta_dict = store.to_data_dicts()
+    folds = build_group_kfold_splits(meta_dict, n_folds=n_folds, seed=split_seed)
+    prepare_run_dir(run_dir, config, folds, n_folds, split_seed)
+
+    results = {}
+    pending = []
+    for fold_idx in range(n_folds):
+        done = load_fold_result(run_dir, fold_idx)
+        if done is not None:
+            results[fold_idx] = done
+        else:
+            pending.append(fold_idx)
+    print(f"[INFO] {len(pending)} fold(s) to train, {len(results)} already done. run_dir={run_dir}")
+
+    if config["device"] != "cpu":
+        num_workers = 1
+    num_workers = max(1, min(num_workers, len(pending) or 1))
+    num_threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+
+    t_start = time.perf_counter()
+    if num_workers == 1:
+        torch.set_num_threads(num_threads)
+        for fold_idx in pending:
+            results[fold_idx] = train_fold(store, run_dir, fold_idx, folds[fold_idx], config)
+    else:
+        done, failed = _run_pool(store_dir, run_dir, folds, pending, config,
+                                 num_workers, num_threads, max_attempts)
+        results.update(done)
+        if failed:
+            for fold_idx, msg in sorted(failed.items()):
+                print(f"[WARN] fold {fold_idx} failed: {msg}")
+            # 일부 fold 만으로 평균을 내면 CV 가 끝난 것처럼 보이므로 여기서 멈춤
+            raise RuntimeError(f"folds {sorted(failed)} failed; "
+                               f"rerun with the same run_dir to resume")
+    wall = time.perf_counter() - t_start
+
+    df = pd.DataFrame([results[k] for k in sorted(results)])
+    print_cv_summary(df, n_folds=len(folds))
+    if pending:
+        print(f"[INFO] {len(pending)} fold(s) in {wall:.1f}s "
+              f"(workers={num_workers}, threads/worker={num_threads})")
+    return df
+
+
+def _run_pool(store_dir, run_dir, folds, pending, config, num_workers, num_threads, max_attempts):
+    """
+    fold 를 프로세스 풀로 학습 (process_pool.run_isolated).
+    워커가 죽으면 안 끝난 fold 를 fold 마다 프로세스 하나로 last.pt 부터 이어서 학습하고,
+    워커를 죽인 fold 만 실패로 보고.
+    반환: (results {fold: result}, failed {fold: 에러 메시지})
+    """
+    def on_done(job, value):
+        pid, result = value
+        print(f"[INFO] fold {job[1]} done in worker {pid} ({result['seconds']:.1f}s)")
+
+    # fork 는 부모(노트북)에서 이미 만든 torch 스레드 풀 상태를 물려받아 멈출 수 있으므로 spawn
+    done, failed = run_isolated(_fold_job,
+                                [(run_dir, k, folds[k], config) for k in pending],
+                                num_workers, max_attempts,
+                                initializer=_init_worker, initargs=(store_dir, num_threads),
+                                mp_context=multiprocessing.get_context("spawn"),
+                                on_done=on_done, label=lambda job: f"fold {job[1]}")
+    results = {job[1]: result for job, (_, result) in done}
+    return results, {job[1]: msg for job, msg in failed}
+
+
+def print_cv_summary(df, n_folds=None):
+    """n_folds 를 주면 빠진 fold 가 있을 때 평균을 내지 않음"""
+    print("\n=== CV 결과 요약 ===")
+    for row in df.itertuples(index=False):
+        print(f"fold {row.fold}: val_loss={row.best_val_loss:.4f}, val_acc={row.best_val_acc:.3f} "
+              f"(epoch {row.best_epoch}/{row.epochs_run})")
+    if n_folds is not None and len(df) < n_folds:
+        print(f"[WARN] {n_folds - len(df)} fold(s) missing; 평균 val_acc 생략")
+    elif len(df):
+        print("평균 val_acc:", df["best_val_acc"].mean())
+
+
+def main():
+    run_cv()
+
+
+if __name__ == "__main__":
+    main()
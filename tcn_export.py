@@ -0,0 +1,387 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from numpy.lib.stride_tricks import sliding_window_view
+
+from tcn_model import TCNClassifier, fold_batchnorm, receptive_field
+from window_dataset import build_window_starts
+
+"""
+TCNClassifier 배포용 내보내기 + CPU 배치 추론 런타임
+
+eager TCNClassifier 는 블록마다
+    Conv1d(양쪽 padding) → Chomp1d(뒤쪽 잘라내고 .contiguous() 복사) → BatchNorm1d → ReLU → Dropout
+을 거치고, 마지막 타임스텝 하나만 쓰는데도 윈도우 전체 길이로 계산한다.
+
+FusedTCN (같은 값, 추론 전용)
+    - BatchNorm 은 conv 가중치/편향에 합침 (fold_batchnorm, tcn_stream 과 같은 방식), Dropout 제거
+    - causal conv = 왼쪽만 zero padding + dilation 간격 탭 k 개를 채널 축으로 이어 붙인 뒤 Linear 1번
+      → Chomp1d 복사 없음, (B, T, C) 순서 그대로라 transpose 도 없음
+    - 입력은 수용 영역(receptive_field)만큼만 사용, 마지막 conv 는 마지막 타임스텝 하나만 계산
+    - conv 가 전부 nn.Linear 라서 quantize_dynamic 으로 모든 층이 int8 이 됨
+      (Conv1d 는 dynamic quantization 대상이 아님)
+
+내보내기 (export_tcn)
+    tcn_fp32.ts   : TorchScript (trace + freeze + optimize_for_inference)
+    tcn_int8.ts   : dynamic int8 (Linear 가중치 int8) TorchScript
+    tcn_fp32.onnx : ONNX (batch / time 축 가변)
+    tcn_int8.onnx : onnxruntime 이 있으면 ONNX dynamic int8
+    report.csv / export.json : eager 대비 최대 오차, 0.5 기준 예측 일치율, 배치 지연, 속도 향상
+
+TCNRuntime
+    .ts / .onnx / nn.Module 을 같은 인터페이스로 불러와
+    predict_sessions({세션: (N, D)}) 로 여러 세션의 윈도우를 한 줄로 이어 batch_size 씩 추론한다.
+
+사용 예:
+    model = load_tcn_classifier(r"runs\\tcn_cv\\w15_s5_c32x2\\fold0\\best.pt")
+    paths, report = export_tcn(model, "export")
+    runtime = TCNRuntime(paths["int8"])
+    probs = runtime.predict_sessions({"video_normal_new_001": landmarks})   # {이름: (W, 3)}
+"""
+
+# =========================
+# 설정
+# =========================
+WINDOW = 15
+BATCH_SIZE = 512
+ONNX_OPSET = 17
+PARITY_ATOL = 1e-4          # fp32 변형의 eager 대비 허용 오차 (logits)
+BENCH_REPEAT = 50
+
+WEIGHTS_PATH = "tcn_fold0.pt"
+OUT_DIR = "export"
+
+
+# =========================
+# 1. 추론 전용 모델 (BN 합침, Chomp 없음)
+# =========================
+
+class _TapLinear(nn.Module):
+    """
+    causal dilated Conv1d (+ BatchNorm) 의 Linear 버전. 입력 / 출력 (B, T, C)
+    출력[t] = W · [입력[t-(k-1)d], ..., 입력[t-d], 입력[t]] + b  (t 앞은 0)
+    """
+
+    def __init__(self, conv, bn=None):
+        super().__init__()
+        w, b = fold_batchnorm(conv, bn)                  # (C_out, C_in, k)
+        c_out, c_in, k = w.shape
+        self.k = k
+        self.d = conv.dilation[0]
+        self.pad = (k - 1) * self.d
+        # 탭 순서(가장 오래된 것부터) x 입력 채널 로 펼침 → 아래 torch.cat 순서와 같음
+        self.linear = nn.Linear(c_in * k, c_out)
+        with torch.no_grad():
+            self.linear.weight.copy_(w.permute(0, 2, 1).reshape(c_out, k * c_in))
+            self.linear.bias.copy_(b)
+
+    def forward(self, x):
+        xp = F.pad(x, (0, 0, self.pad, 0))
+        # 슬라이스 끝을 음수 상수로 두어 trace / ONNX 에서도 길이 T 가 가변
+        taps = [xp[:, j * self.d:(j * self.d - self.pad) or None] for j in range(self.k)]
+        return self.linear(torch.cat(taps, dim=-1))
+
+    def forward_last(self, x):
+        """마지막 타임스텝만: (B, T, C_in) → (B, C_out)"""
+        xp = F.pad(x, (0, 0, self.pad, 0))
+        return self.linear(xp[:, -(self.pad + 1)::self.d].flatten(1))
+
+
+class _FusedBlock(nn.Module):
+    def __init__(self, block):
+        super().__init__()
+        self.conv1 = _TapLinear(block.conv1, block.bn1)
+        self.conv2 = _TapLinear(block.conv2, block.bn2)
+        self.downsample = None
+        if block.downsample is not None:
+            w = block.downsample.weight.detach()[:, :, 0]
+            self.downsample = nn.Linear(w.shape[1], w.shape[0])
+            with torch.no_grad():
+                self.downsample.weight.copy_(w)
+                self.downsample.bias.copy_(block.downsample.bias.detach())
+
+    def forward(self, x):
+        out = torch.relu(self.conv1(x))
+        out = torch.relu(self.conv2(out))
+        res = x if self.downsample is None else self.downsample(x)
+        return torch.relu(out + res)
+
+    def forward_last(self, x):
+        out = torch.relu(self.conv1(x))
+        out = torch.relu(self.conv2.forward_last(out))
+        res = x[:, -1]
+        if self.downsample is not None:
+            res = self.downsample(res)
+        return torch.relu(out + res)
+
+
+class FusedTCN(nn.Module):
+    """
+    TCNClassifier 와 같은 logits 를 내는 추론 전용 모델. 입력 (B, T, D) → (B, K)
+    (가중치는 복사하므로 원본 모델은 그대로)
+    """
+
+    def __init__(self, model: TCNClassifier):
+        super().__init__()
+        model = model.eval()
+        self.blocks = nn.ModuleList(_FusedBlock(block) for block in model.tcn)
+        self.fc = nn.Linear(model.fc.in_features, model.fc.out_features)
+        with torch.no_grad():
+            self.fc.weight.copy_(model.fc.weight.detach())
+            self.fc.bias.copy_(model.fc.bias.detach())
+        self.receptive_field = receptive_field(model)
+        self.input_dim = model.tcn[0].conv1.in_channels
+        self.eval()
+
+    def forward(self, x):
+        # 마지막 출력은 최근 receptive_field 프레임에만 의존 (그 앞은 잘라도 값이 같음)
+        x = x[:, -self.receptive_field:]
+        for block in self.blocks[:-1]:
+            x = block(x)
+        return self.fc(self.blocks[-1].forward_last(x))
+
+
+def fuse_tcn(model):
+    return FusedTCN(model)
+
+
+def quantize_tcn(model):
+    """FusedTCN (또는 TCNClassifier) → dynamic int8 (모든 Linear 가중치 int8, 활성값은 실행 중 양자화)"""
+    fused = model if isinstance(model, FusedTCN) else FusedTCN(model)
+    return torch.ao.quantization.quantize_dynamic(fused, {nn.Linear}, dtype=torch.qint8)
+
+
+# =========================
+# 2. 내보내기
+# =========================
+
+def export_torchscript(module, path, example, freeze=True):
+    """trace 후 저장. freeze=True 면 freeze + optimize_for_inference (int8 모듈은 False)"""
+    module = module.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(module, example)
+        if freeze:
+            traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    traced.save(path)
+    return traced
+
+
+def export_onnx(module, path, example, opset=ONNX_OPSET):
+    with torch.no_grad():
+        torch.onnx.export(module.eval(), (example,), path,
+                          input_names=["x"], output_names=["logits"],
+                          dynamic_axes={"x": {0: "batch", 1: "time"}, "logits": {0: "batch"}},
+                          opset_version=opset)
+    return path
+
+
+def quantize_onnx(fp32_path, int8_path):
+    """onnxruntime 의 dynamic int8 양자화 (onnxruntime 이 없으면 None)"""
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        print("[WARN] onnxruntime not installed; skip ONNX int8")
+        return None
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def export_tcn(model, out_dir=OUT_DIR, window=WINDOW, onnx=True, int8=True,
+               x=None, batch_size=BATCH_SIZE, repeat=BENCH_REPEAT):
+    """
+    TCNClassifier → out_dir 에 TorchScript / ONNX (fp32, int8) 저장 + eager 대비 검증 / 속도 보고.
+    x: 검증·측정용 윈도우 (N, window, D), None 이면 정규분포 난수 batch_size 개
+    반환: (paths {"fp32", "int8", "onnx", "onnx_int8"}, report DataFrame)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    model = model.eval()
+    fused = fuse_tcn(model)
+    example = torch.randn(2, window, fused.input_dim)
+
+    paths = {}
+    paths["fp32"] = os.path.join(out_dir, "tcn_fp32.ts")
+    export_torchscript(fused, paths["fp32"], example)
+    if int8:
+        paths["int8"] = os.path.join(out_dir, "tcn_int8.ts")
+        export_torchscript(quantize_tcn(fused), paths["int8"], example, freeze=False)
+    if onnx:
+        onnx_path = os.path.join(out_dir, "tcn_fp32.onnx")
+        try:
+            paths["onnx"] = export_onnx(fused, onnx_path, example)
+        except Exception as e:
+            print(f"[WARN] ONNX export failed: {e}")
+        if int8 and "onnx" in paths:
+            onnx_int8 = quantize_onnx(paths["onnx"], os.path.join(out_dir, "tcn_int8.onnx"))
+            if onnx_int8:
+                paths["onnx_int8"] = onnx_int8
+
+    if x is None:
+        x = np.random.default_rng(0).standard_normal(
+            (batch_size, window, fused.input_dim)).astype(np.float32)
+    report = compare_runtimes(model, paths, x, batch_size=batch_size, repeat=repeat)
+    report.to_csv(os.path.join(out_dir, "report.csv"), index=False)
+
+    meta = {
+        "window": window,
+        "input_dim": fused.input_dim,
+        "num_classes": model.fc.out_features,
+        "receptive_field": fused.receptive_field,
+        "torch": torch.__version__,
+        "paths": {k: os.path.basename(v) for k, v in paths.items()},
+        "report": report.to_dict(orient="records"),
+    }
+    with open(os.path.join(out_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] exported {len(paths)} model(s) → {out_dir}")
+    return paths, report
+
+
+# =========================
+# 3. 런타임 (세션 여러 개를 한 번에 배치)
+# =========================
+
+class TCNRuntime:
+    """
+    model      : .ts (TorchScript) / .onnx 경로 또는 nn.Module (TCNClassifier, FusedTCN ...)
+    batch_size : 한 번에 넣을 윈도우 수
+    num_threads: torch / onnxruntime 연산 스레드 수 (None 이면 기본값)
+
+    predict_windows(windows)      : (N, T, D) → logits (N, K)
+    predict_sessions(sessions, …) : {이름: (N, D)} → {이름: (W, K) 확률}
+    """
+
+    def __init__(self, model, batch_size=BATCH_SIZE, num_threads=None):
+        self.batch_size = batch_size
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        if isinstance(model, (str, os.PathLike)):
+            path = str(model)
+            if path.endswith(".onnx"):
+                import onnxruntime as ort
+
+                opts = ort.SessionOptions()
+                if num_threads:
+                    opts.intra_op_num_threads = num_threads
+                self._session = ort.InferenceSession(path, opts,
+                                                     providers=["CPUExecutionProvider"])
+                self._input_name = self._session.get_inputs()[0].name
+                self._run = self._run_onnx
+            else:
+                self._module = torch.jit.load(path, map_location="cpu").eval()
+                self._run = self._run_torch
+            self.name = os.path.basename(path)
+        else:
+            self._module = model.eval()
+            self._run = self._run_torch
+            self.name = type(model).__name__
+
+    def _run_torch(self, x):
+        with torch.inference_mode():
+            return self._module(torch.from_numpy(x)).numpy()
+
+    def _run_onnx(self, x):
+        return self._session.run(None, {self._input_name: x})[0]
+
+    def predict_windows(self, windows):
+        """windows: (N, T, D) (strided view 도 가능) → logits (N, K) float32"""
+        out = [self._run(np.ascontiguousarray(windows[i:i + self.batch_size], dtype=np.float32))
+               for i in range(0, len(windows), self.batch_size)]
+        return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+    __call__ = predict_windows
+
+    def predict_sessions(self, sessions, window=WINDOW, step=1):
+        """
+        sessions: {이름: (N, D) 랜드마크} → {이름: (W, K) sigmoid 확률}
+        윈도우 w 는 프레임 [w*step, w*step + window) 이고 확률은 마지막 프레임 기준.
+        모든 세션의 윈도우를 한 줄로 이어서 batch_size 씩 추론 (짧은 세션도 배치를 채움)
+        """
+        names = list(sessions)
+        arrays = [np.asarray(sessions[n], dtype=np.float32) for n in names]
+        lengths = [len(a) for a in arrays]
+        starts, _, window_offsets, _ = build_window_starts(lengths, window, step)
+        if len(starts) == 0:
+            return {n: np.zeros((0, 0), dtype=np.float32) for n in names}
+
+        x = np.concatenate(arrays)
+        x_win = sliding_window_view(x, window, axis=0).transpose(0, 2, 1)   # (행, T, D) view
+        logits = np.concatenate([self._run(np.ascontiguousarray(x_win[starts[i:i + self.batch_size]]))
+                                 for i in range(0, len(starts), self.batch_size)])
+        probs = 1.0 / (1.0 + np.exp(-logits))
+        return {n: probs[window_offsets[s]:window_offsets[s + 1]] for s, n in enumerate(names)}
+
+
+# =========================
+# 4. 검증 / 속도 비교
+# =========================
+
+def _time_ms(fn, x, repeat=BENCH_REPEAT, warmup=3):
+    for _ in range(warmup):
+        fn(x)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(x)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return float(np.median(times))
+
+
+def compare_runtimes(model, paths, x, batch_size=BATCH_SIZE, repeat=BENCH_REPEAT):
+    """
+    eager TCNClassifier 기준으로 FusedTCN / 내보낸 파일들의
+        max_abs_diff   : logits 최대 절대 오차
+        pred_agreement : sigmoid > 0.5 예측 일치율 (라벨 단위)
+        ms_per_batch   : batch_size 윈도우 한 배치 지연 (중앙값)
+        speedup        : eager 대비 배
+    를 표로 반환. fp32 변형이 PARITY_ATOL 을 넘으면 경고.
+    """
+    x = np.ascontiguousarray(x[:batch_size], dtype=np.float32)
+    eager = TCNRuntime(model.eval(), batch_size)
+    ref = eager(x)
+    eager_ms = _time_ms(eager, x, repeat)
+
+    variants = [("eager", eager), ("fused", TCNRuntime(fuse_tcn(model), batch_size))]
+    for kind, path in paths.items():
+        try:
+            variants.append((kind, TCNRuntime(path, batch_size)))
+        except ImportError as e:
+            print(f"[WARN] skip {kind} ({e})")
+
+    rows = []
+    for kind, runtime in variants:
+        out = ref if kind == "eager" else runtime(x)
+        ms = eager_ms if kind == "eager" else _time_ms(runtime, x, repeat)
+        max_diff = float(np.abs(out - ref).max())
+        rows.append({
+            "variant": kind,
+            "max_abs_diff": max_diff,
+            "pred_agreement": float(((out > 0) == (ref > 0)).mean()),
+            "ms_per_batch": ms,
+            "windows_per_sec": len(x) / ms * 1000.0,
+            "speedup": eager_ms / ms,
+        })
+        if "int8" not in kind and max_diff > PARITY_ATOL:
+            print(f"[WARN] {kind}: max |logit diff| {max_diff:.2e} > {PARITY_ATOL:.0e}")
+
+    df = pd.DataFrame(rows)
+    print(f"[INFO] parity / speed (batch={len(x)}, threads={torch.get_num_threads()})")
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    return df
+
+
+def main():
+    from tcn_model import load_tcn_classifier
+
+    model = load_tcn_classifier(WEIGHTS_PATH)
+    export_tcn(model, OUT_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import torch
+import torch.nn as nn
+
+"""
+TCN 모델 정의 (medels.ipynb 에서 옮김)
+
+    Chomp1d       : causal conv 를 위해 padding 뒤쪽을 잘라내는 모듈
+    TemporalBlock : dilated causal conv 2개 + residual
+    TCNClassifier : TemporalBlock 을 dilation 1, 2, 4, ... 로 쌓고 마지막 타임스텝만 분류
+
+학습은 medels.ipynb / tcn_cv.py, 실시간 한 프레임씩 추론은 tcn_stream.py,
+배포용 내보내기(TorchScript / ONNX / int8)와 배치 추론은 tcn_export.py 참고.
+"""
+
+
+class Chomp1d(nn.Module):
+    """Causal conv를 위해 padding 뒤쪽을 잘라내는 모듈."""
+    def __init__(self, chomp_size):
+        super().__init__()
+        self.chomp_size = chomp_size
+
+    def forward(self, x):
+        # x: (B, C, T_pad)
+        return x[:, :, :-self.chomp_size].contiguous()
+
+
+class TemporalBlock(nn.Module):
+    def __init__(self, in_channels, out_channels, kernel_size, dilation, dropout):
+        super().__init__()
+        padding = (kernel_size - 1) * dilation
+
+        self.conv1 = nn.Conv1d(in_channels, out_channels,
+                               kernel_size, padding=padding, dilation=dilation)
+        self.chomp1 = Chomp1d(padding)
+        self.bn1 = nn.BatchNorm1d(out_channels)
+
+        self.conv2 = nn.Conv1d(out_channels, out_channels,
+                               kernel_size, padding=padding, dilation=dilation)
+        self.chomp2 = Chomp1d(padding)
+        self.bn2 = nn.BatchNorm1d(out_channels)
+
+        self.relu = nn.ReLU()
+        self.dropout = nn.Dropout(dropout)
+
+        # residual connection (채널수가 바뀌면 1x1 conv로 맞춰줌)
+        self.downsample = (
+            nn.Conv1d(in_channels, out_channels, kernel_size=1)
+            if in_channels != out_channels else None
+        )
+
+    def forward(self, x):
+        out = self.conv1(x)
+        out = self.chomp1(out)
+        out = self.bn1(out)
+        out = self.relu(out)
+        out = self.dropout(out)
+
+        out = self.conv2(out)
+        out = self.chomp2(out)
+        out = self.bn2(out)
+        out = self.relu(out)
+        out = self.dropout(out)
+
+        res = x if self.downsample is None else self.downsample(x)
+        return self.relu(out + res)
+
+
+class TCNClassifier(nn.Module):
+    def __init__(self, input_dim, num_classes,
+                 channels=(32, 32), kernel_size=3, dropout=0.5):
+        super().__init__()
+        layers = []
+        in_ch = input_dim
+        for i, out_ch in enumerate(channels):
+            dilation = 2 ** i
+            layers.append(
+                TemporalBlock(in_ch, out_ch,
+                              kernel_size=kernel_size,
+                              dilation=dilation,
+                              dropout=dropout)
+            )
+            in_ch = out_ch
+
+        self.tcn = nn.Sequential(*layers)
+        self.fc = nn.Linear(in_ch, num_classes)
+
+    def forward(self, x):
+        """
+        x: (B, T, D)  # LandmarkWindowDataset에서 나오는 형태
+        return: (B, num_classes)
+        """
+        # Conv1d: (B, C, T) 이므로 D ↔ C
+        x = x.transpose(1, 2)  # (B, D, T)
+        y = self.tcn(x)        # (B, C_out, T)
+        y_last = y[:, :, -1]   # 마지막 타임스텝만 사용 (B, C_out)
+        logits = self.fc(y_last)  # (B, num_classes)
+        return logits
+
+
+def fold_batchnorm(conv, bn=None):
+    """
+    eval 모드 BatchNorm 을 앞 conv 가중치/편향에 합친 (weight (C_out, C_in, k), bias (C_out,)).
+    (Dropout 은 eval 에서 항등이므로 따로 처리할 것 없음)
+    """
+    w = conv.weight.detach()
+    b = conv.bias.detach() if conv.bias is not None else torch.zeros(w.shape[0], device=w.device)
+    if bn is not None:
+        scale = bn.weight.detach() / torch.sqrt(bn.running_var + bn.eps)
+        w = w * scale[:, None, None]
+        b = (b - bn.running_mean) * scale + bn.bias.detach()
+    return w, b
+
+
+def receptive_field(model):
+    """TCNClassifier 마지막 타임스텝 출력이 보는 입력 프레임 수 = 1 + 2*(k-1)*sum(dilation)"""
+    rf = 1
+    for block in model.tcn:
+        for conv in (block.conv1, block.conv2):
+            rf += (conv.kernel_size[0] - 1) * conv.dilation[0]
+    return rf
+
+
+def load_tcn_classifier(weights_path, input_dim=126, num_classes=3,
+                        channels=(32, 32), kernel_size=3, dropout=0.5, device="cpu"):
+    """
+    torch.save(model.state_dict(), weights_path) 로 저장한 가중치를 불러와 eval 모드로 반환.
+    (구조 인자는 학습 때와 같아야 함)
+    """
+    model = TCNClassifier(input_dim, num_classes, channels=channels,
+                          kernel_size=kernel_size, dropout=dropout)
+    model.load_state_dict(torch.load(weights_path, map_location=device))
+    return model.to(device).eval()
@@ -0,0 +1,250 @@
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from metrics import METRICS
+from tcn_model import TCNClassifier, fold_batchnorm
+
+"""
+TCN 실시간(스트리밍) 추론
+
+TCNClassifier 는 causal conv(Chomp1d) 만 쓰기 때문에 마지막 타임스텝 출력은
+과거 입력에만 의존한다. 그래서 15프레임 윈도우 전체를 매번 다시 계산하지 않고,
+conv 마다 "지난 입력"을 ring buffer 에 들고 있으면 새 프레임 1개당 한 스텝만 계산하면 된다.
+
+    conv (kernel k, dilation d) 의 출력[t] = W · [입력[t-(k-1)d], ..., 입력[t-d], 입력[t]] + b
+    → 입력 ring buffer 길이 (k-1)*d + 1, 탭은 d 간격으로 읽음
+
+    - eval 모드 BatchNorm 은 conv 가중치/편향에 미리 합쳐 둠 (Dropout 은 eval 에서 무시)
+    - buffer 를 0 으로 시작하는 것 = 오프라인 모델의 왼쪽 zero padding 과 같음
+    - 수용 영역(receptive field) = 1 + 2*(k-1)*sum(dilation)
+      기본 구조 (32, 32), k=3 → 13 프레임 ≤ WINDOW(15)
+      → 학습 때 15프레임 윈도우로 돌린 결과와 같은 값이 나온다
+
+사용 예 (캡처 루프):
+    predictor = LiveActionPredictor(load_tcn_classifier("tcn_fold0.pt"))
+    while ...:
+        probs = predictor.push(frame)       # (3,) A/S/D 확률
+    print(predictor.latency_summary())      # 프레임당 지연(ms)
+"""
+
+ACTION_KEYS = ("A", "S", "D")
+
+
+class _StreamConv:
+    """Conv1d(+ BatchNorm) 하나의 스트리밍 버전. 입력 ring buffer: (B, C_in, (k-1)*d + 1)"""
+
+    def __init__(self, conv, bn=None, batch_size=1):
+        w, b = fold_batchnorm(conv, bn)                  # (C_out, C_in, k), (C_out,)
+
+        self.k = w.shape[2]
+        self.d = conv.dilation[0]
+        self.length = (self.k - 1) * self.d + 1
+        # 탭 j (가장 오래된 것부터) = 입력[t - (k-1-j)*d] → (C_in*k, C_out) 로 펼쳐 matmul 1번
+        self.weight = w.permute(1, 2, 0).reshape(-1, w.shape[0]).contiguous()
+        self.bias = b.contiguous()
+        self.in_channels = w.shape[1]
+        self.reset(batch_size)
+
+    def reset(self, batch_size):
+        self.buf = torch.zeros(batch_size, self.in_channels, self.length,
+                               dtype=self.weight.dtype, device=self.weight.device)
+        self.pos = 0   # 다음에 쓸 위치
+        # 탭 오프셋: 가장 오래된 탭 → 현재
+        self._tap_offsets = torch.arange(-(self.k - 1) * self.d, 1, self.d,
+                                         device=self.weight.device)
+
+    def step(self, x):
+        """x: (B, C_in) → (B, C_out)"""
+        self.buf[:, :, self.pos] = x
+        taps = (self.pos + self._tap_offsets) % self.length
+        self.pos = (self.pos + 1) % self.length
+        window = self.buf[:, :, taps]                    # (B, C_in, k)
+        return window.reshape(window.shape[0], -1) @ self.weight + self.bias
+
+
+class StreamingTCN:
+    """
+    학습된 TCNClassifier 를 한 프레임씩 추론한다.
+
+    model      : TCNClassifier (가중치만 복사해서 쓰므로 원본 모델은 그대로)
+    batch_size : 동시에 처리할 스트림 수 (카메라 여러 대 등, 기본 1)
+
+    step(x)    : x (D,) 또는 (B, D) → logits (K,) 또는 (B, K)
+    """
+
+    def __init__(self, model: TCNClassifier, batch_size=1):
+        model = model.eval()
+        self.batch_size = batch_size
+        self.blocks = []
+        self.receptive_field = 1
+        for block in model.tcn:
+            conv1 = _StreamConv(block.conv1, block.bn1, batch_size)
+            conv2 = _StreamConv(block.conv2, block.bn2, batch_size)
+            down = None
+            if block.downsample is not None:
+                down = (block.downsample.weight.detach()[:, :, 0].t().contiguous(),
+                        block.downsample.bias.detach())
+            self.blocks.append((conv1, conv2, down))
+            self.receptive_field += (conv1.length - 1) + (conv2.length - 1)
+
+        self.fc_weight = model.fc.weight.detach().t().contiguous()
+        self.fc_bias = model.fc.bias.detach()
+        self.device = self.fc_weight.device
+        self.n_steps = 0
+
+    def reset(self):
+        """새 세션 시작 (모든 buffer 를 0 으로)"""
+        for conv1, conv2, _ in self.blocks:
+            conv1.reset(self.batch_size)
+            conv2.reset(self.batch_size)
+        self.n_steps = 0
+
+    @property
+    def warmed_up(self):
+        """수용 영역만큼 프레임이 들어와서 오프라인 윈도우 결과와 같아졌는지"""
+        return self.n_steps >= self.receptive_field
+
+    @torch.inference_mode()
+    def step(self, x):
+        with METRICS.timer("tcn"):
+            return self._step(x)
+
+    def _step(self, x):
+        x = torch.as_tensor(x, dtype=torch.float32, device=self.device)
+        single = x.dim() == 1
+        if single:
+            x = x.unsqueeze(0)
+
+        for conv1, conv2, down in self.blocks:
+            out = torch.relu(conv1.step(x))
+            out = torch.relu(conv2.step(out))
+            res = x if down is None else x @ down[0] + down[1]
+            x = torch.relu(out + res)
+
+        logits = x @ self.fc_weight + self.fc_bias
+        self.n_steps += 1
+        return logits[0] if single else logits
+
+    def predict_proba(self, x):
+        """sigmoid 확률 (numpy)"""
+        return torch.sigmoid(self.step(x)).cpu().numpy()
+
+
+class LiveActionPredictor:
+    """
+    캡처 루프에서 프레임(BGR)을 받아 손 랜드마크 → StreamingTCN 으로 A/S/D 확률을 낸다.
+
+    model     : TCNClassifier (tcn_model.load_tcn_classifier 로 불러온 것)
+    max_hands : 학습 때와 같은 손 개수 (입력 차원 = max_hands*21*3)
+    """
+
+    def __init__(self, model, max_hands=2, latency_window=300):
+        import mediapipe as mp
+
+        self.tcn = StreamingTCN(model)
+        self.max_hands = max_hands
+        self.hands = mp.solutions.hands.Hands(
+            static_image_mode=False,
+            max_num_hands=max_hands,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+        self._kps = np.zeros((max_hands, 21, 3), dtype=np.float32)
+        self.last_probs = np.zeros(len(ACTION_KEYS), dtype=np.float32)
+
+        # 최근 latency_window 프레임의 (랜드마크 ms, TCN ms)
+        self._latency = deque(maxlen=latency_window)
+
+    def reset(self):
+        self.tcn.reset()
+        self.hands.reset()
+        self._latency.clear()
+        self.last_probs[:] = 0.0
+
+    def push(self, frame_bgr):
+        """프레임 하나 처리. 반환: (K,) A/S/D 확률"""
+        from hand_stream import process_hands
+
+        t0 = time.perf_counter()
+        process_hands(self.hands, frame_bgr, self._kps)
+        t1 = time.perf_counter()
+        self.last_probs = self.tcn.predict_proba(self._kps.reshape(-1))
+        t2 = time.perf_counter()
+
+        self._latency.append(((t1 - t0) * 1000.0, (t2 - t1) * 1000.0))
+        return self.last_probs
+
+    def latency_summary(self):
+        """
+        최근 프레임 지연 통계(ms)
+            {"landmark_ms", "tcn_ms", "total_ms", "total_p95_ms", "frames"}
+        """
+        if not self._latency:
+            return {"landmark_ms": 0.0, "tcn_ms": 0.0, "total_ms": 0.0,
+                    "total_p95_ms": 0.0, "frames": 0}
+        lat = np.asarray(self._latency)
+        total = lat.sum(axis=1)
+        return {
+            "landmark_ms": float(lat[:, 0].mean()),
+            "tcn_ms": float(lat[:, 1].mean()),
+            "total_ms": float(total.mean()),
+            "total_p95_ms": float(np.percentile(total, 95)),
+            "frames": len(lat),
+        }
+
+    def close(self):
+        self.hands.close()
+
+
+# =========================
+# 캡처 루프 실행 예
+# =========================
+
+WEIGHTS_PATH = "tcn_fold0.pt"
+CAMERA_INDEX = 0
+PRINT_EVERY  = 150          # 이 프레임 수마다 지연 통계 출력
+
+
+def main():
+    import cv2
+    from tcn_model import load_tcn_classifier
+
+    predictor = LiveActionPredictor(load_tcn_classifier(WEIGHTS_PATH))
+    cap = cv2.VideoCapture(CAMERA_INDEX)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open camera index {CAMERA_INDEX}")
+    print("[INFO] Press Q or ESC to exit.")
+
+    n = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                print("[WARN] Failed to read frame.")
+                break
+
+            probs = predictor.push(frame)
+            n += 1
+
+            text = "  ".join(f"{k}:{p:.2f}" for k, p in zip(ACTION_KEYS, probs))
+            cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv2.imshow("TCN live", frame)
+
+            if n % PRINT_EVERY == 0:
+                s = predictor.latency_summary()
+                print(f"[INFO] landmark {s['landmark_ms']:.1f}ms, tcn {s['tcn_ms']:.2f}ms, "
+                      f"total {s['total_ms']:.1f}ms (p95 {s['total_p95_ms']:.1f}ms)")
+
+            if cv2.waitKey(1) & 0xFF in (ord('q'), 27):
+                break
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+        predictor.close()
+
+
+if __name__ == "__main__":
+    main()
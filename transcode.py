@@ -0,0 +1,384 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from frame_sidecar import (SIDECAR_SUFFIX, FrameSidecarWriter, estimate_fps_from_sidecar,
+                           read_sidecar)
+from frame_store import (SegmentedFrameWriter, VideoFileStore, _natural_key,
+                         find_frame_stores, open_frame_store)
+from process_pool import print_worker_stats, run_isolated
+
+"""
+세션 폴더 ↔ 영상 일괄 변환 (프로세스 풀)
+
+demo_video.ipynb 의 images_to_video 는 프레임을 하나씩 imread → writer.write 하고
+fps 는 7.5 로 고정, lendmark_npz.ipynb 의 convert_videos_with_custom_index 는
+영상 하나씩 프레임마다 cv2.imwrite 한다. 둘 다 코어 1개만 쓰고 중간에 끊기면 처음부터 다시.
+
+    - 작업(세션/영상) 단위로 프로세스에 나눔 (batch_landmarks.py 와 같은 구조)
+    - 작업 안에서는 decode 를 read-ahead 스레드에서 미리 해 두고 메인 스레드는 encode / 쓰기만
+    - fps 는 세션 사이드카(<세션>_frames.bin)의 실제 타임스탬프에서 계산
+      (사이드카가 없으면 영상 파일 메타데이터 → DEFAULT_FPS)
+    - 이어하기:
+        세션 → 영상 : <출력>.part 에 쓰고 끝나면 이름 변경, 출력이 세션보다 새로우면 건너뜀
+        영상 → 세션 : 이미 있는 frame_000000.jpg ... 다음 번호부터 이어서 추출
+                      (프레임은 .tmp 로 쓰고 이름 변경 → 끊겨도 깨진 JPEG 가 남지 않음)
+    - 영상 → 세션 변환 시 사이드카도 만들어 둠 (컨테이너 fps 기준 프레임 시각)
+      → 다시 영상으로 만들 때 같은 fps 가 나온다
+
+실행:
+    python transcode.py   (아래 ROOT_DIRS / OUT_VIDEO_DIR 수정 후, 세션 → 영상)
+
+노트북에서:
+    jobs = [("to_video", r"demo\\yolo\\video_normal_new_002", "video_normal_new_002.mp4",
+             {"timing_from": r"test_data\\test_video\\video_normal_new_002(fast)"})]
+    run_batch(jobs)
+"""
+
+# =========================
+# 1. 설정
+# =========================
+
+ROOT_DIRS = [
+    os.path.join("data", "normal"),
+    os.path.join("data", "missing1"),
+    os.path.join("data", "missing2"),
+    os.path.join("data", "idle"),
+]
+OUT_VIDEO_DIR = "videos"    # <OUT_VIDEO_DIR>/<세션이름>.mp4
+
+NUM_WORKERS  = max(1, (os.cpu_count() or 2) - 1)
+MAX_ATTEMPTS = 2            # 작업 하나가 워커를 죽여도 다시 돌려 보는 최대 횟수
+READ_AHEAD   = 32           # 미리 decode 해 둘 프레임 수
+DEFAULT_FPS  = 7.5          # 사이드카 / 메타데이터 모두 없을 때
+FOURCC       = "mp4v"
+JPEG_QUALITY = 95
+FORCE        = False        # True 면 출력이 최신이어도 다시 변환
+
+PART_SUFFIX = ".part"
+
+
+# =========================
+# 2. 공통
+# =========================
+
+def iter_read_ahead(store, depth=READ_AHEAD, start=0):
+    """
+    store.iter_frames() 를 별도 스레드에서 depth 프레임 앞서 읽는다.
+    반환: (frame_idx, frame) — 읽기 실패한 프레임은 (idx, None)
+    """
+    q = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    error = []
+
+    def reader():
+        try:
+            for item in store.iter_frames(start):
+                if stop.is_set():
+                    return
+                q.put(item)
+        except Exception as e:
+            error.append(e)
+        finally:
+            q.put(None)
+
+    t = threading.Thread(target=reader, daemon=True, name="read-ahead")
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        stop.set()
+        while t.is_alive():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                t.join(timeout=0.05)
+    if error:
+        raise error[0]
+
+
+def session_sidecar_path(store_path):
+    """세션 폴더 video/normal/video_normal_001 → video/normal/video_normal_001_frames.bin"""
+    return os.path.normpath(str(store_path)) + SIDECAR_SUFFIX
+
+
+def session_fps(store_path, default=DEFAULT_FPS):
+    """
+    세션의 실제 fps.
+    사이드카 타임스탬프 → (영상 파일이면) 컨테이너 fps → default 순서로 사용
+    """
+    sidecar = session_sidecar_path(store_path)
+    if os.path.exists(sidecar):
+        fps = estimate_fps_from_sidecar(sidecar)
+        if fps > 0:
+            return fps
+    if os.path.isfile(str(store_path)):
+        cap = cv2.VideoCapture(str(store_path))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        if fps and fps > 0:
+            return float(fps)
+    return float(default)
+
+
+def newest_mtime(path):
+    """폴더면 안쪽 파일 중 가장 최근 수정 시각, 파일이면 그 파일 시각"""
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    newest = 0.0
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_file():
+                newest = max(newest, e.stat().st_mtime)
+    return newest
+
+
+# =========================
+# 3. 세션 → 영상
+# =========================
+
+def frames_to_video(src, out_video_path, fps=None, timing_from=None, fourcc=FOURCC,
+                    read_ahead=READ_AHEAD):
+    """
+    src(이미지 폴더 / 세그먼트 / raw 저장소)의 프레임을 순서대로 영상으로 저장.
+
+    fps         : None 이면 timing_from(기본 src) 세션의 사이드카 타임스탬프로 계산
+    timing_from : 시각화 결과 폴더(demo/yolo/...)처럼 사이드카가 원본 세션에만 있을 때 원본 경로
+    반환: 쓴 프레임 수
+    """
+    if fps is None:
+        fps = session_fps(timing_from if timing_from is not None else src)
+
+    out_dir = os.path.dirname(out_video_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    # 확장자로 컨테이너를 정하므로 .part 는 확장자 앞에 붙인다
+    root, ext = os.path.splitext(out_video_path)
+    part_path = f"{root}{PART_SUFFIX}{ext}"
+
+    writer = None
+    n_written = 0
+    with open_frame_store(src) as store:
+        if len(store) == 0:
+            raise RuntimeError(f"[ERROR] No images found in {src}")
+        try:
+            for idx, frame in iter_read_ahead(store, read_ahead):
+                if frame is None:
+                    print(f"[WARN] skip invalid image: {store.name(idx)}")
+                    continue
+                if writer is None:
+                    h, w = frame.shape[:2]
+                    writer = cv2.VideoWriter(part_path, cv2.VideoWriter_fourcc(*fourcc),
+                                             fps, (w, h))
+                    if not writer.isOpened():
+                        raise RuntimeError(f"Cannot open VideoWriter for {part_path}")
+                elif frame.shape[:2] != (h, w):
+                    # 세션 중간에 해상도가 바뀌면(ENCODE_GOVERNOR 축소 등) VideoWriter 는
+                    # 에러 없이 프레임을 버리므로 첫 프레임 크기로 맞춤
+                    frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_LINEAR)
+                writer.write(frame)
+                n_written += 1
+        finally:
+            if writer is not None:
+                writer.release()
+
+    if writer is None:
+        raise RuntimeError(f"[ERROR] Failed to read any frame from {src}")
+    os.replace(part_path, out_video_path)
+    print(f"[INFO] Video saved: {out_video_path} ({n_written} frames, {fps:.3f} fps)")
+    return n_written
+
+
+# =========================
+# 4. 영상 → 세션
+# =========================
+
+def _count_existing_frames(out_dir, image_ext):
+    """frame_000000<ext> 부터 빠짐없이 이어진 프레임 수 (이어하기 시작 위치)"""
+    if not os.path.isdir(out_dir):
+        return 0
+    with os.scandir(out_dir) as it:
+        names = {e.name for e in it if e.is_file()}
+    n = 0
+    while f"frame_{n:06d}{image_ext}" in names:
+        n += 1
+    return n
+
+
+def _write_image_atomic(path, frame, image_ext, params):
+    ok, buf = cv2.imencode(image_ext, frame, params)
+    if not ok:
+        raise RuntimeError(f"Failed to encode {path}")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buf.tobytes())
+    os.replace(tmp_path, path)
+
+
+def video_to_frames(video_path, out_dir, image_ext=".jpg", store_format="jpeg",
+                    segment_seconds=60, read_ahead=READ_AHEAD):
+    """
+    영상을 세션 폴더로 풀고 <out_dir>_frames.bin 사이드카(영상 타임스탬프)를 만든다.
+    store_format:
+        "jpeg"     : frame_000000.jpg ... (중간에 끊겼으면 이어서 추출)
+        "segments" : MJPG 세그먼트 + frame_index.bin (frame_store.py 참고, 처음부터 다시)
+    반환: 세션 전체 프레임 수
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sidecar_path = session_sidecar_path(out_dir)
+
+    start = 0
+    if store_format == "jpeg":
+        start = _count_existing_frames(out_dir, image_ext)
+    elif store_format != "segments":
+        raise ValueError(f"Unknown store_format: {store_format}")
+
+    # 이어하기: 이미 추출한 프레임의 사이드카 레코드를 보존
+    prev = None
+    if start and os.path.exists(sidecar_path):
+        prev = np.array(read_sidecar(sidecar_path)[:start])
+        if len(prev) < start:
+            prev = None
+    if start and prev is None:
+        start = 0   # 사이드카가 없거나 짧으면 타임스탬프를 맞출 수 없으니 처음부터
+
+    store = VideoFileStore(video_path)
+    fps = store.fps if store.fps and store.fps > 0 else DEFAULT_FPS
+    sidecar = FrameSidecarWriter(sidecar_path, t0_wall=os.path.getmtime(video_path))
+    seg_writer = None
+    if store_format == "segments":
+        seg_writer = SegmentedFrameWriter(out_dir, fps, segment_seconds=segment_seconds)
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if image_ext.lower() in (".jpg", ".jpeg") else []
+
+    count = start
+    try:
+        if prev is not None:
+            for i, rec in enumerate(prev):
+                sidecar.write(i, rec["capture_ts"], rec["pos_msec"], rec["encode_ms"], rec["dropped"])
+
+        for idx, frame in iter_read_ahead(store, read_ahead, start):
+            pos_msec = idx * 1000.0 / fps
+            t0 = time.perf_counter()
+            if seg_writer is not None:
+                seg_writer.write(idx, frame)
+            else:
+                _write_image_atomic(os.path.join(out_dir, f"frame_{idx:06d}{image_ext}"),
+                                    frame, image_ext, params)
+            sidecar.write(idx, pos_msec / 1000.0, pos_msec,
+                          (time.perf_counter() - t0) * 1000.0)
+            count = idx + 1
+    finally:
+        store.close()
+        sidecar.close()
+        if seg_writer is not None:
+            seg_writer.close()
+
+    resumed = f" (resumed at {start})" if start else ""
+    print(f"[video_to_frames] {video_path} -> {count} frames saved at {out_dir}{resumed}")
+    return count
+
+
+# =========================
+# 5. 일괄 실행
+# =========================
+
+def is_video_up_to_date(store_path, video_path):
+    return os.path.exists(video_path) and os.path.getmtime(video_path) > newest_mtime(store_path)
+
+
+def collect_jobs(root_dirs=ROOT_DIRS, out_video_dir=OUT_VIDEO_DIR, force=FORCE):
+    """
+    세션 폴더 → 영상 작업 목록
+    반환: (jobs, 건너뛴 수), jobs = [("to_video", 세션 경로, 영상 경로, {}), ...]
+    """
+    jobs = []
+    skipped = 0
+    for root_dir in root_dirs:
+        for store_path in find_frame_stores(root_dir):
+            video_path = os.path.join(out_video_dir, os.path.basename(store_path) + ".mp4")
+            if not force and is_video_up_to_date(store_path, video_path):
+                skipped += 1
+                continue
+            jobs.append(("to_video", store_path, video_path, {}))
+    return jobs, skipped
+
+
+def video_jobs_with_custom_index(video_dir, output_root, case_name, start_index, **kwargs):
+    """
+    video_dir 안의 영상 → output_root/<case_name>_<번호> 세션 작업 목록 (번호는 start_index 부터)
+    """
+    names = sorted((n for n in os.listdir(video_dir) if n.lower().endswith(".mp4")),
+                   key=_natural_key)
+    return [("to_frames", os.path.join(video_dir, name),
+             os.path.join(output_root, f"{case_name}_{start_index + i:03d}"), dict(kwargs))
+            for i, name in enumerate(names)]
+
+
+def _init_worker():
+    # 프로세스 여러 개가 각자 OpenCV 스레드 풀을 만들면 코어를 나눠 먹으므로 1개로
+    cv2.setNumThreads(1)
+
+
+def _run_job(kind, src, dst, kwargs):
+    t_start = time.perf_counter()
+    if kind == "to_video":
+        n_frames = frames_to_video(src, dst, **kwargs)
+    elif kind == "to_frames":
+        n_frames = video_to_frames(src, dst, **kwargs)
+    else:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return os.getpid(), n_frames, time.perf_counter() - t_start
+
+
+def run_batch(jobs, num_workers=NUM_WORKERS, max_attempts=MAX_ATTEMPTS):
+    """
+    jobs: [(kind, src, dst, kwargs), ...]
+        kind = "to_video"  : frames_to_video(src, dst, **kwargs)
+        kind = "to_frames" : video_to_frames(src, dst, **kwargs)
+    워커를 죽이는 작업(깨진 영상 등)만 실패로 보고 (process_pool.run_isolated)
+
+    반환:
+        worker_stats: {pid: {"jobs", "frames", "seconds"}}
+        failed      : [(src, 에러 메시지), ...]
+    """
+    worker_stats = defaultdict(lambda: {"jobs": 0, "frames": 0, "seconds": 0.0})
+
+    def on_done(job, value):
+        pid, n_frames, seconds = value
+        st = worker_stats[pid]
+        st["jobs"] += 1
+        st["frames"] += n_frames
+        st["seconds"] += seconds
+
+    _, failed = run_isolated(_run_job, jobs, num_workers, max_attempts,
+                             initializer=_init_worker, on_done=on_done,
+                             label=lambda job: job[1])
+    return dict(worker_stats), [(job[1], msg) for job, msg in failed]
+
+
+def main():
+    jobs, skipped = collect_jobs()
+    print(f"[INFO] {len(jobs)} session(s) to convert, {skipped} up to date. "
+          f"workers={NUM_WORKERS}")
+    if not jobs:
+        return
+
+    t_start = time.perf_counter()
+    worker_stats, failed = run_batch(jobs)
+    print_worker_stats(worker_stats, time.perf_counter() - t_start)
+
+    for src, msg in failed:
+        print(f"[WARN] failed: {src} ({msg})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from torch.utils.data import Dataset, Sampler
+
+"""
+슬라이딩 윈도우 데이터셋 (TCN 학습용, 복사 없는 strided view)
+
+medels.ipynb 의 LandmarkWindowDataset 은
+    - (sample, start, end) 튜플 리스트를 파이썬 루프로 만들고
+    - __getitem__ 마다 윈도우 1개를 잘라 텐서로 변환 → DataLoader 가 다시 stack
+하기 때문에 100 epoch × 4 fold 학습에서 데이터 준비 시간이 크다.
+
+SlidingWindowDataset 은
+    - 모든 샘플을 하나의 (전체 프레임, D) 배열로 이어 붙이고
+    - 샘플별 offset 표로 윈도우 시작 위치를 벡터 연산으로 계산
+    - sliding_window_view 로 (윈도우 수, T, D) view 를 만들어 둔다
+
+인덱스로 윈도우 1개(int), 같은 샘플 안의 연속 윈도우 묶음(slice), 임의 윈도우 묶음(배열)을
+받을 수 있고, slice 는 복사 없이 strided view 그대로 배치가 된다.
+
+사용 예:
+    ds = SlidingWindowDataset(landmarks_dict, labels_dict, window=15, step=5)
+    sampler = WindowBatchSampler(ds, batch_size=64, shuffle=True)
+    loader = DataLoader(ds, batch_size=None, sampler=sampler)
+    for batch in loader:
+        batch["x"]       # (B, T, D)
+        batch["y_last"]  # (B, K)
+"""
+
+
+def build_window_starts(lengths, window=15, step=5, row_starts=None):
+    """
+    샘플별 프레임 수(lengths)로 윈도우 시작 위치를 계산한다. (build_window_indices 의 벡터 버전)
+
+    row_starts: 샘플별 첫 프레임 행 (None 이면 lengths 를 순서대로 이어 붙인 위치)
+
+    반환:
+        starts         : (W,) 이어 붙인 배열 기준 윈도우 시작 행
+        sample_idx     : (W,) 윈도우가 속한 샘플 번호
+        window_offsets : (S+1,) 샘플 s 의 윈도우 = window_offsets[s] ~ window_offsets[s+1]
+        row_starts     : (S,) 샘플 s 의 첫 프레임 행
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if row_starts is None:
+        row_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    row_starts = np.asarray(row_starts, dtype=np.int64)
+
+    n_win = np.where(lengths >= window, (lengths - window) // step + 1, 0)
+    window_offsets = np.concatenate([[0], np.cumsum(n_win)])
+
+    sample_idx = np.repeat(np.arange(len(lengths)), n_win)
+    # 샘플 안에서 몇 번째 윈도우인지
+    local = np.arange(window_offsets[-1]) - window_offsets[sample_idx]
+    starts = row_starts[sample_idx] + local * step
+    return starts, sample_idx, window_offsets, row_starts
+
+
+class SlidingWindowDataset(Dataset):
+    """
+    landmarks_dict: sample_name -> (N, D)
+    labels_dict   : sample_name -> (N, K)
+
+    반환 배치(dict, LandmarkWindowDataset 과 같은 키):
+        x      : (B, T, D)
+        y_seq  : (B, T, K)
+        y_last : (B, K)    분류 타깃 (윈도우 마지막 프레임 라벨)
+        sample_idx / start / end : (B,) 샘플 번호(self.samples 기준)와 샘플 안 프레임 구간
+    int 인덱스를 주면 배치 차원 없이 윈도우 1개를 반환한다.
+
+    이미 이어 붙인 배열(landmark_store 의 memmap 등)은 from_arrays() 로 복사 없이 사용.
+    """
+
+    def __init__(self, landmarks_dict, labels_dict, window=15, step=5):
+        samples = sorted(landmarks_dict.keys())
+        lengths = [min(len(landmarks_dict[s]), len(labels_dict[s])) for s in samples]
+        x = np.ascontiguousarray(np.concatenate(
+            [landmarks_dict[s][:n] for s, n in zip(samples, lengths)]), dtype=np.float32)
+        y = np.ascontiguousarray(np.concatenate(
+            [labels_dict[s][:n] for s, n in zip(samples, lengths)]), dtype=np.float32)
+        self._setup(x, y, samples, lengths, None, window, step)
+
+    @classmethod
+    def from_arrays(cls, x, y, samples, row_starts, row_ends, window=15, step=5):
+        """
+        x: (전체 프레임, D), y: (전체 프레임, K) 배열에서 samples 의 행 구간만 사용한다.
+        row_starts / row_ends: samples 순서의 행 구간 [start, end)
+        (x, y 는 복사하지 않으므로 np.memmap 을 그대로 넘길 수 있음, 쓰기 가능 view 필요: mode="c")
+        """
+        ds = cls.__new__(cls)
+        lengths = np.asarray(row_ends, dtype=np.int64) - np.asarray(row_starts, dtype=np.int64)
+        ds._setup(x, y, list(samples), lengths, row_starts, window, step)
+        return ds
+
+    def _setup(self, x, y, samples, lengths, row_starts, window, step):
+        super().__init__()
+        self.window = window
+        self.step = step
+        self.samples = samples
+        self.x = x
+        self.y = y
+
+        (self.starts, self.sample_idx,
+         self.window_offsets, self.row_starts) = build_window_starts(lengths, window, step, row_starts)
+
+        # (행 수 - T + 1, T, D) view: 시작 행 r 의 윈도우 = self._x_win[r]
+        # (torch.from_numpy 가 읽기 전용 경고를 내지 않도록 writeable=True, 실제로 쓰지는 않음)
+        self._x_win = sliding_window_view(self.x, window, axis=0, writeable=True).transpose(0, 2, 1)
+        self._y_win = sliding_window_view(self.y, window, axis=0, writeable=True).transpose(0, 2, 1)
+
+        print(f"[Dataset] samples: {len(self.samples)}")
+        print(f"[Dataset] total windows: {len(self.starts)}")
+
+        self.hand_dim = self.x.shape[1]
+        self.num_actions = self.y.shape[1]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            rows = self._rows_for_block(idx)
+        elif np.ndim(idx) == 0:
+            item = self._batch(np.asarray([self.starts[idx]]), self.sample_idx[idx:idx + 1])
+            return {k: v[0] for k, v in item.items()}
+        else:
+            idx = np.asarray(idx)
+            return self._batch(self.starts[idx], self.sample_idx[idx])
+
+        w0 = idx.start or 0
+        return self._batch(rows, self.sample_idx[w0:idx.stop])
+
+    def _rows_for_block(self, block):
+        """같은 샘플 안의 연속 윈도우 [start, stop) → 시작 행 slice (step 간격)"""
+        w0, w1 = block.start or 0, block.stop
+        s = self.sample_idx[w0]
+        if w1 > self.window_offsets[s + 1]:
+            raise IndexError(f"Window block {w0}:{w1} crosses sample boundary")
+        r0 = int(self.starts[w0])
+        return slice(r0, r0 + (w1 - w0 - 1) * self.step + 1, self.step)
+
+    def _batch(self, rows, sample_idx):
+        """
+        rows 가 slice 면 view 그대로 (복사 없음), 배열이면 배치 1번만 gather.
+        """
+        if isinstance(rows, slice):
+            starts = np.arange(rows.start, rows.stop, rows.step)
+            last = slice(rows.start + self.window - 1, rows.stop + self.window - 1, rows.step)
+        else:
+            starts = rows
+            last = rows + self.window - 1
+
+        local_start = starts - self.row_starts[sample_idx]
+        # 라벨은 uint8 로 저장된 경우도 있으므로 float 로 (float32 면 그대로)
+        return {
+            "x": torch.from_numpy(self._x_win[rows]),              # (B, T, D)
+            "y_seq": torch.from_numpy(self._y_win[rows]).float(),  # (B, T, K)
+            "y_last": torch.from_numpy(self.y[last]).float(),      # (B, K)
+            "sample_idx": torch.from_numpy(sample_idx),
+            "start": torch.from_numpy(local_start),
+            "end": torch.from_numpy(local_start + self.window),
+        }
+
+
+class WindowBatchSampler(Sampler):
+    """
+    DataLoader(dataset, batch_size=None, sampler=WindowBatchSampler(...)) 로 사용.
+
+    contiguous=True : 같은 샘플 안의 연속 윈도우 최대 batch_size 개를 slice 로 넘김
+                      → 데이터셋이 view 그대로 배치를 만든다 (복사 0번)
+                      shuffle 이면 매 epoch 블록 경계를 랜덤하게 밀고 블록 순서를 섞음
+    contiguous=False: 전체 윈도우를 섞어서 batch_size 개씩 배열로 넘김 (배치당 gather 1번)
+    """
+
+    def __init__(self, dataset, batch_size=64, shuffle=False, contiguous=True, seed=None):
+        self.window_offsets = dataset.window_offsets
+        self.n_windows = len(dataset)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.contiguous = contiguous
+        self.rng = np.random.default_rng(seed)
+        self._next_blocks = None   # __len__ 에서 만든 다음 epoch 블록 (길이를 정확히 맞추기 위해)
+
+    def _blocks(self):
+        blocks = []
+        for w0, w1 in zip(self.window_offsets[:-1], self.window_offsets[1:]):
+            w0, w1 = int(w0), int(w1)
+            if w1 <= w0:
+                continue
+            bounds = list(range(w0, w1, self.batch_size))
+            if self.shuffle and w1 - w0 > self.batch_size:
+                # 첫 블록 길이를 랜덤하게 해서 epoch 마다 블록 경계가 달라지게 함
+                shift = int(self.rng.integers(1, self.batch_size + 1))
+                bounds = [w0] + list(range(w0 + shift, w1, self.batch_size))
+            bounds.append(w1)
+            blocks.extend(slice(a, b) for a, b in zip(bounds[:-1], bounds[1:]))
+        return blocks
+
+    def __iter__(self):
+        if self.contiguous:
+            blocks = self._next_blocks if self._next_blocks is not None else self._blocks()
+            self._next_blocks = None
+            order = self.rng.permutation(len(blocks)) if self.shuffle else range(len(blocks))
+            for i in order:
+                yield blocks[i]
+        else:
+            perm = self.rng.permutation(self.n_windows) if self.shuffle else np.arange(self.n_windows)
+            for i in range(0, self.n_windows, self.batch_size):
+                yield perm[i:i + self.batch_size]
+
+    def __len__(self):
+        if self.contiguous:
+            if self._next_blocks is None:
+                self._next_blocks = self._blocks()
+            return len(self._next_blocks)
+        return -(-self.n_windows // self.batch_size)
+
+
+def make_windows(features, labels, window_size=30, stride=5):
+    """
+    prototype.ipynb make_windows 의 view 버전.
+
+    features: (T, D), labels: (T,)
+    return  : X (N, window_size, D) strided view, y (N,) 윈도우 가운데 프레임 라벨
+              윈도우가 하나도 없으면 (None, None)
+    """
+    T = min(len(features), len(labels))
+    if T < window_size:
+        return None, None
+
+    X = sliding_window_view(features[:T], window_size, axis=0)[::stride].transpose(0, 2, 1)
+    center = window_size // 2
+    y = np.asarray(labels[center:center + (len(X) - 1) * stride + 1:stride], dtype=np.int64)
+    return X, y
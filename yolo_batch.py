@@ -0,0 +1,418 @@
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import torch
+
+from frame_store import open_frame_store
+from metrics import METRICS
+from result_cache import frame_digest, model_key
+
+"""
+YOLO 상자 상태 배치 추론 (open/close + full/empty)
+
+test_pred_bbox.ipynb 의 analyze_frame_folders_no_fps 는 프레임마다
+    model_openclose(frame) → model_fullempty(frame)
+를 따로 호출해서 letterbox / 전처리를 프레임당 두 번 하고, 배치도 쓰지 않는다.
+
+여기서는
+    - 프레임 읽기(decode)를 별도 스레드에서 batch_size 단위로 미리 읽어 둠 (prefetch)
+    - 배치를 한 번만 letterbox → (B, 3, H, W) float 텐서로 만들고
+    - 같은 텐서를 두 모델에 그대로 넣음 (텐서 입력이면 ultralytics 는 전처리를 건너뜀)
+    - 4클래스 단일 모델(open_empty/open_full/close_empty/close_full)도 지원
+      → OPEN_CLOSE_MAP / FULL_EMPTY_MAP 으로 open/close, full/empty 개수를 한 번에 계산
+결과 CSV 컬럼은 기존 _yolo_states.csv 와 같다.
+
+cache=ResultCache 를 넘기면 프레임 내용 해시 + 가중치 해시로 박스를 저장해 두고,
+같은 프레임을 다시 만나면 (다른 노트북 / 뷰어에서 봤던 프레임이라도) 추론하지 않는다.
+
+사용 예:
+    detector = DualYoloDetector("best_openclose.pt", "best_fullempty.pt")
+    # detector = MergedYoloDetector("best_4class.pt")
+    analyze_frame_folders_batched("test_video", detector, batch_size=16)
+    analyze_frame_folders_batched("test_video", detector, cache=open_result_cache())
+"""
+
+# xml_to_yolo_txt.ipynb 와 같은 클래스 매핑 (4클래스 이름 → 2클래스 id)
+OPEN_CLOSE_MAP = {
+    "open_empty": 0,
+    "open_full": 0,
+    "close_full": 1,
+    "close_empty": 1,
+}
+
+FULL_EMPTY_MAP = {
+    "open_empty": 0,
+    "close_empty": 0,
+    "open_full": 1,
+    "close_full": 1,
+}
+
+# 학습한 클래스 ID (test_pred_bbox.ipynb 와 동일)
+#   best_openclose.pt : 0 = open_box, 1 = closed_box
+#   best_fullempty.pt : 0 = full_box, 1 = empty_box
+OPEN_IDS   = (0,)
+CLOSED_IDS = (1,)
+FULL_IDS   = (0,)
+EMPTY_IDS  = (1,)
+
+COUNT_COLUMNS = ["box_count", "open_count", "closed_count", "full_count", "empty_count"]
+
+IMG_SIZE = 640
+STRIDE = 32
+PAD_VALUE = 114     # ultralytics LetterBox 와 같은 회색
+
+
+# =========================
+# 1. 프레임 prefetch
+# =========================
+
+def iter_frame_batches(store, batch_size=16, prefetch=2):
+    """
+    store 의 프레임을 별도 스레드에서 읽어 batch_size 개씩 반환한다.
+    반환: (idx 리스트, frame 리스트) — 읽기 실패한 프레임(None)은 빼고 경고만 출력
+    prefetch: 미리 읽어 둘 배치 수 (메모리 = prefetch × batch_size 프레임)
+    """
+    q = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    error = []
+
+    def reader():
+        idxs, frames = [], []
+        try:
+            for idx, frame in store.iter_frames():
+                if stop.is_set():
+                    return
+                if frame is None:
+                    print(f"[WARN] Failed to read: {store.name(idx)}")
+                    continue
+                idxs.append(idx)
+                frames.append(frame)
+                if len(frames) == batch_size:
+                    q.put((idxs, frames))
+                    idxs, frames = [], []
+            if frames:
+                q.put((idxs, frames))
+        except Exception as e:
+            error.append(e)
+        finally:
+            q.put(None)
+
+    t = threading.Thread(target=reader, daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        # 중간에 빠져나가도 reader 가 q.put 에서 멈추지 않도록 비워 줌
+        stop.set()
+        while t.is_alive():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                t.join(timeout=0.05)
+    if error:
+        raise error[0]
+
+
+# =========================
+# 2. 배치 전처리 (한 번만)
+# =========================
+
+def letterbox_shape(h, w, img_size=IMG_SIZE, stride=STRIDE):
+    """
+    ultralytics rect 추론과 같은 입력 크기: 긴 변을 img_size 로 맞추고
+    짧은 변은 stride 배수까지만 padding → (resize (h, w), 입력 (H, W))
+    """
+    r = min(img_size / h, img_size / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    H = int(np.ceil(nh / stride) * stride)
+    W = int(np.ceil(nw / stride) * stride)
+    return (nh, nw), (H, W)
+
+
+def preprocess_batch(frames, img_size=IMG_SIZE, stride=STRIDE, device="cpu"):
+    """
+    BGR 프레임 리스트 → (B, 3, H, W) float32 텐서 (RGB, 0~1)
+    배치 안 프레임은 첫 프레임 크기 기준으로 같은 크기로 letterbox 한다.
+    """
+    h, w = frames[0].shape[:2]
+    (nh, nw), (H, W) = letterbox_shape(h, w, img_size, stride)
+    top, left = (H - nh) // 2, (W - nw) // 2
+
+    batch = np.full((len(frames), H, W, 3), PAD_VALUE, dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        if frame.shape[:2] != (nh, nw):
+            frame = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        batch[i, top:top + nh, left:left + nw] = frame
+
+    # BGR→RGB, NHWC→NCHW 를 한 번의 복사로
+    x = torch.from_numpy(np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2)))
+    return x.to(device).float().div_(255.0)
+
+
+def boxes_to_frame(boxes, frame_shape, img_size=IMG_SIZE, stride=STRIDE):
+    """
+    preprocess_batch 입력 좌표의 박스 (N, 4+) → 원본 프레임 좌표 (x1, y1, x2, y2 만 변환)
+    """
+    h, w = frame_shape[:2]
+    (nh, nw), (H, W) = letterbox_shape(h, w, img_size, stride)
+    top, left = (H - nh) // 2, (W - nw) // 2
+    out = np.array(boxes, dtype=np.float32, copy=True)
+    out[:, [0, 2]] = ((out[:, [0, 2]] - left) * (w / nw)).clip(0, w)
+    out[:, [1, 3]] = ((out[:, [1, 3]] - top) * (h / nh)).clip(0, h)
+    return out
+
+
+# =========================
+# 3. 검출기
+# =========================
+
+def _boxes(result):
+    """결과 하나 → (N, 6) float32 [x1, y1, x2, y2, conf, cls] (입력 텐서 좌표)"""
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    return result.boxes.data[:, :6].cpu().numpy().astype(np.float32)
+
+
+def _class_counts(result, num_classes):
+    """결과 하나 → 클래스별 박스 개수 (num_classes,)"""
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros(num_classes, dtype=np.int64)
+    cls = result.boxes.cls.cpu().numpy().astype(np.int64)
+    return np.bincount(cls, minlength=num_classes)[:num_classes]
+
+
+class DualYoloDetector:
+    """
+    open/close 모델 + full/empty 모델. 같은 입력 텐서를 두 모델에 넣는다.
+    box_count 는 기존과 같이 open/close 모델 탐지 수 기준.
+    """
+
+    def __init__(self, openclose_model_path="best_openclose.pt",
+                 fullempty_model_path="best_fullempty.pt", conf=0.25, device="cpu"):
+        from ultralytics import YOLO
+
+        self.model_openclose = YOLO(openclose_model_path)
+        self.model_fullempty = YOLO(fullempty_model_path)
+        self.weights_paths = (str(openclose_model_path), str(fullempty_model_path))
+        self.conf = conf
+        self.device = device
+
+        print("[INFO] open/close model classes:", self.model_openclose.names)
+        print("[INFO] full/empty model classes:", self.model_fullempty.names)
+
+    def _predict(self, model, x):
+        return model.predict(x, conf=self.conf, device=self.device, verbose=False)
+
+    def count_batch(self, x):
+        """x: (B, 3, H, W) → (B, 5) [box, open, closed, full, empty]"""
+        t0 = time.perf_counter()
+        res_oc = self._predict(self.model_openclose, x)
+        res_fe = self._predict(self.model_fullempty, x)
+        n_oc = len(self.model_openclose.names)
+        n_fe = len(self.model_fullempty.names)
+
+        counts = np.zeros((len(res_oc), len(COUNT_COLUMNS)), dtype=np.int64)
+        for i, (r_oc, r_fe) in enumerate(zip(res_oc, res_fe)):
+            c_oc = _class_counts(r_oc, n_oc)
+            c_fe = _class_counts(r_fe, n_fe)
+            counts[i] = (c_oc.sum(),
+                         c_oc[list(OPEN_IDS)].sum(), c_oc[list(CLOSED_IDS)].sum(),
+                         c_fe[list(FULL_IDS)].sum(), c_fe[list(EMPTY_IDS)].sum())
+        # 배치 시간을 프레임 수로 나눠 프레임당 시간으로 기록
+        METRICS.observe("yolo", (time.perf_counter() - t0) * 1000.0 / max(1, len(counts)))
+        return counts
+
+    def detect_batch(self, x):
+        """
+        x: (B, 3, H, W) → 프레임마다 (openclose 박스, fullempty 박스)
+        박스: (N, 6) [x1, y1, x2, y2, conf, cls], 입력 텐서 좌표 (boxes_to_frame 으로 변환)
+        """
+        t0 = time.perf_counter()
+        res_oc = self._predict(self.model_openclose, x)
+        res_fe = self._predict(self.model_fullempty, x)
+        METRICS.observe("yolo", (time.perf_counter() - t0) * 1000.0 / max(1, len(res_oc)))
+        return [(_boxes(r_oc), _boxes(r_fe)) for r_oc, r_fe in zip(res_oc, res_fe)]
+
+
+class MergedYoloDetector:
+    """
+    4클래스(open_empty/open_full/close_empty/close_full) 단일 모델.
+    모델 클래스 이름을 OPEN_CLOSE_MAP / FULL_EMPTY_MAP 으로 바꿔서 개수를 센다.
+    (추론 1번으로 DualYoloDetector 와 같은 컬럼을 만든다)
+    """
+
+    def __init__(self, model_path, conf=0.25, device="cpu"):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.weights_paths = (str(model_path),)
+        self.conf = conf
+        self.device = device
+        print("[INFO] merged model classes:", self.model.names)
+
+        names = self.model.names
+        unknown = [n for n in names.values() if n not in OPEN_CLOSE_MAP]
+        if unknown:
+            raise ValueError(f"Unknown class names in merged model: {unknown}")
+
+        # 클래스 id → (box, open, closed, full, empty) 기여도 행렬 (num_classes, 5)
+        self._contrib = np.zeros((len(names), len(COUNT_COLUMNS)), dtype=np.int64)
+        # 클래스 id → 2클래스 모델 기준 id (detect_batch 에서 DualYoloDetector 와 같은 형식으로)
+        self._oc_ids = np.zeros(len(names), dtype=np.float32)
+        self._fe_ids = np.zeros(len(names), dtype=np.float32)
+        for cid, name in names.items():
+            oc, fe = OPEN_CLOSE_MAP[name], FULL_EMPTY_MAP[name]
+            # 4클래스 이름 기준: OPEN_CLOSE_MAP 0=open 1=close, FULL_EMPTY_MAP 0=empty 1=full
+            self._contrib[cid] = (1, oc == 0, oc == 1, fe == 1, fe == 0)
+            self._oc_ids[cid] = OPEN_IDS[0] if oc == 0 else CLOSED_IDS[0]
+            self._fe_ids[cid] = FULL_IDS[0] if fe == 1 else EMPTY_IDS[0]
+
+    def count_batch(self, x):
+        t0 = time.perf_counter()
+        results = self.model.predict(x, conf=self.conf, device=self.device, verbose=False)
+        n_cls = len(self._contrib)
+        per_class = np.stack([_class_counts(r, n_cls) for r in results])   # (B, num_classes)
+        METRICS.observe("yolo", (time.perf_counter() - t0) * 1000.0 / max(1, len(results)))
+        return per_class @ self._contrib
+
+    def detect_batch(self, x):
+        """DualYoloDetector.detect_batch 와 같은 형식 (같은 박스를 두 관점의 클래스로 나눠 반환)"""
+        t0 = time.perf_counter()
+        results = self.model.predict(x, conf=self.conf, device=self.device, verbose=False)
+        METRICS.observe("yolo", (time.perf_counter() - t0) * 1000.0 / max(1, len(results)))
+        out = []
+        for r in results:
+            boxes = _boxes(r)
+            cls = boxes[:, 5].astype(np.int64)
+            oc, fe = boxes.copy(), boxes.copy()
+            oc[:, 5] = self._oc_ids[cls]
+            fe[:, 5] = self._fe_ids[cls]
+            out.append((oc, fe))
+        return out
+
+
+# =========================
+# 4. 결과 캐시
+# =========================
+
+def detector_key(detector, img_size=IMG_SIZE):
+    """검출기 종류 + 가중치 내용 + conf / imgsz → ResultCache 키 앞부분"""
+    return model_key(type(detector).__name__, detector.weights_paths,
+                     conf=getattr(detector, "conf", None), imgsz=img_size, stride=STRIDE)
+
+
+def counts_from_boxes(oc_boxes, fe_boxes):
+    """detect_batch 박스 → COUNT_COLUMNS 순서의 개수 (count_batch 와 같은 값)"""
+    oc_cls, fe_cls = oc_boxes[:, 5], fe_boxes[:, 5]
+    return np.array([len(oc_boxes),
+                     np.isin(oc_cls, OPEN_IDS).sum(), np.isin(oc_cls, CLOSED_IDS).sum(),
+                     np.isin(fe_cls, FULL_IDS).sum(), np.isin(fe_cls, EMPTY_IDS).sum()],
+                    dtype=np.int64)
+
+
+def detect_frames_cached(detector, frames, cache, img_size=IMG_SIZE, key=None):
+    """
+    프레임 리스트 → 프레임마다 (oc 박스, fe 박스), 원본 프레임 좌표.
+    cache 에 있는 프레임은 추론하지 않고, 없는 프레임만 모아서 한 배치로 추론한 뒤 저장한다.
+    key: detector_key() 결과 (여러 번 부를 때 미리 계산해서 넘기면 가중치 해시를 다시 안 함)
+    """
+    key = key or detector_key(detector, img_size)
+    keys = [f"{key}:{frame_digest(f)}" for f in frames]
+    found = cache.get_many(keys)
+
+    miss = [i for i, k in enumerate(keys) if k not in found]
+    if miss:
+        x = preprocess_batch([frames[i] for i in miss], img_size,
+                             device=getattr(detector, "device", "cpu"))
+        new = {}
+        for i, (oc, fe) in zip(miss, detector.detect_batch(x)):
+            shape = frames[i].shape
+            new[keys[i]] = {"oc": boxes_to_frame(oc, shape, img_size),
+                            "fe": boxes_to_frame(fe, shape, img_size)}
+        cache.put_many(new)
+        found.update(new)
+
+    return [(found[k]["oc"], found[k]["fe"]) for k in keys]
+
+
+# =========================
+# 5. 세션 / 폴더 단위 실행
+# =========================
+
+def analyze_store(store, detector, video_name, batch_size=16, prefetch=2, img_size=IMG_SIZE,
+                  cache=None):
+    """
+    프레임 저장소 하나 → _yolo_states.csv 와 같은 컬럼의 DataFrame
+    cache: ResultCache (None 이면 매번 추론)
+    반환: (df, 초당 처리 프레임 수)
+    """
+    device = getattr(detector, "device", "cpu")
+    key = detector_key(detector, img_size) if cache is not None else None
+    idx_parts, count_parts = [], []
+    n_frames = 0
+    t0 = time.perf_counter()
+
+    for idxs, frames in iter_frame_batches(store, batch_size, prefetch):
+        idx_parts.append(np.asarray(idxs, dtype=np.int64))
+        if cache is not None:
+            dets = detect_frames_cached(detector, frames, cache, img_size, key)
+            count_parts.append(np.stack([counts_from_boxes(oc, fe) for oc, fe in dets]))
+        else:
+            x = preprocess_batch(frames, img_size, device=device)
+            count_parts.append(detector.count_batch(x))
+        n_frames += len(frames)
+
+    seconds = time.perf_counter() - t0
+    if not idx_parts:
+        return pd.DataFrame(columns=["video_name", "frame_idx", "frame_name"] + COUNT_COLUMNS), 0.0
+
+    frame_idx = np.concatenate(idx_parts)
+    counts = np.concatenate(count_parts)
+    df = pd.DataFrame(counts, columns=COUNT_COLUMNS)
+    df.insert(0, "video_name", video_name)
+    df.insert(1, "frame_idx", frame_idx)                            # 0부터 시작
+    df.insert(2, "frame_name", [store.name(int(i)) for i in frame_idx])
+    return df, (n_frames / seconds if seconds > 0 else 0.0)
+
+
+def analyze_frame_folders_batched(root_dir, detector, batch_size=16, prefetch=2,
+                                  img_size=IMG_SIZE, cache=None):
+    """
+    root_dir 아래 모든 프레임 폴더(이미지 폴더 / 세그먼트 저장소)에 대해
+    root_dir/out_yolo/{폴더명}_yolo_states.csv 를 저장한다.
+    """
+    root = Path(root_dir)
+    yolo_out_root = root / "out_yolo"
+    yolo_out_root.mkdir(exist_ok=True)
+
+    folder_list = [f for f in root.iterdir() if f.is_dir() and f.name != "out_yolo"]
+    print(f"[INFO] Found {len(folder_list)} video folders under {root_dir}")
+
+    for folder in folder_list:
+        video_name = folder.name
+        print(f"\n[PROCESS] {video_name}")
+
+        with open_frame_store(folder) as store:
+            if len(store) == 0:
+                print(f"[WARN] {video_name} has no images. skip.")
+                continue
+            df, fps = analyze_store(store, detector, video_name,
+                                    batch_size=batch_size, prefetch=prefetch, img_size=img_size,
+                                    cache=cache)
+
+        out_csv = yolo_out_root / f"{video_name}_yolo_states.csv"
+        df.to_csv(out_csv, index=False, encoding="utf-8-sig")
+        print(f"[SAVE] {out_csv} ({len(df)} rows, {fps:.1f} frames/sec)")
+
+    if cache is not None:
+        print(f"[INFO] Result cache: {cache.stats()}")
+    print("\n[INFO] All folders processed.")